@@ -0,0 +1,82 @@
+"""
+Size and speed of the slot storage encodings: plain JSON, interned JSON and interned msgpack.
+Interning mostly buys size: on small storages it costs some speed against plain JSON,
+which runs in C, and only pays for itself in speed on larger ones.
+
+Usage::
+
+    python -m benchmarks.codec --width 4 --depth 3
+"""
+
+import argparse
+import json
+import sys
+from typing import Callable, Dict, List, Tuple
+
+from df_slots import codec
+from df_slots.codec import SlotCodec
+from df_slots.root import register_slots, SlotRegistry
+from df_slots.storage import SlotStorage
+from df_slots.extraction import iter_leaves
+
+from benchmarks.synthetic import make_slot_tree
+from benchmarks.measure import measure, format_results
+
+
+def make_storage(width: int, depth: int, filled: float) -> Tuple[SlotRegistry, SlotStorage]:
+    """
+    Register a synthetic slot tree and fill the share `filled` of its leaves, the other ones are `None`.
+    """
+    local_root = register_slots(make_slot_tree(width, depth), SlotRegistry())
+    leaves = [path for path, slot in local_root.items() if not slot.has_children()]
+    cutoff = int(len(leaves) * filled)
+    storage = SlotStorage({path: f"value_{index}" if index < cutoff else None for index, path in enumerate(leaves)})
+    return local_root, storage
+
+
+def make_cases(slot_codec: SlotCodec, storage: SlotStorage) -> Dict[str, Tuple[Callable, Callable, object]]:
+    # name: (encode, decode, encoded value)
+    plain = json.dumps(dict(storage))
+    interned = json.dumps(slot_codec.encode(storage))
+    binary = slot_codec.dumps(storage)
+    return {
+        "json": (lambda: json.dumps(dict(storage)), lambda: SlotStorage(json.loads(plain)), plain),
+        "json_interned": (
+            lambda: json.dumps(slot_codec.encode(storage)),
+            lambda: slot_codec.decode(json.loads(interned)),
+            interned,
+        ),
+        "msgpack_interned": (lambda: slot_codec.dumps(storage), lambda: slot_codec.loads(binary), binary),
+    }
+
+
+def run(width: int = 4, depth: int = 2, filled: float = 0.5, repeat: int = 1000) -> Tuple[Dict, Dict[str, int]]:
+    local_root, storage = make_storage(width, depth, filled)
+    slot_codec = SlotCodec(local_root)
+    results, sizes = dict(), dict()
+    for name, (encode, decode, encoded) in make_cases(slot_codec, storage).items():
+        results[f"{name}_encode"] = measure(encode, repeat)
+        results[f"{name}_decode"] = measure(decode, repeat)
+        sizes[name] = len(encoded.encode("utf-8") if isinstance(encoded, str) else encoded)
+    return results, sizes
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--width", type=int, default=4, help="children per group and number of top-level slots")
+    parser.add_argument("--depth", type=int, default=2, help="levels of the slot trees")
+    parser.add_argument("--filled", type=float, default=0.5, help="share of the leaves with a value")
+    parser.add_argument("--repeat", type=int, default=1000, help="calls per case")
+    args = parser.parse_args(argv)
+
+    results, sizes = run(args.width, args.depth, args.filled, args.repeat)
+    print(format_results(results))
+    print()
+    print(f"msgpack: {'package' if codec.msgpack is not None else 'pure python'}")
+    for name, size in sizes.items():
+        print(f"{name:<22}{size:>10} bytes{size / sizes['json']:>8.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Vocabulary lookup: a regexp alternation of all the entries against the automaton of `GazetteerSlot`.
+
+Usage::
+
+    python -m benchmarks.gazetteer --entries 20000
+"""
+
+import argparse
+import random
+import re
+import string
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from df_slots.gazetteer import Automaton
+
+from benchmarks.synthetic import make_corpus
+from benchmarks.measure import measure, format_results
+
+
+def make_vocabulary(size: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [
+        " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))) for _ in range(rng.randint(1, 3)))
+        for _ in range(size)
+    ]
+
+
+def run(entries: int = 20000, requests: int = 64, length: int = 16, repeat: int = 200) -> Tuple[Dict, Dict[str, float]]:
+    vocabulary = make_vocabulary(entries)
+    corpus = make_corpus(requests, length, 2, 2)
+    rng = random.Random(1)
+    # every other request mentions an entry of the vocabulary
+    corpus = [text + " " + rng.choice(vocabulary) if idx % 2 else text for idx, text in enumerate(corpus)]
+
+    start = time.perf_counter()
+    alternation = re.compile(
+        r"\b(?:" + "|".join(map(re.escape, sorted(vocabulary, key=len, reverse=True))) + r")\b", re.IGNORECASE
+    )
+    alternation.search("")
+    build = {"regexp": time.perf_counter() - start}
+    start = time.perf_counter()
+    automaton = Automaton(vocabulary)
+    build["automaton"] = time.perf_counter() - start
+
+    texts = iter(corpus * (repeat * 2 + 20))
+    results = {
+        "regexp_search": measure(lambda: alternation.search(next(texts)), repeat),
+        "automaton_longest": measure(lambda: automaton.longest(next(texts)), repeat),
+    }
+    return results, build
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=20000, help="size of the vocabulary")
+    parser.add_argument("--requests", type=int, default=64, help="number of requests in the corpus")
+    parser.add_argument("--length", type=int, default=16, help="words per request")
+    parser.add_argument("--repeat", type=int, default=200, help="calls per case")
+    args = parser.parse_args(argv)
+
+    results, build = run(args.entries, args.requests, args.length, args.repeat)
+    print(format_results(results))
+    print()
+    for name, seconds in build.items():
+        print(f"{name + ' build':<22}{seconds * 1000:>10.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Timing, allocation and baseline helpers for the benchmarks.
+"""
+
+import gc
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(func: Callable[[], object], repeat: int, warmup: int = 10, alloc_repeat: int = 20) -> Dict[str, float]:
+    """
+    Call `func` `repeat` times and report its throughput, p50/p99 latency in microseconds
+    and the allocated memory per call. Allocations are traced in a separate pass,
+    so that tracing does not distort the timings.
+    """
+    for _ in range(warmup):
+        func()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    # block counts are taken without tracing, which allocates blocks of its own
+    blocks = []
+    for _ in range(alloc_repeat):
+        before = sys.getallocatedblocks()
+        func()
+        blocks.append(sys.getallocatedblocks() - before)
+
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(alloc_repeat):
+            before = tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            func()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "calls": repeat,
+        "throughput": repeat / sum(samples),
+        "p50_us": percentile(samples, 50) * 1e6,
+        "p99_us": percentile(samples, 99) * 1e6,
+        "peak_kib": percentile(peaks, 50) / 1024,
+        "retained_blocks": percentile(blocks, 50),
+    }
+
+
+def environment() -> Dict[str, str]:
+    from df_slots import __version__
+
+    return {"python": sys.version.split()[0], "platform": platform.platform(), "df_slots": __version__}
+
+
+def save_baseline(path: str, params: dict, results: Dict[str, dict]):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"environment": environment(), "params": params, "results": results}, file, indent=2)
+
+
+def load_baseline(path: str) -> dict:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def compare(results: Dict[str, dict], baseline: dict) -> Dict[str, Optional[float]]:
+    """
+    Relative change of the p50 latency of every case against the baseline.
+    Cases missing from the baseline get `None`.
+    """
+    changes = dict()
+    for name, result in results.items():
+        reference = baseline["results"].get(name)
+        changes[name] = None if reference is None else result["p50_us"] / reference["p50_us"] - 1
+    return changes
+
+
+def find_regressions(changes: Dict[str, Optional[float]], threshold: float = 0.1) -> List[str]:
+    """
+    Names of the cases whose p50 latency grew by more than `threshold` relative to the baseline.
+    """
+    return [name for name, change in changes.items() if change is not None and change > threshold]
+
+
+def format_results(results: Dict[str, dict], changes: Optional[Dict[str, Optional[float]]] = None) -> str:
+    header = f"{'case':<22}{'ops/s':>12}{'p50 us':>10}{'p99 us':>10}{'peak KiB':>10}{'blocks':>8}"
+    if changes is not None:
+        header += f"{'p50 vs base':>13}"
+    lines = [header]
+    for name, result in results.items():
+        line = (
+            f"{name:<22}{result['throughput']:>12.0f}{result['p50_us']:>10.1f}{result['p99_us']:>10.1f}"
+            f"{result['peak_kib']:>10.1f}{result['retained_blocks']:>8.0f}"
+        )
+        if changes is not None:
+            change = changes.get(name)
+            line += f"{'n/a':>13}" if change is None else f"{change:>+12.1%} "
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,164 @@
+"""
+Benchmarks of the slot extraction, template filling, conditions, registration and full actor turns.
+
+Usage::
+
+    python -m benchmarks.run --width 4 --depth 3 --save benchmarks/baseline.json
+    python -m benchmarks.run --width 4 --depth 3 --compare benchmarks/baseline.json
+"""
+
+import argparse
+import itertools
+import logging
+import sys
+from typing import Callable, Dict, List, Tuple
+
+from df_engine.core import Context, Actor
+
+from df_slots import processing, handlers, response, conditions
+from df_slots.root import root, register_slots, SlotRegistry
+from df_slots.slot_utils import AutoRegisterMixin
+from df_slots.slot_types import RegexpSlot
+from df_slots.extraction import iter_leaves
+
+from benchmarks.synthetic import make_slot_tree, make_corpus, make_template
+from benchmarks.measure import measure, save_baseline, load_baseline, compare, find_regressions, format_results
+
+
+class AutoRegisterRegexpSlot(AutoRegisterMixin, RegexpSlot):
+    pass
+
+
+def new_context(actor: Actor) -> Context:
+    ctx = Context()
+    ctx.framework_states["slots"] = dict()
+    return actor(ctx) if actor is not None else ctx
+
+
+def make_cases(width: int, depth: int, corpus: List[str], actor: Actor) -> Dict[str, Callable[[], object]]:
+    """
+    Build the benchmarked calls. The synthetic slots are registered in the global root,
+    because the response and handler functions read it; the caller restores the root afterwards.
+    """
+    slots = make_slot_tree(width, depth)
+    register_slots(slots, root)
+    top_names = [slot.name for slot in slots]
+    leaf_names = [leaf.name for slot in slots for leaf in iter_leaves(slot)]
+    requests = itertools.cycle(corpus)
+    ctx = new_context(actor)
+
+    extract = processing.extract(top_names)
+
+    def run_extract():
+        ctx.add_request(next(requests))
+        extract(ctx, actor)
+
+    run_extract()
+    lazy_ctx = new_context(actor)
+    extract_lazy = processing.extract(top_names, lazy=True)
+
+    def run_extract_lazy():
+        # only one of the deferred leaves is read in the turn
+        lazy_ctx.add_request(next(requests))
+        extract_lazy(lazy_ctx, actor)
+        storage = lazy_ctx.framework_states["slots"]
+        storage.get(leaf_names[0])
+        storage.settle()
+
+    template = make_template(leaf_names)
+    fill = response.fill_template(template)
+    condition = conditions.is_set_all(top_names[: max(1, width // 2)] + leaf_names[:width])
+
+    def run_register():
+        register_slots(make_slot_tree(width, depth), SlotRegistry())
+
+    def run_autoregister():
+        for index in range(width):
+            AutoRegisterRegexpSlot(name=f"auto_{index}", regexp=r"\w+")
+
+    return {
+        "extract": run_extract,
+        "extract_lazy": run_extract_lazy,
+        "get_values": lambda: handlers.get_values(ctx, actor, leaf_names),
+        "fill_template": lambda: fill(ctx, actor),
+        "is_set_all": lambda: condition(ctx, actor),
+        "register_slots": run_register,
+        "autoregister": run_autoregister,
+    }
+
+
+def make_actor_turn() -> Tuple[Callable[[], object], Actor, int]:
+    """
+    Whole dialog of the basic example, one actor call per request.
+    """
+    from examples.basic_example import actor, testing_dialog
+
+    example_slots = dict(root)
+
+    def run_dialog():
+        root.clear()
+        root.update(example_slots)
+        ctx = Context()
+        for request, _ in testing_dialog:
+            ctx.add_request(request)
+            ctx = actor(ctx)
+
+    return run_dialog, actor, len(testing_dialog)
+
+
+def run(
+    width: int = 4, depth: int = 2, requests: int = 200, length: int = 16, repeat: int = 1000, cases: List[str] = None
+) -> Dict[str, dict]:
+    run_dialog, actor, turns = make_actor_turn()
+    saved_root = dict(root)
+    try:
+        corpus = make_corpus(requests, length, width, depth)
+        benchmarks = make_cases(width, depth, corpus, actor)
+        benchmarks["actor_turn"] = run_dialog
+        results = dict()
+        for name, func in benchmarks.items():
+            if cases and name not in cases:
+                continue
+            results[name] = measure(func, repeat // turns if name == "actor_turn" else repeat)
+        if "actor_turn" in results:
+            # report per turn, not per dialog
+            result = results["actor_turn"]
+            result.update({"throughput": result["throughput"] * turns, "calls": result["calls"] * turns})
+            result.update({key: result[key] / turns for key in ("p50_us", "p99_us")})
+        return results
+    finally:
+        root.clear()
+        root.update(saved_root)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--width", type=int, default=4, help="children per group and number of top-level slots")
+    parser.add_argument("--depth", type=int, default=2, help="levels of the slot trees")
+    parser.add_argument("--requests", type=int, default=200, help="size of the request corpus")
+    parser.add_argument("--length", type=int, default=16, help="words per request")
+    parser.add_argument("--repeat", type=int, default=1000, help="calls per case")
+    parser.add_argument("--case", action="append", dest="cases", help="run only the given cases")
+    parser.add_argument("--save", help="save the results as a baseline to this path")
+    parser.add_argument("--compare", help="compare the results with the baseline at this path")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative p50 slowdown reported as a regression")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    params = {key: getattr(args, key) for key in ("width", "depth", "requests", "length", "repeat")}
+    results = run(cases=args.cases, **params)
+    changes = None
+    if args.compare:
+        changes = compare(results, load_baseline(args.compare))
+    print(format_results(results, changes))
+    if args.save:
+        save_baseline(args.save, params, results)
+    regressions = find_regressions(changes, args.threshold) if changes is not None else []
+    if regressions:
+        print(f"Regressions over {args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
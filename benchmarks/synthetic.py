@@ -0,0 +1,61 @@
+"""
+Synthetic slot trees and request corpora for the benchmarks.
+"""
+
+import random
+import string
+from typing import List
+
+from df_slots.slot_types import BaseSlot, GroupSlot, RegexpSlot, FunctionSlot
+
+WORDS = ["the", "a", "my", "is", "and", "of", "to", "in", "with", "please", "call", "me", "at", "from"]
+
+
+def leaf_keyword(path: List[int]) -> str:
+    return "key" + "x".join(map(str, path))
+
+
+def make_leaf(path: List[int]) -> BaseSlot:
+    name = f"leaf_{path[-1]}"
+    if path[-1] % 2:
+        keyword = len(leaf_keyword(path))
+        return FunctionSlot(name=name, func=lambda msg: str(sum(len(word) == keyword for word in msg.split())))
+    return RegexpSlot(name=name, regexp=rf"(?<={leaf_keyword(path)} )\w+")
+
+
+def make_slot_tree(width: int, depth: int, path: List[int] = None) -> List[BaseSlot]:
+    """
+    Build `width` top-level slots, each a tree of groups with `width` children per level and `depth` levels.
+    Even leaves are regexp slots that fire on their own keyword, odd leaves are cheap function slots.
+    """
+    path = path or []
+    slots = []
+    for index in range(width):
+        child_path = path + [index]
+        if depth <= 1:
+            slots.append(make_leaf(child_path))
+        else:
+            children = make_slot_tree(width, depth - 1, child_path)
+            slots.append(GroupSlot(name=f"group_{index}", children=children))
+    return slots
+
+
+def make_corpus(size: int, length: int, width: int, depth: int, seed: int = 0) -> List[str]:
+    """
+    Generate `size` requests of `length` words, some of them being leaf keywords followed by a value.
+    """
+    rng = random.Random(seed)
+    keywords = [leaf_keyword([rng.randrange(width) for _ in range(depth)]) for _ in range(size * 2)]
+    corpus = []
+    for _ in range(size):
+        words = [rng.choice(WORDS) for _ in range(length)]
+        for _ in range(max(1, length // 8)):
+            position = rng.randrange(len(words))
+            value = "".join(rng.choices(string.ascii_lowercase, k=6))
+            words[position : position + 1] = [rng.choice(keywords), value]
+        corpus.append(" ".join(words))
+    return corpus
+
+
+def make_template(names: List[str], count: int = 4) -> str:
+    return " ".join(f"{{{name}}}" for name in names[:count]) + " done"
@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
 from .handlers import *
-from .slot_types import GroupSlot, ValueSlot, RegexpSlot, FunctionSlot
+from .slot_types import GroupSlot, ValueSlot, RegexpSlot, GazetteerSlot, VocabularyIndexSlot, FuzzySlot, FunctionSlot
 from .slot_utils import AutoRegisterMixin
 from .root import *
 from . import conditions
 from . import response
 from . import processing
+from . import backends
+from . import codec
+from . import vocabulary_index
 
 __author__ = "Denis Kuznetsov"
 __email__ = "ruthenian8@gmail.com"
@@ -24,5 +27,17 @@ class RegexpSlot(AutoRegisterMixin, RegexpSlot):
     pass
 
 
+class GazetteerSlot(AutoRegisterMixin, GazetteerSlot):
+    pass
+
+
+class VocabularyIndexSlot(AutoRegisterMixin, VocabularyIndexSlot):
+    pass
+
+
+class FuzzySlot(AutoRegisterMixin, FuzzySlot):
+    pass
+
+
 class FunctionSlot(AutoRegisterMixin, FunctionSlot):
     pass
@@ -0,0 +1,174 @@
+"""
+Storage backends that keep slot values outside of the context, so that they persist across restarts
+and can be shared by several workers. A backend is passed to :py:func:`~df_slots.root.register_storage`:
+the values of a context are read in one query when the actor starts a turn,
+and only the paths written or deleted during the turn are saved when it finishes.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+
+class StorageBackend:
+    """
+    Base class of the slot storage backends. Values are stored by context id and slot path.
+    """
+
+    def load(self, context_id: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def save(self, context_id: str, changed: Dict[str, Any], deleted: Iterable[str] = ()):
+        raise NotImplementedError
+
+    def save_many(self, changes: Dict[str, Tuple[Dict[str, Any], Set[str]]]):
+        """
+        Save the changed values and the deleted paths of several contexts.
+        """
+        for context_id, (changed, deleted) in changes.items():
+            self.save(context_id, changed, deleted)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class InMemoryBackend(StorageBackend):
+    def __init__(self):
+        self.data: Dict[str, Dict[str, Any]] = dict()
+        self._lock = threading.Lock()
+
+    def load(self, context_id: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.data.get(context_id, dict()))
+
+    def save(self, context_id: str, changed: Dict[str, Any], deleted: Iterable[str] = ()):
+        with self._lock:
+            values = self.data.setdefault(context_id, dict())
+            values.update(changed)
+            for key in deleted:
+                values.pop(key, None)
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Keep the values in an SQLite database, one row per context and slot path.
+    The database file can be shared by the workers of one host.
+    Values are serialized with `dumps` and `loads`, JSON by default.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        table: str = "slots",
+        dumps: Callable[[Any], str] = json.dumps,
+        loads: Callable[[str], Any] = json.loads,
+    ):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.path = path
+        self.table = table
+        self.dumps = dumps
+        self.loads = loads
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(context_id TEXT NOT NULL, path TEXT NOT NULL, value TEXT, PRIMARY KEY (context_id, path))"
+        )
+
+    def load(self, context_id: str) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT path, value FROM {self.table} WHERE context_id = ?", (context_id,)
+            ).fetchall()
+        return {path: self.loads(value) for path, value in rows}
+
+    def save(self, context_id: str, changed: Dict[str, Any], deleted: Iterable[str] = ()):
+        self.save_many({context_id: (changed, set(deleted))})
+
+    def save_many(self, changes: Dict[str, Tuple[Dict[str, Any], Set[str]]]):
+        # one transaction for all the contexts
+        upserts = [
+            (context_id, path, self.dumps(value))
+            for context_id, (changed, _) in changes.items()
+            for path, value in changed.items()
+        ]
+        deletes = [(context_id, path) for context_id, (_, deleted) in changes.items() for path in deleted]
+        with self._lock:
+            with self._connection:
+                self._connection.execute("BEGIN")
+                self._connection.executemany(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)", upserts)
+                self._connection.executemany(f"DELETE FROM {self.table} WHERE context_id = ? AND path = ?", deletes)
+
+    def close(self):
+        self._connection.close()
+
+
+class WriteBehindBackend(StorageBackend):
+    """
+    Buffer the writes to another backend and save them in batches: when `max_pending` contexts have changes,
+    when the oldest change is older than `interval` seconds or on :py:meth:`flush`.
+    Changes of a context are merged in the buffer, and loads see the buffered changes.
+    With `background=True` a daemon thread also flushes every `interval` seconds.
+    """
+
+    def __init__(
+        self, backend: StorageBackend, max_pending: int = 100, interval: float = 1.0, background: bool = False
+    ):
+        self.backend = backend
+        self.max_pending = max_pending
+        self.interval = interval
+        self._pending: Dict[str, Tuple[Dict[str, Any], Set[str]]] = dict()
+        self._since: Optional[float] = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if background:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def load(self, context_id: str) -> Dict[str, Any]:
+        with self._lock:
+            values = self.backend.load(context_id)
+            changed, deleted = self._pending.get(context_id, (dict(), set()))
+            for key in deleted:
+                values.pop(key, None)
+            values.update(changed)
+            return values
+
+    def save(self, context_id: str, changed: Dict[str, Any], deleted: Iterable[str] = ()):
+        with self._lock:
+            pending_changed, pending_deleted = self._pending.setdefault(context_id, (dict(), set()))
+            for key in deleted:
+                pending_changed.pop(key, None)
+                pending_deleted.add(key)
+            pending_deleted.difference_update(changed)
+            pending_changed.update(changed)
+            if self._since is None:
+                self._since = time.monotonic()
+            if len(self._pending) >= self.max_pending or time.monotonic() - self._since >= self.interval:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending, self._since = self._pending, dict(), None
+            if pending:
+                self.backend.save_many(pending)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        self.backend.close()
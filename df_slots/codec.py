@@ -0,0 +1,337 @@
+"""
+Compact encoding of the slot storage for context databases.
+Slot paths are interned to small integer ids from an append-only :py:class:`PathTable` and only the set values
+are written, so a storage encoded before slots were added, renamed or removed can still be decoded.
+The JSON-compatible form can be put in place of the storage before the context is serialized,
+and the binary form uses the msgpack format (with the `msgpack` package if it is installed).
+"""
+
+import os
+import json
+import zlib
+import struct
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from df_engine.core import Context
+
+from .root import root
+from .storage import SlotStorage
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import fcntl
+except ImportError:  # processes sharing a table file must not register new paths at the same time
+    fcntl = None
+
+CODEC_KEY = "__slot_codec__"
+CODEC_VERSION = 2
+# storage encoded with the crc32 ids of the paths, see :py:func:`path_id`
+LEGACY_VERSION = 1
+
+
+def _pack(obj: Any, out: bytearray):
+    if obj is None:
+        out.append(0xC0)
+    elif obj is True:
+        out.append(0xC3)
+    elif obj is False:
+        out.append(0xC2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            out.append(obj)
+        elif -32 <= obj < 0:
+            out.append(obj & 0xFF)
+        elif 0 <= obj < 1 << 64:
+            for code, fmt, limit in ((0xCC, ">B", 1 << 8), (0xCD, ">H", 1 << 16), (0xCE, ">I", 1 << 32)):
+                if obj < limit:
+                    out.append(code)
+                    out += struct.pack(fmt, obj)
+                    return
+            out.append(0xCF)
+            out += struct.pack(">Q", obj)
+        elif -(1 << 63) <= obj < 0:
+            out.append(0xD3)
+            out += struct.pack(">q", obj)
+        else:
+            raise OverflowError(f"Integer out of range: {obj}")
+    elif isinstance(obj, float):
+        out.append(0xCB)
+        out += struct.pack(">d", obj)
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        _pack_header(len(data), out, 0xA0, 32, (0xD9, 0xDA, 0xDB))
+        out += data
+    elif isinstance(obj, (bytes, bytearray)):
+        _pack_header(len(obj), out, None, 0, (0xC4, 0xC5, 0xC6))
+        out += obj
+    elif isinstance(obj, (list, tuple)):
+        _pack_header(len(obj), out, 0x90, 16, (None, 0xDC, 0xDD))
+        for item in obj:
+            _pack(item, out)
+    elif isinstance(obj, Mapping):
+        _pack_header(len(obj), out, 0x80, 16, (None, 0xDE, 0xDF))
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    else:
+        raise TypeError(f"Cannot encode object of type {type(obj).__name__}")
+
+
+def _pack_header(length: int, out: bytearray, fix: Any, fix_limit: int, codes: Tuple):
+    if fix is not None and length < fix_limit:
+        out.append(fix | length)
+        return
+    for code, fmt, limit in zip(codes, (">B", ">H", ">I"), (1 << 8, 1 << 16, 1 << 32)):
+        if code is not None and length < limit:
+            out.append(code)
+            out += struct.pack(fmt, length)
+            return
+    raise OverflowError(f"Object too long: {length}")
+
+
+# length formats of bin, str, array and map
+_SIZES = {0xC4: ">B", 0xC5: ">H", 0xC6: ">I", 0xD9: ">B", 0xDA: ">H", 0xDB: ">I", 0xDC: ">H", 0xDD: ">I", 0xDE: ">H"}
+_SIZES[0xDF] = ">I"
+# formats of floats, unsigned and signed integers
+_NUMBERS = {0xCA: ">f", 0xCB: ">d", 0xCC: ">B", 0xCD: ">H", 0xCE: ">I", 0xCF: ">Q", 0xD0: ">b", 0xD1: ">h"}
+_NUMBERS.update({0xD2: ">i", 0xD3: ">q"})
+
+
+def _unpack(data: bytes, pos: int) -> Tuple[Any, int]:
+    code = data[pos]
+    pos += 1
+    if code < 0x80:
+        return code, pos
+    if code >= 0xE0:
+        return code - 0x100, pos
+    if code == 0xC0:
+        return None, pos
+    if code in (0xC2, 0xC3):
+        return code == 0xC3, pos
+    if code in _NUMBERS:
+        fmt = _NUMBERS[code]
+        return struct.unpack_from(fmt, data, pos)[0], pos + struct.calcsize(fmt)
+    if 0xA0 <= code < 0xC0:
+        kind, length = "str", code & 0x1F
+    elif 0x90 <= code < 0xA0:
+        kind, length = "array", code & 0x0F
+    elif 0x80 <= code < 0x90:
+        kind, length = "map", code & 0x0F
+    elif code in _SIZES:
+        fmt = _SIZES[code]
+        length = struct.unpack_from(fmt, data, pos)[0]
+        pos += struct.calcsize(fmt)
+        kind = "bin" if code <= 0xC6 else "str" if code <= 0xDB else "array" if code <= 0xDD else "map"
+    else:
+        raise ValueError(f"Unsupported msgpack type: {code:#x}")
+    if kind == "str":
+        return data[pos : pos + length].decode("utf-8"), pos + length
+    if kind == "bin":
+        return bytes(data[pos : pos + length]), pos + length
+    if kind == "array":
+        items = []
+        for _ in range(length):
+            item, pos = _unpack(data, pos)
+            items.append(item)
+        return items, pos
+    result = dict()
+    for _ in range(length):
+        key, pos = _unpack(data, pos)
+        result[key], pos = _unpack(data, pos)
+    return result, pos
+
+
+def packb(obj: Any) -> bytes:
+    if msgpack is not None:
+        return msgpack.packb(obj, use_bin_type=True)
+    out = bytearray()
+    _pack(obj, out)
+    return bytes(out)
+
+
+def unpackb(data: bytes) -> Any:
+    if msgpack is not None:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    obj, pos = _unpack(data, 0)
+    if pos != len(data):
+        raise ValueError("Extra data after the encoded object")
+    return obj
+
+
+def path_id(path: str) -> int:
+    """
+    Id of a slot path in the storage encoded by the previous version of the codec, which is still decoded.
+    """
+    return zlib.crc32(path.encode("utf-8"))
+
+
+class PathTable:
+    """
+    Append-only table of slot path ids: a path gets the next free id when it is first interned,
+    and ids are never reassigned, so that storage encoded with the table can be decoded whatever slots
+    are registered, renamed or removed later.
+    Ids stay small, so an interned path takes one to three bytes in the encoded storage.
+    The table is shared by the processes that encode and decode the same storage through a `file`,
+    one JSON path per line: the table is loaded from it and new paths are appended to it
+    under a file lock. Without a file the ids only hold in the current process.
+    """
+
+    def __init__(self, file: Optional[str] = None):
+        self.file = file
+        self.paths: List[str] = []
+        self.ids: Dict[str, int] = dict()
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _read(self, stream):
+        # lines appended by other processes since the last read
+        stream.seek(self._offset)
+        for line in stream:
+            if not line.endswith(b"\n"):
+                break
+            self._offset += len(line)
+            path = json.loads(line)
+            self.ids.setdefault(path, len(self.paths))
+            self.paths.append(path)
+
+    def intern(self, paths: Iterable[str]) -> Dict[str, int]:
+        """
+        Get the ids of the paths, adding the new ones to the table.
+        """
+        paths = list(paths)
+        with self._lock:
+            if self.file is None:
+                for path in paths:
+                    if path not in self.ids:
+                        self.ids[path] = len(self.paths)
+                        self.paths.append(path)
+                return {path: self.ids[path] for path in paths}
+            with open(self.file, "a+b") as stream:
+                if fcntl is not None:
+                    fcntl.flock(stream, fcntl.LOCK_EX)
+                try:
+                    self._read(stream)
+                    new_paths = list(dict.fromkeys(path for path in paths if path not in self.ids))
+                    if new_paths:
+                        stream.seek(0, os.SEEK_END)
+                        stream.write("".join(json.dumps(path) + "\n" for path in new_paths).encode("utf-8"))
+                        stream.flush()
+                        self._read(stream)
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(stream, fcntl.LOCK_UN)
+            return {path: self.ids[path] for path in paths}
+
+
+# ids of the codecs that are not given their own table
+shared_table = PathTable()
+
+
+class SlotCodec:
+    """
+    Encode slot storage with the registered paths interned to their ids in the `path_table`.
+    On decoding, ids are resolved with the current registry: values of slots that were removed since
+    the storage was encoded are dropped, and the other values are kept whatever slots were registered since.
+    Paths that are not registered are written as they are; `None` values are skipped.
+    Storage encoded by the previous version of the codec, with the :py:func:`path_id` of the paths, is still decoded.
+    """
+
+    def __init__(self, root: dict = root, path_table: Optional[PathTable] = None):
+        self.root = root
+        self.path_table = path_table or shared_table
+        self._table: Tuple[Any, Dict[int, str], Dict[str, int]] = (None, dict(), dict())
+
+    def table(self) -> Tuple[Dict[int, str], Dict[str, int]]:
+        # a plain dictionary root has no version, so the table is rebuilt on every call
+        version = getattr(self.root, "version", None)
+        cached_version, paths, ids = self._table
+        if version is None or version != cached_version:
+            ids = self.path_table.intern(self.root)
+            paths = {idx: path for path, idx in ids.items()}
+            self._table = (version, paths, ids)
+        return paths, ids
+
+    def legacy_table(self) -> Dict[int, str]:
+        ids = {path: path_id(path) for path in self.root}
+        counts = Counter(ids.values())
+        return {idx: path for path, idx in ids.items() if counts[idx] == 1}
+
+    def _split(self, storage: Mapping[str, Any]) -> Tuple[List[Any], Dict[str, Any]]:
+        _, ids = self.table()
+        interned: List[Any] = []
+        names: Dict[str, Any] = dict()
+        for path, value in storage.items():
+            if value is None:
+                continue
+            idx = ids.get(path)
+            if idx is None:
+                names[path] = value
+            else:
+                interned += (idx, value)
+        return interned, names
+
+    def _join(self, interned: List[Any], names: Dict[str, Any], version: int = CODEC_VERSION) -> SlotStorage:
+        paths = self.table()[0] if version == CODEC_VERSION else self.legacy_table()
+        storage = SlotStorage(names)
+        for idx, value in zip(interned[::2], interned[1::2]):
+            path = paths.get(idx)
+            if path is not None:
+                dict.__setitem__(storage, path, value)
+        return storage
+
+    def is_encoded(self, value: Any) -> bool:
+        return isinstance(value, dict) and value.get(CODEC_KEY) in (CODEC_VERSION, LEGACY_VERSION)
+
+    def encode(self, storage: Mapping[str, Any]) -> Dict[str, Any]:
+        """
+        Encode the storage as a JSON-compatible dictionary.
+        """
+        interned, names = self._split(storage)
+        payload = {CODEC_KEY: CODEC_VERSION, "v": interned}
+        if names:
+            payload["n"] = names
+        return payload
+
+    def decode(self, payload: Mapping[str, Any]) -> SlotStorage:
+        if not self.is_encoded(payload):
+            raise ValueError("Not an encoded slot storage")
+        return self._join(payload["v"], payload.get("n", dict()), payload[CODEC_KEY])
+
+    def dumps(self, storage: Mapping[str, Any]) -> bytes:
+        """
+        Encode the storage in the msgpack format.
+        """
+        return packb([CODEC_VERSION, *self._split(storage)])
+
+    def loads(self, data: bytes) -> SlotStorage:
+        version, interned, names = unpackb(data)
+        if version not in (CODEC_VERSION, LEGACY_VERSION):
+            raise ValueError(f"Unsupported slot codec version: {version}")
+        return self._join(interned, names, version)
+
+    def pack(self, ctx: Context) -> Context:
+        """
+        Get a copy of the context with the encoded storage, e.g. to save `ctx.json()` in a database.
+        The context itself is not changed.
+        """
+        packed = ctx.copy()
+        packed.framework_states = dict(ctx.framework_states)
+        storage = ctx.framework_states.get("slots")
+        if storage is not None and not self.is_encoded(storage):
+            packed.framework_states["slots"] = self.encode(storage)
+        return packed
+
+    def unpack(self, ctx: Context) -> Context:
+        """
+        Decode the storage of a context restored from a packed one, in place.
+        """
+        storage = ctx.framework_states.get("slots")
+        if self.is_encoded(storage):
+            ctx.framework_states["slots"] = self.decode(storage)
+        return ctx
@@ -1,25 +1,119 @@
-from typing import List, Callable
+import time
+from typing import List, Callable, Mapping, Optional, Sequence, Union
 from functools import partial
 
 from df_engine.core import Context, Actor
 
+from .slot_types import GroupSlot
+from .extraction import iter_leaves
 from .root import root
+from . import instrumentation
 
+SlotConditionItem = Union[str, "SlotCondition"]
 
-def is_set(slots: List[str], use_all: bool = True, use_any: bool = False, root: dict = root) -> Callable:
-    if use_all == use_any:
-        raise ValueError("Parameters `use_all` and `use_any` are mutually exclusive.")
 
-    def is_set_inner(ctx: Context, actor: Actor) -> bool:
-        slots_set = [root.get(slot).is_set() if slot in root else False for slot in slots]
-        if use_all:
-            return all(slots_set)
-        if use_any:
-            return any(slots_set)
+class SlotCondition:
+    """
+    Condition that checks whether `all`, `any`, `none` or `at_least` `k` of the items are set.
+    Items are slot names or nested conditions. Slot names are resolved to the storage paths of their leaves
+    on the first call and then only after the registry changes, so a call reads just the storage entries
+    it needs and stops as soon as the result is known.
+    """
+
+    modes = ("all", "any", "none", "at_least")
+
+    def __init__(self, items: Sequence[SlotConditionItem], mode: str = "all", k: int = 1, root: dict = root):
+        if mode not in self.modes:
+            raise ValueError(f"Unknown mode `{mode}`, expected one of: {', '.join(self.modes)}.")
+        self.items = list(items)
+        self.mode = mode
+        self.k = k
+        self.root = root
+        self._evaluator: Optional[Callable[[Mapping], bool]] = None
+        self._version: Optional[int] = None
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __call__(self, ctx: Context, actor: Actor) -> bool:
+        storage = ctx.framework_states.get("slots")
+        if storage is None:
+            storage = dict()
+        sink = instrumentation.sink
+        if sink is None:
+            return self.evaluate(storage)
+        start = time.perf_counter()
+        result = self.evaluate(storage)
+        sink.observe("condition_seconds", self.label, time.perf_counter() - start)
+        sink.count("condition_true_total" if result else "condition_false_total", self.label)
+        return result
+
+    @property
+    def label(self) -> str:
+        mode = f"at_least_{self.k}" if self.mode == "at_least" else self.mode
+        items = (item.label if isinstance(item, SlotCondition) else item for item in self.items)
+        return f"{mode}({', '.join(items)})"
+
+    def evaluate(self, storage: Mapping) -> bool:
+        # a plain dictionary root has no version, so the condition is resolved on every call
+        version = getattr(self.root, "version", None)
+        if self._evaluator is None or version is None or version != self._version:
+            self._evaluator = self.compile()
+            self._version = version
+        return self._evaluator(storage)
+
+    def compile_item(self, item: SlotConditionItem) -> Callable[[Mapping], bool]:
+        if isinstance(item, SlotCondition):
+            return item.evaluate
+        slot = self.root.get(item)
+        if slot is None:
+            return lambda storage: False
+        paths = [leaf.name for leaf in iter_leaves(slot)] if isinstance(slot, GroupSlot) else [slot.name]
+        if len(paths) == 1:
+            path = paths[0]
+            return lambda storage: storage.get(path) is not None
+        return lambda storage: all(storage.get(path) is not None for path in paths)
+
+    def compile(self) -> Callable[[Mapping], bool]:
+        checks = [self.compile_item(item) for item in self.items]
+        if self.mode == "all":
+            return lambda storage: all(check(storage) for check in checks)
+        if self.mode == "any":
+            return lambda storage: any(check(storage) for check in checks)
+        if self.mode == "none":
+            return lambda storage: not any(check(storage) for check in checks)
 
-    return is_set_inner
+        k = self.k
+
+        def at_least(storage: Mapping) -> bool:
+            count = 0
+            for remaining, check in zip(range(len(checks) - 1, -1, -1), checks):
+                if count >= k:
+                    return True
+                if count + remaining + 1 < k:
+                    return False
+                count += check(storage)
+            return count >= k
+
+        return at_least
+
+
+def is_set(
+    slots: List[SlotConditionItem], use_all: bool = True, use_any: bool = False, root: dict = root
+) -> SlotCondition:
+    if use_all == use_any:
+        raise ValueError("Parameters `use_all` and `use_any` are mutually exclusive.")
+    return SlotCondition(slots, mode="all" if use_all else "any", root=root)
 
 
 is_set_all = partial(is_set, use_all=True, use_any=False)
 
 is_set_any = partial(is_set, use_any=True, use_all=False)
+
+
+def is_set_none(slots: List[SlotConditionItem], root: dict = root) -> SlotCondition:
+    return SlotCondition(slots, mode="none", root=root)
+
+
+def is_set_at_least(k: int, slots: List[SlotConditionItem], root: dict = root) -> SlotCondition:
+    return SlotCondition(slots, mode="at_least", k=k, root=root)
@@ -0,0 +1,86 @@
+"""
+Dependencies between slots. A slot declares the paths of the value slots it `depends_on`;
+the dependencies of the registered slots form a directed acyclic graph, checked on registration,
+and the extraction runs the slots in waves so that every slot comes after the slots it depends on.
+"""
+
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .slot_types import GroupSlot
+
+
+def get_dependencies(slot: Any) -> Tuple[str, ...]:
+    return tuple(getattr(slot, "depends_on", None) or ())
+
+
+def find_cycle(start: str, get_deps) -> Optional[List[str]]:
+    """
+    Find a dependency cycle reachable from `start`, returned as the list of paths from the first one back to it.
+    """
+    path: List[str] = []
+    on_path: Dict[str, int] = dict()
+    done = set()
+    # iterative depth-first search: a stack of (path, iterator over its dependencies)
+    stack = [(start, iter(get_deps(start)))]
+    path.append(start)
+    on_path[start] = 0
+    while stack:
+        name, deps = stack[-1]
+        for dep in deps:
+            if dep in on_path:
+                return path[on_path[dep] :] + [dep]
+            if dep not in done:
+                on_path[dep] = len(path)
+                path.append(dep)
+                stack.append((dep, iter(get_deps(dep))))
+                break
+        else:
+            stack.pop()
+            path.pop()
+            del on_path[name]
+            done.add(name)
+    return None
+
+
+def check_dependencies(root: Mapping[str, Any], new_slots: Mapping[str, Any]):
+    """
+    Check the dependencies of the slots about to be added to the root:
+    they must not form a cycle and must not refer to group slots.
+    Dependencies that are not registered yet are allowed, their values are read from the context storage.
+    """
+
+    def get_slot(path: str) -> Any:
+        return new_slots[path] if path in new_slots else root.get(path)
+
+    def get_deps(path: str) -> Tuple[str, ...]:
+        return get_dependencies(get_slot(path))
+
+    for path, slot in new_slots.items():
+        deps = get_dependencies(slot)
+        if not deps:
+            continue
+        for dep in deps:
+            if isinstance(get_slot(dep), GroupSlot):
+                raise ValueError(f"Slot {path} depends on the group slot {dep}, only value slots can be dependencies")
+        cycle = find_cycle(path, get_deps)
+        if cycle is not None:
+            raise ValueError(f"Cyclic slot dependencies: {' -> '.join(cycle)}")
+
+
+def schedule(slots: Sequence[Any]) -> List[List[Any]]:
+    """
+    Split the slots into waves: the slots of a wave only depend on the slots of the earlier waves
+    or on slots that are not in the list. The slots of a wave can run in parallel.
+    """
+    names = {slot.name for slot in slots}
+    ready = set()
+    waves = []
+    remaining = list(slots)
+    while remaining:
+        wave = [slot for slot in remaining if all(dep in ready or dep not in names for dep in slot.depends_on)]
+        if not wave:
+            raise ValueError(f"Cyclic slot dependencies between: {', '.join(slot.name for slot in remaining)}")
+        waves.append(wave)
+        ready.update(slot.name for slot in wave)
+        remaining = [slot for slot in remaining if slot.name not in ready]
+    return waves
@@ -0,0 +1,704 @@
+import re
+import time
+import asyncio
+import hashlib
+import logging
+from functools import lru_cache, partial
+from concurrent.futures import Executor, Future
+from typing import Any, Awaitable, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # python < 3.11
+    import sre_parse
+    import sre_constants
+
+from df_engine.core import Context, Actor
+
+from .slot_types import BaseSlot, GroupSlot, match_value
+from .runtime import (
+    RuntimeSlot,
+    RuntimeGroup,
+    RuntimeRegexp,
+    RuntimeGazetteer,
+    RuntimeFuzzy,
+    RuntimeFunction,
+    compile_slot,
+    compile_slots,
+)
+from .storage import SlotStorage
+from .memo import extraction_cache, turn_memo_stats, input_memo_stats
+from .dependencies import schedule
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Number of chunks a batch is split into when mapped over an executor.
+BATCH_CHUNKS = 32
+# Key of the context framework states that keeps the input fingerprints of the slots with declared inputs.
+INPUTS_KEY = "slot_inputs"
+_UNSET = object()
+
+
+def _required_literals(parsed) -> Iterator[str]:
+    """
+    Yield the literal strings that occur in every match of a parsed expression.
+    Only plain sequences, groups, positive lookarounds and mandatory repeats are inspected.
+    """
+    run: List[str] = []
+    for op, av in parsed:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            yield "".join(run)
+            run = []
+        if op is sre_constants.SUBPATTERN and not av[1] & re.IGNORECASE:
+            yield from _required_literals(av[-1])
+        elif op is sre_constants.ASSERT:
+            yield from _required_literals(av[1])
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+            yield from _required_literals(av[2])
+    if run:
+        yield "".join(run)
+
+
+def get_required_literal(pattern: re.Pattern) -> Optional[str]:
+    """
+    Return the longest literal that a text must contain for the pattern to match,
+    or `None` if no such literal is found.
+    """
+    if not isinstance(pattern.pattern, str) or pattern.flags & re.IGNORECASE:
+        return None
+    try:
+        literals = list(_required_literals(sre_parse.parse(pattern.pattern, pattern.flags)))
+    except Exception:
+        return None
+    return max(literals, key=len) if literals else None
+
+
+class RegexpPlan:
+    """
+    Search a text for several patterns at once.
+    Each distinct pattern is scanned once, and a pattern is only run if the text contains
+    the literal required by it, so most of the patterns are ruled out by a substring test.
+    The values of all the slots with the same pattern are taken from its scan: a pattern is scanned
+    for all of its matches only if one of them extracts all the matches.
+    For each pattern the result equals `search_pattern(pattern, text, *mode)`.
+    """
+
+    def __init__(self, patterns: Sequence[re.Pattern], modes: Optional[Sequence[Tuple[bool, bool, bool]]] = None):
+        self.patterns = tuple(patterns)
+        self.modes = tuple(modes) if modes is not None else ((False, False, False),) * len(self.patterns)
+        unique = list(dict.fromkeys(self.patterns))
+        self.positions = [unique.index(pattern) for pattern in self.patterns]
+        scan_all = [False] * len(unique)
+        for position, mode in zip(self.positions, self.modes):
+            scan_all[position] = scan_all[position] or mode[0]
+        self.unique = [(pattern, get_required_literal(pattern), all_) for pattern, all_ in zip(unique, scan_all)]
+        # all the slots take the text of the first match
+        self.plain = not any(any(mode) for mode in self.modes)
+
+    def search(self, text: str) -> List[Any]:
+        # the first match of a pattern, or the list of all of its matches
+        found: List[Any] = []
+        for pattern, literal, scan_all in self.unique:
+            if literal is not None and literal not in text:
+                found.append(None)
+            elif scan_all:
+                found.append(list(pattern.finditer(text)))
+            else:
+                found.append(pattern.search(text))
+        if self.plain:
+            found = [match.group() if match else None for match in found]
+            return [found[position] for position in self.positions]
+        return [self.get_value(found[position], mode) for position, mode in zip(self.positions, self.modes)]
+
+    @staticmethod
+    def get_value(found: Any, mode: Tuple[bool, bool, bool]) -> Any:
+        all_matches, groups, spans = mode
+        if isinstance(found, list):
+            if all_matches:
+                return [match_value(match, groups, spans) for match in found] or None
+            found = found[0] if found else None
+        return match_value(found, groups, spans) if found is not None else None
+
+
+@lru_cache(maxsize=64)
+def get_regexp_plan(
+    patterns: Tuple[re.Pattern, ...], modes: Optional[Tuple[Tuple[bool, bool, bool], ...]] = None
+) -> RegexpPlan:
+    return RegexpPlan(patterns, modes)
+
+
+def iter_leaves(slot: BaseSlot) -> Iterator[BaseSlot]:
+    if isinstance(slot, GroupSlot):
+        for child in slot.children.values():
+            yield from iter_leaves(child)
+    else:
+        yield slot
+
+
+def is_planned(leaf: RuntimeSlot) -> bool:
+    # guarded patterns are searched one by one, under their own limits
+    return isinstance(leaf, RuntimeRegexp) and leaf.regexp is not None and leaf.guard is None
+
+
+def search_regexp_slots(slots: List[RuntimeSlot], text: str) -> Dict[int, Optional[str]]:
+    """
+    Run all regexp slots from the given compiled subtrees against the text at once.
+    Returns a mapping from slot ids to the extracted values.
+    """
+    regexp_slots = [leaf for slot in slots for leaf in slot.leaves() if is_planned(leaf)]
+    if not regexp_slots:
+        return dict()
+    plan = get_regexp_plan(tuple(leaf.regexp for leaf in regexp_slots), tuple(leaf.mode for leaf in regexp_slots))
+    return {id(leaf): value for leaf, value in zip(regexp_slots, plan.search(text))}
+
+
+def extract_slot(slot: RuntimeSlot, ctx: Context, actor: Actor, known: Dict[int, Any]) -> Any:
+    """
+    Extract the value of a compiled slot, taking the values of the leaves from `known` (by slot id) when present.
+    """
+    if isinstance(slot, RuntimeGroup):
+        return slot.collect_values(extract_slot(child, ctx, actor, known) for child in slot.children)
+    if id(slot) in known:
+        return known[id(slot)]
+    return slot.extract(ctx, actor)
+
+
+def pending_leaves(slots: List[RuntimeSlot], known: Dict[int, Any]) -> List[RuntimeSlot]:
+    return list({id(leaf): leaf for slot in slots for leaf in slot.leaves() if id(leaf) not in known}.values())
+
+
+def is_cpu_bound(slot: RuntimeSlot) -> bool:
+    return isinstance(slot, RuntimeFunction) and slot.cpu_bound
+
+
+def is_memoizable(slot: RuntimeSlot) -> bool:
+    # the value of these slots depends on the last request only
+    return isinstance(slot, (RuntimeRegexp, RuntimeGazetteer, RuntimeFuzzy, RuntimeFunction)) and not slot.depends_on
+
+
+def get_turn_memo(ctx: Context) -> Optional[Dict[Tuple[str, RuntimeSlot], Any]]:
+    """
+    Get the extraction results of the current turn, keyed by the path and the compiled definition of the slot:
+    slots of different registries can share a path.
+    """
+    storage = ctx.framework_states.get("slots")
+    if not isinstance(storage, SlotStorage):
+        return None
+    turn = (get_last_request_index(ctx.requests), ctx.last_request)
+    try:
+        hash(turn)
+    except TypeError:
+        return None
+    return storage.turn_memo(turn)
+
+
+def get_cache_key(slot: RuntimeSlot, request: Any) -> Optional[Hashable]:
+    if not isinstance(slot, RuntimeFunction) or not slot.deterministic or slot.depends_on:
+        return None
+    try:
+        hash(request)
+    except TypeError:
+        return None
+    return (slot.func, request)
+
+
+def get_last_request_index(requests: Dict[int, Any]) -> int:
+    # requests are added in the order of their indices
+    return next(reversed(requests), -1)
+
+
+def last_requests(ctx: Context, count: int) -> tuple:
+    """
+    Get the last `count` requests of the context, walking back from the last index while the indices are present.
+    """
+    requests, values = ctx.requests, []
+    idx = get_last_request_index(requests)
+    while len(values) < count and idx in requests:
+        values.append(requests[idx])
+        idx -= 1
+    return tuple(reversed(values))
+
+
+def get_input_key(ctx: Context, leaf: RuntimeSlot, inputs: Optional[Dict[str, Any]] = None) -> tuple:
+    """
+    Get the current values of the declared inputs of a leaf, together with the values of its dependencies.
+    """
+    requests, paths, keys = leaf.input_spec
+    storage = ctx.framework_states.get("slots")
+    slot_values = tuple(storage.get(path) for path in paths) if storage is not None else (None,) * len(paths)
+    return (last_requests(ctx, requests), slot_values, tuple(ctx.misc.get(key) for key in keys), inputs)
+
+
+@lru_cache(maxsize=1024)
+def get_definition_digest(leaf: RuntimeSlot) -> bytes:
+    return hashlib.blake2b(repr(leaf.key).encode("utf-8"), digest_size=16).digest()
+
+
+def get_input_digest(leaf: RuntimeSlot, key: tuple) -> str:
+    """
+    Compact fingerprint of the definition of a leaf and of the current values of its inputs.
+    Fingerprints are compared by their `repr`, so inputs without a stable representation,
+    like objects that are represented by their address, only make the value be extracted again.
+    """
+    return hashlib.blake2b(get_definition_digest(leaf) + repr(key).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def get_value_digest(input_digest: str, value: Any) -> str:
+    """
+    Fingerprint of an extraction: the fingerprint of the definition and the inputs of a leaf, and the extracted value.
+    Values that are represented differently once the context is serialized, like tuples, are extracted again.
+    """
+    return hashlib.blake2b((input_digest + repr(value)).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def read_stored(ctx: Context, path: str) -> Any:
+    """
+    Get the value stored at a path without extracting a deferred value, or `_UNSET` if there is none.
+    """
+    storage = ctx.framework_states.get("slots")
+    if storage is None:
+        return _UNSET
+    if isinstance(storage, SlotStorage):
+        return storage.peek(path, _UNSET)
+    return storage.get(path, _UNSET)
+
+
+def get_input_memo(ctx: Context) -> Dict[str, str]:
+    """
+    Get the fingerprints of the last extraction of the slots with declared inputs, by path,
+    see :py:func:`get_value_digest`. The values are not kept in the memo: an unchanged value is read
+    from the slot storage and only reused if it is still the value of that extraction.
+    The memo is kept in the framework states of the context, so it is serialized with the context
+    and values are also reused when a context is restored from a database.
+    """
+    memo = ctx.framework_states.get(INPUTS_KEY)
+    if memo is None:
+        memo = ctx.framework_states[INPUTS_KEY] = dict()
+    return memo
+
+
+def reuse_unchanged(
+    ctx: Context,
+    leaves: List[RuntimeSlot],
+    known: Dict[int, Any],
+    inputs: Optional[Dict[int, Dict[str, Any]]] = None,
+) -> Tuple[List[RuntimeSlot], Dict[int, str]]:
+    """
+    Take the values of the leaves with declared inputs that did not change since their last extraction.
+    `inputs` are the values of the dependencies by slot id.
+    Returns the leaves still to be extracted and the input fingerprints of the ones with declared inputs.
+    """
+    if all(leaf.input_spec is None for leaf in leaves):
+        return leaves, dict()
+    memo = get_input_memo(ctx)
+    sink = instrumentation.sink
+    remaining, digests = [], dict()
+    for leaf in leaves:
+        if leaf.input_spec is None:
+            remaining.append(leaf)
+            continue
+        digest = get_input_digest(leaf, get_input_key(ctx, leaf, inputs.get(id(leaf)) if inputs else None))
+        entry = memo.get(leaf.name)
+        value = read_stored(ctx, leaf.name) if entry is not None else _UNSET
+        if value is not _UNSET and entry == get_value_digest(digest, value):
+            known[id(leaf)] = value
+            input_memo_stats.hits += 1
+            if sink is not None:
+                sink.count("slot_unchanged_total", leaf.name)
+            continue
+        input_memo_stats.misses += 1
+        digests[id(leaf)] = digest
+        remaining.append(leaf)
+    return remaining, digests
+
+
+def remember_inputs(ctx: Context, digests: Dict[int, str], leaves: List[RuntimeSlot], known: Dict[int, Any]):
+    if not digests:
+        return
+    memo = get_input_memo(ctx)
+    memo.update(
+        {leaf.name: get_value_digest(digests[id(leaf)], known[id(leaf)]) for leaf in leaves if id(leaf) in digests}
+    )
+
+
+def prepare_leaves(
+    ctx: Context, slots: List[RuntimeSlot]
+) -> Tuple[Dict[int, Any], List[RuntimeSlot], List[RuntimeSlot], Dict[int, tuple]]:
+    """
+    Collect the leaves of the given slots and the values that can be obtained without running the extractors:
+    from the memo of the current turn, from the memo of the slots with unchanged inputs,
+    from the regexp plan and from the process-wide cache.
+    Returns the known values by slot id, the leaves computed in this turn, the leaves still to be extracted
+    and the input fingerprints of the computed leaves with declared inputs.
+    """
+    sink = instrumentation.sink
+    memo = get_turn_memo(ctx)
+    known: Dict[int, Any] = dict()
+    leaves = pending_leaves(slots, known)
+    if memo is not None:
+        for leaf in leaves:
+            if is_memoizable(leaf) and (leaf.name, leaf) in memo:
+                known[id(leaf)] = memo[leaf.name, leaf]
+                if sink is not None:
+                    sink.count("slot_memo_hit_total", leaf.name)
+        turn_memo_stats.hits += len(known)
+    _, input_digests = reuse_unchanged(
+        ctx, [leaf for leaf in leaves if id(leaf) not in known and not leaf.depends_on], known
+    )
+    computed = [leaf for leaf in leaves if id(leaf) not in known]
+    with instrumentation.timer("regexp_plan_seconds", "plan"):
+        known.update(search_regexp_slots(computed, ctx.last_request))
+    pending = []
+    for leaf in computed:
+        if id(leaf) in known:
+            continue
+        key = get_cache_key(leaf, ctx.last_request)
+        if key is not None:
+            hit, value = extraction_cache.get(key)
+            if hit:
+                known[id(leaf)] = value
+                if sink is not None:
+                    sink.count("slot_cache_hit_total", leaf.name)
+                continue
+        pending.append(leaf)
+    return known, computed, pending, input_digests
+
+
+def remember_leaves(ctx: Context, known: Dict[int, Any], computed: List[RuntimeSlot], extracted: List[RuntimeSlot]):
+    """
+    Save the values of the leaves computed in this turn to the turn memo
+    and the values of the deterministic `extracted` leaves to the process-wide cache.
+    """
+    memo = get_turn_memo(ctx)
+    sink = instrumentation.sink
+    if sink is not None:
+        for leaf in computed:
+            if id(leaf) not in known:
+                continue
+            sink.count("slot_match_total" if known[id(leaf)] is not None else "slot_no_match_total", leaf.name)
+            if memo is not None and is_memoizable(leaf):
+                sink.count("slot_memo_miss_total", leaf.name)
+    if memo is not None:
+        memoizable = [leaf for leaf in computed if is_memoizable(leaf) and id(leaf) in known]
+        memo.update({(leaf.name, leaf): known[id(leaf)] for leaf in memoizable})
+        turn_memo_stats.misses += len(memoizable)
+    for leaf in extracted:
+        key = get_cache_key(leaf, ctx.last_request)
+        if key is not None and id(leaf) in known:
+            extraction_cache.set(key, known[id(leaf)])
+
+
+def split_dependents(pending: List[RuntimeSlot]) -> Tuple[List[RuntimeSlot], List[RuntimeSlot]]:
+    """
+    Split the leaves into the ones that only need the request and the ones that depend on other slots.
+    """
+    return [leaf for leaf in pending if not leaf.depends_on], [leaf for leaf in pending if leaf.depends_on]
+
+
+def get_inputs(
+    ctx: Context, leaf: RuntimeSlot, known: Dict[int, Any], leaf_ids: Dict[str, int]
+) -> Optional[Dict[str, Any]]:
+    """
+    Get the values of the slots a leaf depends on: from `known` for the leaves of the current extraction,
+    from the context storage for the other slots. Returns `None` if any of them is not set.
+    """
+    storage = ctx.framework_states.get("slots")
+    inputs = dict()
+    for path in leaf.depends_on:
+        if path in leaf_ids:
+            value = known.get(leaf_ids[path])
+        else:
+            value = storage.get(path) if storage is not None else None
+        if value is None:
+            return None
+        inputs[path] = value
+    return inputs
+
+
+def get_leaf_ids(slots: List[RuntimeSlot]) -> Dict[str, int]:
+    return {leaf.name: id(leaf) for slot in slots for leaf in slot.leaves()}
+
+
+def share_duplicates(pending: List[RuntimeSlot]) -> Tuple[List[RuntimeSlot], Dict[int, RuntimeSlot]]:
+    """
+    Split off the function leaves that are structurally equal to an earlier leaf:
+    they get the same value, so it is only computed once.
+    Returns the leaves to extract and the originals of the duplicates by slot id.
+    """
+    unique: Dict[RuntimeSlot, RuntimeSlot] = dict()
+    leaves, duplicates = [], dict()
+    for leaf in pending:
+        if isinstance(leaf, RuntimeFunction):
+            original = unique.setdefault(leaf, leaf)
+            if original is not leaf:
+                duplicates[id(leaf)] = original
+                continue
+        leaves.append(leaf)
+    return leaves, duplicates
+
+
+def submit(executor: Executor, leaf: RuntimeFunction, request: Any, inputs: Optional[Dict[str, Any]] = None) -> Future:
+    future = executor.submit(leaf.func, *leaf.arguments(request, inputs))
+    sink = instrumentation.sink
+    if sink is not None:
+        # the duration includes the time spent in the executor queue
+        start = time.perf_counter()
+        future.add_done_callback(
+            lambda _: sink.observe("slot_extraction_seconds", leaf.name, time.perf_counter() - start)
+        )
+    return future
+
+
+def extract_slots(ctx: Context, actor: Actor, slots: List[BaseSlot], executor: Optional[Executor] = None) -> List[Any]:
+    """
+    Extract the values of several slots, running the regexp slots through a shared plan.
+    Equivalent to calling `extract_value` on each of the slots.
+    Regexp and function slots are extracted at most once per turn, and deterministic function slots
+    are looked up in the process-wide cache first. Equal function slots under different paths are computed once.
+    If an `executor` (e.g. a thread or a process pool) is given, cpu-bound function slots are submitted to it
+    and run in parallel with each other and with the rest of the slots.
+    Slots that depend on other slots are extracted afterwards, in waves of slots whose inputs are ready;
+    a slot with an input that is not set gets `None`.
+    Only the cpu-bound slots of a wave run in parallel, in the `executor`, the other ones are extracted
+    one after another; :py:func:`extract_slots_async` extracts all the slots of a wave concurrently.
+    """
+    slots = compile_slots(slots)
+    known, computed, pending, input_digests = prepare_leaves(ctx, slots)
+    pending, dependents = split_dependents(pending)
+    pending, duplicates = share_duplicates(pending)
+    futures: Dict[int, Future] = dict()
+    if executor is not None:
+        futures = {id(leaf): submit(executor, leaf, ctx.last_request) for leaf in pending if is_cpu_bound(leaf)}
+    for leaf in pending:
+        if id(leaf) not in futures:
+            with instrumentation.timer("slot_extraction_seconds", leaf.name):
+                known[id(leaf)] = leaf.extract(ctx, actor)
+    known.update({key: future.result() for key, future in futures.items()})
+    known.update({key: known[id(original)] for key, original in duplicates.items()})
+    if dependents:
+        extract_dependents(ctx, actor, slots, known, dependents, executor)
+    remember_inputs(ctx, input_digests, computed, known)
+    remember_leaves(ctx, known, computed, pending + dependents)
+    return [extract_slot(slot, ctx, actor, known) for slot in slots]
+
+
+def extract_dependents(
+    ctx: Context,
+    actor: Actor,
+    slots: List[RuntimeSlot],
+    known: Dict[int, Any],
+    dependents: List[RuntimeSlot],
+    executor: Optional[Executor] = None,
+):
+    """
+    Extract the leaves that depend on other slots wave by wave. Within a wave, the cpu-bound leaves are submitted
+    to the `executor` and the other ones are extracted serially while they run.
+    """
+    leaf_ids = get_leaf_ids(slots)
+    for wave in schedule(dependents):
+        inputs, ready = get_wave_inputs(ctx, wave, known, leaf_ids)
+        ready, input_digests = reuse_unchanged(ctx, ready, known, inputs)
+        futures: Dict[int, Future] = dict()
+        if executor is not None:
+            futures = {
+                id(leaf): submit(executor, leaf, ctx.last_request, inputs[id(leaf)])
+                for leaf in ready
+                if is_cpu_bound(leaf)
+            }
+        for leaf in ready:
+            if id(leaf) not in futures:
+                with instrumentation.timer("slot_extraction_seconds", leaf.name):
+                    known[id(leaf)] = leaf.extract_with(ctx, actor, inputs[id(leaf)])
+        known.update({key: future.result() for key, future in futures.items()})
+        remember_inputs(ctx, input_digests, ready, known)
+
+
+def get_wave_inputs(
+    ctx: Context, wave: List[RuntimeSlot], known: Dict[int, Any], leaf_ids: Dict[str, int]
+) -> Tuple[Dict[int, Dict[str, Any]], List[RuntimeSlot]]:
+    """
+    Get the inputs of the leaves of a wave by slot id and the leaves with all inputs set.
+    The other leaves are not extracted and get `None`.
+    """
+    inputs = {id(leaf): get_inputs(ctx, leaf, known, leaf_ids) for leaf in wave}
+    known.update({id(leaf): None for leaf in wave if inputs[id(leaf)] is None})
+    return inputs, [leaf for leaf in wave if inputs[id(leaf)] is not None]
+
+
+async def extract_slots_async(
+    ctx: Context,
+    actor: Actor,
+    slots: List[BaseSlot],
+    max_concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    executor: Optional[Executor] = None,
+) -> List[Any]:
+    """
+    Asynchronous version of :py:func:`extract_slots`.
+    The leaves that are not regexp slots are extracted concurrently, at most `max_concurrency` at a time,
+    the slots that depend on other slots are extracted concurrently within their waves.
+    A leaf that is not extracted within `timeout` seconds gets `None` as its value and is not memoized.
+    """
+    slots = compile_slots(slots)
+    known, computed, pending, input_digests = prepare_leaves(ctx, slots)
+    pending, dependents = split_dependents(pending)
+    pending, duplicates = share_duplicates(pending)
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+    timed_out = set()
+
+    def start(leaf: RuntimeSlot, inputs: Optional[Dict[str, Any]]) -> Awaitable:
+        if executor is not None and is_cpu_bound(leaf):
+            arguments = leaf.arguments(ctx.last_request, inputs)
+            return asyncio.get_running_loop().run_in_executor(executor, leaf.func, *arguments)
+        if inputs is not None:
+            return leaf.extract_with_async(ctx, actor, inputs)
+        return leaf.extract_async(ctx, actor)
+
+    async def extract_leaf(leaf: RuntimeSlot, inputs: Optional[Dict[str, Any]] = None) -> Any:
+        try:
+            if semaphore is None:
+                with instrumentation.timer("slot_extraction_seconds", leaf.name):
+                    return await asyncio.wait_for(start(leaf, inputs), timeout)
+            async with semaphore:
+                with instrumentation.timer("slot_extraction_seconds", leaf.name):
+                    return await asyncio.wait_for(start(leaf, inputs), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Slot {leaf.name} was not extracted within {timeout} seconds")
+            timed_out.add(id(leaf))
+            return None
+
+    values = await asyncio.gather(*(extract_leaf(leaf) for leaf in pending))
+    known.update(zip(map(id, pending), values))
+    known.update({key: known[id(original)] for key, original in duplicates.items()})
+    timed_out.update(key for key, original in duplicates.items() if id(original) in timed_out)
+    leaf_ids = get_leaf_ids(slots) if dependents else dict()
+    for wave in schedule(dependents):
+        inputs, ready = get_wave_inputs(ctx, wave, known, leaf_ids)
+        ready, wave_digests = reuse_unchanged(ctx, ready, known, inputs)
+        values = await asyncio.gather(*(extract_leaf(leaf, inputs[id(leaf)]) for leaf in ready))
+        known.update(zip(map(id, ready), values))
+        remember_inputs(ctx, wave_digests, [leaf for leaf in ready if id(leaf) not in timed_out], known)
+    pending += dependents
+    extracted = [leaf for leaf in pending if id(leaf) not in timed_out]
+    remember_inputs(ctx, input_digests, [leaf for leaf in computed if id(leaf) not in timed_out], known)
+    remember_leaves(ctx, known, [leaf for leaf in computed if id(leaf) not in timed_out], extracted)
+    return [extract_slot(slot, ctx, actor, known) for slot in slots]
+
+
+def extract_batch(
+    requests: Sequence[Union[Context, str]],
+    actor: Optional[Actor],
+    slots: List[BaseSlot],
+    executor: Optional[Executor] = None,
+) -> Dict[str, List[Any]]:
+    """
+    Extract the leaves of the given slots from several contexts or raw requests.
+    The regexp plan is built once for the whole batch, function slots with a `batch_func` get all the requests
+    in one call and cpu-bound function slots are mapped over the `executor`, if one is given.
+    Slots that depend on other slots get the values of the same request, from the batch or from the context storage.
+    Returns a list of values per leaf name, in the order of the requests.
+    """
+    texts = [request.last_request if isinstance(request, Context) else request for request in requests]
+    all_leaves = pending_leaves(compile_slots(slots), dict())
+    leaves, dependents = split_dependents(all_leaves)
+    columns: Dict[int, List[Any]] = dict()
+
+    regexp_slots = [leaf for leaf in leaves if is_planned(leaf)]
+    if regexp_slots:
+        plan = get_regexp_plan(tuple(leaf.regexp for leaf in regexp_slots), tuple(leaf.mode for leaf in regexp_slots))
+        rows = [plan.search(text) for text in texts]
+        columns.update({id(leaf): [row[idx] for row in rows] for idx, leaf in enumerate(regexp_slots)})
+
+    contexts: Optional[List[Context]] = None
+    for leaf in leaves:
+        if id(leaf) in columns:
+            continue
+        if isinstance(leaf, (RuntimeRegexp, RuntimeGazetteer, RuntimeFuzzy)):
+            columns[id(leaf)] = [leaf.search(text) for text in texts]
+            continue
+        if isinstance(leaf, RuntimeFunction):
+            if executor is not None and leaf.cpu_bound and leaf.batch_func is None:
+                chunksize = max(1, len(texts) // BATCH_CHUNKS)
+                columns[id(leaf)] = list(executor.map(leaf.func, texts, chunksize=chunksize))
+            else:
+                columns[id(leaf)] = leaf.extract_batch(texts)
+            continue
+        if contexts is None:
+            contexts = [
+                request if isinstance(request, Context) else Context(requests={0: request}) for request in requests
+            ]
+        columns[id(leaf)] = [leaf.extract(ctx, actor) for ctx in contexts]
+
+    if dependents:
+        if contexts is None:
+            contexts = [
+                request if isinstance(request, Context) else Context(requests={0: request}) for request in requests
+            ]
+        leaf_ids = {leaf.name: id(leaf) for leaf in all_leaves}
+        for wave in schedule(dependents):
+            for leaf in wave:
+                column = []
+                input_columns = {
+                    leaf_ids[path]: columns[leaf_ids[path]] for path in leaf.depends_on if path in leaf_ids
+                }
+                for idx, ctx in enumerate(contexts):
+                    row = {key: values[idx] for key, values in input_columns.items()}
+                    inputs = get_inputs(ctx, leaf, row, leaf_ids)
+                    column.append(leaf.extract_with(ctx, actor, inputs) if inputs is not None else None)
+                columns[id(leaf)] = column
+
+    return {leaf.name: columns[id(leaf)] for leaf in all_leaves}
+
+
+def store_values(ctx: Context, names: List[str], slots: List[BaseSlot], values: List[Any]):
+    """
+    Write extracted values to the context storage: group values are merged, other values are set by name.
+    """
+    storage = ctx.framework_states["slots"]
+    for name, slot, val in zip(names, slots, values):
+        if isinstance(slot, GroupSlot):
+            storage.update(val)
+        else:
+            storage[name] = val
+
+
+def defer_values(
+    ctx: Context, actor: Actor, names: List[str], slots: List[BaseSlot], executor: Optional[Executor] = None
+):
+    """
+    Lazy counterpart of :py:func:`extract_slots` and :py:func:`store_values`: every leaf of the given slots
+    is deferred in the context storage and only extracted when its value is first read.
+    """
+    storage: SlotStorage = ctx.framework_states["slots"]
+    runtimes = [compile_slot(slot) for slot in slots]
+    extraction = DeferredExtraction(ctx, actor, [leaf for runtime in runtimes for leaf in runtime.leaves()], executor)
+    for name, runtime in zip(names, runtimes):
+        for leaf in runtime.leaves():
+            path = leaf.name if isinstance(runtime, RuntimeGroup) else name
+            storage.defer(path, partial(extraction.extract, leaf))
+
+
+class DeferredExtraction:
+    """
+    Extraction of the leaves deferred together. The first read of a regexp leaf searches the patterns
+    of all the deferred regexp leaves in one run of the shared plan, the other leaves are extracted one by one.
+    """
+
+    def __init__(self, ctx: Context, actor: Actor, leaves: List[RuntimeSlot], executor: Optional[Executor] = None):
+        self.ctx = ctx
+        self.actor = actor
+        self.executor = executor
+        self.planned = [leaf for leaf in leaves if is_planned(leaf)]
+        self.values: Optional[Dict[int, Any]] = None
+
+    def extract(self, leaf: RuntimeSlot) -> Any:
+        if not is_planned(leaf):
+            return extract_slots(self.ctx, self.actor, [leaf.definition], self.executor)[0]
+        if self.values is None:
+            values = extract_slots(self.ctx, self.actor, [leaf.definition for leaf in self.planned], self.executor)
+            self.values = dict(zip(map(id, self.planned), values))
+        return self.values[id(leaf)]
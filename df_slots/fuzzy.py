@@ -0,0 +1,173 @@
+"""
+Approximate matching of a text against a list of candidate values, for values that users misspell.
+The candidates are indexed by their character trigrams once. A lookup only scores the candidates
+that share trigrams with the spans of the text, ranks them by the overlap of their trigrams
+and computes the edit distance for the best ranked pairs only, so its cost does not grow
+with the number of candidates that have nothing in common with the text.
+Trigram overlaps are counted with NumPy if it is installed.
+"""
+
+import heapq
+import re
+from collections import Counter
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:  # overlaps are counted in pure python
+    numpy = None
+
+GRAM = 3
+WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def get_grams(text: str) -> List[str]:
+    """
+    Get the distinct trigrams of a normalized text, padded with a space on both sides.
+    """
+    padded = f" {text} "
+    return list({padded[idx : idx + GRAM] for idx in range(max(1, len(padded) - GRAM + 1))})
+
+
+def edit_distance(first: str, second: str, limit: int) -> int:
+    """
+    Levenshtein distance between two strings, or `limit + 1` as soon as it is known to exceed `limit`.
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous = list(range(len(second) + 1))
+    for row, first_char in enumerate(first, 1):
+        current = [row]
+        for column, second_char in enumerate(second, 1):
+            current.append(
+                min(previous[column] + 1, current[column - 1] + 1, previous[column - 1] + (first_char != second_char))
+            )
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def similarity(first: str, second: str, threshold: float = 0.0) -> float:
+    """
+    One minus the edit distance divided by the length of the longer string, `0` if it is below the threshold.
+    """
+    length = max(len(first), len(second))
+    if not length:
+        return 1.0
+    # truncated to the largest distance the threshold allows, nudged so that float errors do not lose a distance
+    # that is right at the threshold
+    distance = edit_distance(first, second, int((1 - threshold) * length + 1e-9))
+    score = 1 - distance / length
+    return score if score >= threshold else 0.0
+
+
+class FuzzyIndex:
+    """
+    Trigram index of the `candidates`. Candidates are compared case-folded, with whitespace collapsed;
+    the ones that are equal after that are matched as the first one of them.
+    At most `limit` best ranked pairs of a span of the text and a candidate are checked with the edit distance.
+    """
+
+    def __init__(self, candidates: Iterable[str], limit: int = 8):
+        self.limit = limit
+        self.candidates: List[str] = []
+        self._keys: Dict[str, int] = dict()
+        self._sizes: List[int] = []
+        self.max_words = 0
+        postings: Dict[str, List[int]] = dict()
+        for candidate in candidates:
+            key = normalize(candidate)
+            if not key or key in self._keys:
+                continue
+            index = self._keys[key] = len(self.candidates)
+            self.candidates.append(candidate)
+            grams = get_grams(key)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(index)
+            self.max_words = max(self.max_words, len(WORD.findall(key)) or 1)
+        self._key_list = list(self._keys)
+        if numpy is None:
+            self._postings = {gram: tuple(ids) for gram, ids in postings.items()}
+            return
+        # postings of all the grams in one array, the ones of the gram with id `i` are at offsets[i]:offsets[i + 1]
+        self._gram_ids = {gram: idx for idx, gram in enumerate(postings)}
+        self._offsets = numpy.cumsum([0] + [len(ids) for ids in postings.values()], dtype=numpy.int64)
+        self._postings = numpy.fromiter(chain.from_iterable(postings.values()), dtype=numpy.int64)
+        self._size_array = numpy.array(self._sizes, dtype=numpy.float64)
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    def spans(self, text: str) -> List[str]:
+        """
+        Get the normalized spans of the text of up to the maximum number of words of a candidate.
+        """
+        words = [match.span() for match in WORD.finditer(text)]
+        return [
+            normalize(text[start:end])
+            for first, (start, _) in enumerate(words)
+            for _, end in words[first : first + self.max_words]
+        ]
+
+    def _rank(self, spans: Sequence[List[str]]) -> List[Tuple[int, int]]:
+        """
+        Get the best pairs of a span and a candidate by the Dice coefficient of their trigrams.
+        Ties are broken by the lower span and then the lower candidate index, the same as in the vectorized ranking.
+        """
+        scores = []
+        for span, grams in enumerate(spans):
+            counts = Counter(chain.from_iterable(self._postings[gram] for gram in grams if gram in self._postings))
+            scores.extend(
+                (-2 * count / (len(grams) + self._sizes[candidate]), span, candidate)
+                for candidate, count in counts.items()
+            )
+        return [(span, candidate) for _, span, candidate in heapq.nsmallest(self.limit, scores)]
+
+    def _rank_vectorized(self, spans: Sequence[List[str]]) -> List[Tuple[int, int]]:
+        pairs = [
+            (span, self._gram_ids[gram]) for span, grams in enumerate(spans) for gram in grams if gram in self._gram_ids
+        ]
+        if not pairs:
+            return []
+        span_ids, gram_ids = numpy.array(pairs, dtype=numpy.int64).T
+        starts, lengths = self._offsets[gram_ids], self._offsets[gram_ids + 1] - self._offsets[gram_ids]
+        # gather the postings of every (span, gram) pair into one array of candidates
+        shifts = numpy.repeat(starts - (numpy.cumsum(lengths) - lengths), lengths)
+        candidates = self._postings[numpy.arange(lengths.sum()) + shifts]
+        keys, counts = numpy.unique(numpy.repeat(span_ids, lengths) * len(self) + candidates, return_counts=True)
+        span_ids, candidates = numpy.divmod(keys, len(self))
+        span_sizes = numpy.array([len(grams) for grams in spans], dtype=numpy.float64)
+        scores = 2 * counts / (span_sizes[span_ids] + self._size_array[candidates])
+        # the pairs are sorted by span and candidate, so a stable sort keeps the lower ones first on ties
+        best = numpy.argsort(-scores, kind="stable")[: self.limit]
+        return [(int(span_ids[idx]), int(candidates[idx])) for idx in best]
+
+    def search(self, text: str, threshold: float = 0.8) -> Optional[Tuple[str, float]]:
+        """
+        Find the candidate most similar to a span of the text, with its similarity, if it reaches the threshold.
+        """
+        spans = self.spans(text)
+        exact = [self._keys[span] for span in spans if span in self._keys]
+        if exact:
+            return self.candidates[max(exact, key=lambda index: len(self._key_list[index]))], 1.0
+        grams = [get_grams(span) for span in spans]
+        pairs = self._rank(grams) if numpy is None else self._rank_vectorized(grams)
+        best, best_score = None, 0.0
+        for span, candidate in pairs:
+            score = similarity(spans[span], self._key_list[candidate], max(threshold, best_score))
+            if score > best_score:
+                best, best_score = candidate, score
+        return (self.candidates[best], best_score) if best is not None else None
+
+    def best(self, text: str, threshold: float = 0.8) -> Optional[str]:
+        if not isinstance(text, str) or not self.candidates:
+            return None
+        found = self.search(text, threshold)
+        return found[0] if found is not None else None
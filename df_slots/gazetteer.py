@@ -0,0 +1,144 @@
+"""
+Multi-pattern matching of vocabularies with an Aho-Corasick automaton.
+The automaton is built once from all the entries of a vocabulary and finds every occurrence of any of them
+in a single pass over a text, so the cost of a lookup does not grow with the size of the vocabulary.
+"""
+
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# transitions are stored in one dictionary keyed by `state << CHAR_BITS | ord(char)`
+CHAR_BITS = 21
+
+
+def load_vocabulary(path: str) -> List[str]:
+    """
+    Read a vocabulary file with one entry per line. Surrounding whitespace and empty lines are skipped.
+    """
+    with open(path, encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class Automaton:
+    """
+    Aho-Corasick automaton over the `entries` of a vocabulary.
+    Unless `case_sensitive` is set, entries and texts are compared after case folding.
+    With `word_boundaries`, only the occurrences that are not preceded or followed by a word character are matched.
+    Entries that are equal after case folding are matched as the first one of them.
+    """
+
+    def __init__(self, entries: Iterable[str], case_sensitive: bool = False, word_boundaries: bool = True):
+        self.case_sensitive = case_sensitive
+        self.word_boundaries = word_boundaries
+        self.entries: List[str] = []
+        self._lengths: List[int] = []
+        self._goto: Dict[int, int] = dict()
+        self._fail: List[int] = [0]
+        self._outputs: Dict[int, Tuple[int, ...]] = dict()
+        keys: Dict[str, int] = dict()
+        for entry in entries:
+            key = self.fold(entry)
+            if not key or key in keys:
+                continue
+            keys[key] = len(self.entries)
+            self.entries.append(entry)
+            self._lengths.append(len(key))
+        for key, index in keys.items():
+            self._insert(key, index)
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def fold(self, text: str) -> str:
+        return text if self.case_sensitive else text.casefold()
+
+    def _insert(self, key: str, index: int):
+        goto = self._goto
+        state = 0
+        for char in key:
+            transition = state << CHAR_BITS | ord(char)
+            next_state = goto.get(transition)
+            if next_state is None:
+                next_state = goto[transition] = len(self._fail)
+                self._fail.append(0)
+            state = next_state
+        self._outputs[state] = (index,)
+
+    def _link(self):
+        """
+        Compute the failure links breadth-first and merge the outputs of every state with those of its failure state.
+        """
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        children: Dict[int, List[Tuple[int, int]]] = dict()
+        for transition, child in goto.items():
+            children.setdefault(transition >> CHAR_BITS, []).append((transition & ((1 << CHAR_BITS) - 1), child))
+        queue = deque(child for _, child in children.get(0, ()))
+        while queue:
+            state = queue.popleft()
+            for code, child in children.get(state, ()):
+                link = fail[state]
+                while link and (link << CHAR_BITS | code) not in goto:
+                    link = fail[link]
+                fail[child] = goto.get(link << CHAR_BITS | code, 0)
+                if fail[child] in outputs:
+                    outputs[child] = outputs.get(child, ()) + outputs[fail[child]]
+                queue.append(child)
+
+    def matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """
+        Yield the occurrences of the entries in the text as `(start, end, entry index)`, ordered by their end.
+        Positions refer to the case-folded text.
+        """
+        text = self.fold(text)
+        goto, fail, outputs, lengths = self._goto, self._fail, self._outputs, self._lengths
+        size = len(text)
+        state = 0
+        for end, char in enumerate(text, 1):
+            code = ord(char)
+            next_state = goto.get(state << CHAR_BITS | code)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto.get(state << CHAR_BITS | code)
+            state = next_state or 0
+            found = outputs.get(state)
+            if found is None:
+                continue
+            for index in found:
+                start = end - lengths[index]
+                if self.word_boundaries and (
+                    (start > 0 and is_word_char(text[start - 1])) or (end < size and is_word_char(text[end]))
+                ):
+                    continue
+                yield start, end, index
+
+    def longest(self, text: str) -> Optional[str]:
+        """
+        Get the longest entry found in the text, the first one of them if there are several.
+        """
+        best, best_start, best_length = None, 0, 0
+        for start, end, index in self.matches(text):
+            length = end - start
+            if length > best_length or (length == best_length and start < best_start):
+                best, best_start, best_length = index, start, length
+        return self.entries[best] if best is not None else None
+
+    def all(self, text: str) -> Optional[List[str]]:
+        """
+        Get all the entries found in the text, including the overlapping ones, in the order of their occurrence.
+        """
+        found = sorted((start, start - end, index) for start, end, index in self.matches(text))
+        return [self.entries[index] for _, _, index in found] or None
+
+
+def search_vocabulary(matcher: Any, text: str, all_matches: bool = False) -> Any:
+    """
+    Search a text with an automaton or with any other matcher that has the same `longest` and `all` methods.
+    """
+    if not isinstance(text, str):
+        return None
+    return matcher.all(text) if all_matches else matcher.longest(text)
@@ -1,31 +1,82 @@
-from typing import Dict, Optional, List
+from concurrent.futures import Executor
+from typing import Optional, List, Dict, Union
 
 from df_engine.core import Context, Actor
 
-from .slot_types import BaseSlot, GroupSlot
-from .root import root
+from .slot_types import BaseSlot
+from .extraction import extract_slots, extract_slots_async, store_values, extract_batch as extract_slots_batch
+from .template import compile_template
+from .root import root, get_top_level
+from . import instrumentation
 
 
-def extract(ctx: Context, actor: Actor, slots: Optional[List[str]] = None, root: dict = root) -> list:
+def extract(
+    ctx: Context,
+    actor: Actor,
+    slots: Optional[List[str]] = None,
+    root: dict = root,
+    executor: Optional[Executor] = None,
+) -> list:
+    """
+    Extract slot values to the context storage and return them.
+    Cpu-bound function slots are run in the `executor` (a thread or a process pool), if one is given.
+    """
     storage = ctx.framework_states.get("slots")
     if storage is None:
         raise ValueError("Failed to get slot values: root slot not in context")
 
     target_names = slots or list(root.keys())
-    results = []
-    for name in target_names:
-        if name not in root:
-            results.append(None)
-            continue
-        target_slot: BaseSlot = root.get(name)
-        val = target_slot.extract_value(ctx, actor)
-        if isinstance(target_slot, GroupSlot):
-            ctx.framework_states["slots"].update(val)
-        else:
-            ctx.framework_states["slots"][name] = val
-        results.append(val)
-
-    return results
+    found_names = [name for name in target_names if name in root]
+    found_slots: List[BaseSlot] = [root.get(name) for name in found_names]
+    with instrumentation.timer("extract_seconds", "handlers"):
+        values = extract_slots(ctx, actor, found_slots, executor)
+        store_values(ctx, found_names, found_slots, values)
+    found = dict(zip(found_names, values))
+    return [found.get(name) for name in target_names]
+
+
+async def extract_async(
+    ctx: Context,
+    actor: Actor,
+    slots: Optional[List[str]] = None,
+    root: dict = root,
+    max_concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    executor: Optional[Executor] = None,
+) -> list:
+    """
+    Asynchronous version of :py:func:`extract`: function slots are extracted concurrently,
+    at most `max_concurrency` at a time and with a `timeout` in seconds per slot.
+    """
+    storage = ctx.framework_states.get("slots")
+    if storage is None:
+        raise ValueError("Failed to get slot values: root slot not in context")
+
+    target_names = slots or list(root.keys())
+    found_names = [name for name in target_names if name in root]
+    found_slots: List[BaseSlot] = [root.get(name) for name in found_names]
+    with instrumentation.timer("extract_seconds", "handlers"):
+        values = await extract_slots_async(ctx, actor, found_slots, max_concurrency, timeout, executor)
+        store_values(ctx, found_names, found_slots, values)
+    found = dict(zip(found_names, values))
+    return [found.get(name) for name in target_names]
+
+
+def extract_batch(
+    requests: List[Union[Context, str]],
+    actor: Optional[Actor] = None,
+    slots: Optional[List[str]] = None,
+    root: dict = root,
+    executor: Optional[Executor] = None,
+) -> Dict[str, list]:
+    """
+    Extract slots from many contexts or raw requests at once, e.g. to score dialog logs offline.
+    Groups are expanded to their leaves. Nothing is written to the context storage.
+    Returns a mapping from leaf slot names to the lists of values, one per request.
+    """
+    target_names = slots or list(root.keys())
+    found_slots: List[BaseSlot] = [root.get(name) for name in target_names if name in root]
+    return extract_slots_batch(requests, actor, found_slots, executor)
 
 
 def get_values(ctx: Context, actor: Actor, slots: Optional[List[str]] = None) -> list:
@@ -39,18 +90,15 @@ def get_values(ctx: Context, actor: Actor, slots: Optional[List[str]] = None) ->
 
 def get_filled_template(template: str, ctx: Context, actor: Actor, slots: Optional[List[str]] = None) -> str:
 
-    filler_nodes: Dict[str, BaseSlot]
     if slots:
-        filler_nodes = {key: value for key, value in root.items() if key in slots}
+        has_filler_nodes = any(key in root for key in slots)
     else:
-        filler_nodes = {key: value for key, value in root.items() if "/" not in key}
+        has_filler_nodes = bool(get_top_level(root))
 
-    if not filler_nodes:
+    if not has_filler_nodes:
         raise ValueError(
             "Given subset does not intersect with slots in root: {}".format(", ".join(slots) if slots else str(None))
         )
 
-    for _, slot in filler_nodes.items():
-        template = slot.fill_template(template)(ctx, actor)
-
-    return template
+    with instrumentation.timer("template_render_seconds", "handlers"):
+        return compile_template(template).render(ctx, root, slots or None)
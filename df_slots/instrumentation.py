@@ -0,0 +1,187 @@
+"""
+Optional instrumentation of the slot hot paths.
+Nothing is measured until a sink is installed with :py:func:`set_sink`; when no sink is installed,
+a hook is a global lookup and, at most, a no-op context manager.
+
+Metrics:
+
+- `extract_seconds`, label: `processing` or `handlers`: duration of an extraction call.
+- `slot_extraction_seconds`, label: slot name: duration of extracting a leaf, except for the regexp slots.
+- `regexp_plan_seconds`, label: `plan`: duration of the shared regexp search of an extraction call.
+- `slot_match_total`, `slot_no_match_total`, label: slot name: extracted values that are set or `None`.
+- `slot_memo_hit_total`, `slot_memo_miss_total`, label: slot name: lookups in the memo of the turn.
+- `slot_cache_hit_total`, label: slot name: values of deterministic slots taken from the process-wide cache.
+- `slot_unchanged_total`, label: slot name: values of slots with declared inputs that did not change, reused.
+- `slot_regexp_timeout_total`, label: slot name: regexp searches stopped by the time budget of the slot.
+- `slot_regexp_oversize_total`, label: slot name: requests not searched as they exceed the length cap of the slot.
+- `template_render_seconds`, label: `processing`, `response` or `handlers`: duration of filling a template.
+- `condition_seconds`, label: condition: duration of a slot condition check.
+- `condition_true_total`, `condition_false_total`, label: condition: results of the slot condition checks.
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsSink:
+    """
+    Base class of the instrumentation sinks.
+    """
+
+    def observe(self, metric: str, label: str, seconds: float):
+        raise NotImplementedError
+
+    def count(self, metric: str, label: str, value: int = 1):
+        raise NotImplementedError
+
+
+class Summary:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        return {"count": self.count, "total": self.total, "max": self.max}
+
+
+class InMemorySink(MetricsSink):
+    """
+    Aggregate the counters and the count, total and maximum of the durations in memory.
+    """
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, str], int] = dict()
+        self.summaries: Dict[Tuple[str, str], Summary] = dict()
+        self._lock = threading.Lock()
+
+    def observe(self, metric: str, label: str, seconds: float):
+        with self._lock:
+            summary = self.summaries.get((metric, label))
+            if summary is None:
+                summary = self.summaries[(metric, label)] = Summary()
+            summary.add(seconds)
+
+    def count(self, metric: str, label: str, value: int = 1):
+        with self._lock:
+            self.counters[(metric, label)] = self.counters.get((metric, label), 0) + value
+
+    def clear(self):
+        with self._lock:
+            self.counters.clear()
+            self.summaries.clear()
+
+    def get_counter(self, metric: str, label: str) -> int:
+        return self.counters.get((metric, label), 0)
+
+    def get_summary(self, metric: str, label: str) -> Optional[Dict[str, float]]:
+        summary = self.summaries.get((metric, label))
+        return summary.as_dict() if summary is not None else None
+
+    def to_prometheus(self, prefix: str = "df_slots_") -> str:
+        """
+        Dump the metrics in the Prometheus text exposition format:
+        durations as summaries with `_count` and `_sum` samples, counters as they are.
+        """
+        with self._lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted((key, summary.as_dict()) for key, summary in self.summaries.items())
+        lines: List[str] = []
+        metric = None
+        for (name, label), summary in summaries:
+            if name != metric:
+                metric = name
+                lines.append(f"# TYPE {prefix}{name} summary")
+            lines.append(f'{prefix}{name}_count{{name="{escape(label)}"}} {summary["count"]}')
+            lines.append(f'{prefix}{name}_sum{{name="{escape(label)}"}} {summary["total"]!r}')
+        for (name, label), value in counters:
+            if name != metric:
+                metric = name
+                lines.append(f"# TYPE {prefix}{name} counter")
+            lines.append(f'{prefix}{name}{{name="{escape(label)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+class LoggingSink(MetricsSink):
+    """
+    Log every measurement with the given level.
+    """
+
+    def __init__(self, logger: logging.Logger = logger, level: int = logging.DEBUG):
+        self.logger = logger
+        self.level = level
+
+    def observe(self, metric: str, label: str, seconds: float):
+        self.logger.log(self.level, f"{metric}[{label}] {seconds * 1000:.3f} ms")
+
+    def count(self, metric: str, label: str, value: int = 1):
+        self.logger.log(self.level, f"{metric}[{label}] +{value}")
+
+
+def escape(label: str) -> str:
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+sink: Optional[MetricsSink] = None
+
+
+def set_sink(new_sink: Optional[MetricsSink]):
+    """
+    Install a sink for the instrumentation, or disable it with `None`.
+    """
+    global sink
+    sink = new_sink
+
+
+def get_sink() -> Optional[MetricsSink]:
+    return sink
+
+
+class Timer:
+    __slots__ = ("sink", "metric", "label", "start")
+
+    def __init__(self, sink: MetricsSink, metric: str, label: str):
+        self.sink = sink
+        self.metric = metric
+        self.label = label
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.sink.observe(self.metric, self.label, time.perf_counter() - self.start)
+
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+def timer(metric: str, label: str):
+    """
+    Context manager that reports the duration of its body to the installed sink, if any.
+    """
+    if sink is None:
+        return NULL_TIMER
+    return Timer(sink, metric, label)
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+
+class MemoStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class ExtractionCache:
+    """
+    Process-wide LRU cache of the values of deterministic function slots, keyed on the function and the request.
+    Shared by all contexts, so a deterministic slot is computed once per distinct request across users.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.stats = MemoStats()
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            if key not in self._data:
+                self.stats.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return True, self._data[key]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+extraction_cache = ExtractionCache()
+
+turn_memo_stats = MemoStats()
+
+input_memo_stats = MemoStats()
+
+
+def get_memo_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Hit and miss counters of the per-turn extraction memo, of the process-wide cache
+    and of the memo of the slots with declared inputs.
+    """
+    return {
+        "turn": turn_memo_stats.as_dict(),
+        "cache": extraction_cache.stats.as_dict(),
+        "inputs": input_memo_stats.as_dict(),
+    }
+
+
+def reset_memo_stats():
+    turn_memo_stats.reset()
+    extraction_cache.stats.reset()
+    input_memo_stats.reset()
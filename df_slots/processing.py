@@ -1,33 +1,79 @@
 import logging
-from typing import Union, List, Callable
+from concurrent.futures import Executor
+from typing import Union, List, Callable, Optional
 from functools import partial
 
 from df_engine.core import Context, Actor
 from df_generics import Response
 
-from .slot_types import BaseSlot, GroupSlot
+from .slot_types import BaseSlot, run_coroutine
+from .extraction import extract_slots, extract_slots_async, store_values, defer_values
+from .storage import SlotStorage
+from .template import compile_template
 from .root import root
+from . import instrumentation
 
 logger = logging.getLogger(__name__)
 
 
-def extract(slots: Union[None, List[str]], root: dict = root) -> Callable:
+def extract(
+    slots: Union[None, List[str]], root: dict = root, executor: Optional[Executor] = None, lazy: bool = False
+) -> Callable:
+    """
+    Extract slot values to the context storage.
+    Cpu-bound function slots are run in the `executor` (a thread or a process pool), if one is given.
+    With `lazy=True` the values are only extracted when they are first read in the turn,
+    e.g. by a condition, a handler or a template; this requires the storage of
+    :py:func:`~df_slots.root.register_storage`, otherwise the values are extracted right away.
+    Values that are not read by the end of the turn are never extracted, and their slots keep their previous values.
+    """
+
     def extract_inner(ctx: Context, actor: Actor):
         storage = ctx.framework_states.get("slots")
         if storage is None:
             logger.warning("Failed to extract slots: storage not in context")
             return ctx
 
-        target_names = slots or list(root.keys())
-        for key in target_names:
-            if not key in root:
-                continue
-            target_slot: BaseSlot = root.get(key)
-            val = target_slot.extract_value(ctx, actor)
-            if isinstance(target_slot, GroupSlot):
-                ctx.framework_states["slots"].update(val)
-            else:
-                ctx.framework_states["slots"][key] = val
+        target_names = [key for key in slots or list(root.keys()) if key in root]
+        target_slots: List[BaseSlot] = [root.get(key) for key in target_names]
+        with instrumentation.timer("extract_seconds", "processing"):
+            if lazy and isinstance(storage, SlotStorage):
+                defer_values(ctx, actor, target_names, target_slots, executor)
+                return ctx
+            values = extract_slots(ctx, actor, target_slots, executor)
+            store_values(ctx, target_names, target_slots, values)
+        return ctx
+
+    return extract_inner
+
+
+def extract_async(
+    slots: Union[None, List[str]],
+    root: dict = root,
+    max_concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    executor: Optional[Executor] = None,
+) -> Callable:
+    """
+    Same as :py:func:`extract`, but function slots are extracted concurrently,
+    at most `max_concurrency` at a time and with a `timeout` in seconds per slot.
+    The actor calls processing functions synchronously, so the turn waits for all slots to finish.
+    If an event loop is running in the calling thread, the extraction runs in a helper thread
+    and blocks the loop until it finishes; asynchronous code should await
+    :py:func:`df_slots.handlers.extract_async` instead.
+    """
+
+    def extract_inner(ctx: Context, actor: Actor) -> Context:
+        storage = ctx.framework_states.get("slots")
+        if storage is None:
+            logger.warning("Failed to extract slots: storage not in context")
+            return ctx
+
+        target_names = [key for key in slots or list(root.keys()) if key in root]
+        target_slots: List[BaseSlot] = [root.get(key) for key in target_names]
+        with instrumentation.timer("extract_seconds", "processing"):
+            values = run_coroutine(extract_slots_async(ctx, actor, target_slots, max_concurrency, timeout, executor))
+            store_values(ctx, target_names, target_slots, values)
         return ctx
 
     return extract_inner
@@ -42,10 +88,9 @@ def fill_template(root: dict = root):
             response = response(ctx, actor)
 
         # process response
-        filler_nodes = {key: value for key, value in root.items() if "/" not in key}
-        new_template = response if isinstance(response, str) else response.text
-        for _, slot in filler_nodes.items():
-            new_template = slot.fill_template(new_template)(ctx, actor)
+        template = compile_template(response if isinstance(response, str) else response.text)
+        with instrumentation.timer("template_render_seconds", "processing"):
+            new_template = template.render(ctx, root)
 
         # assign to node
         if isinstance(response, str):
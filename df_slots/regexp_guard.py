@@ -0,0 +1,391 @@
+"""
+Protection against catastrophic backtracking in regular expressions.
+Patterns are analyzed when a slot is created: nested quantifiers and alternations of overlapping branches
+inside a repeat can take exponential time on adversarial inputs, adjacent overlapping quantifiers polynomial time.
+At runtime a search can be limited by a cap on the input length and by a time budget,
+and risky patterns are run by the linear-time `re2` engine if the `google-re2` package is installed
+and it matches the pattern the same way as `re`.
+"""
+
+import re
+import signal
+import string
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Callable, FrozenSet, List, NamedTuple, Optional, Tuple
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:  # python < 3.11
+    import sre_parse
+    import sre_constants
+
+try:
+    import re2
+except ImportError:  # risky patterns are run by `re` under the configured limits
+    re2 = None
+
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Raise on registration of patterns prone to exponential backtracking instead of logging a warning.
+strict = False
+
+# characters the sets of a pattern are compared on
+PROBE = frozenset(string.printable + " éßЖж٣中")
+CATEGORIES = {
+    getattr(sre_constants, name): frozenset(char for char in PROBE if re.match(pattern, char))
+    for name, pattern in [
+        ("CATEGORY_DIGIT", r"\d"),
+        ("CATEGORY_NOT_DIGIT", r"\D"),
+        ("CATEGORY_SPACE", r"\s"),
+        ("CATEGORY_NOT_SPACE", r"\S"),
+        ("CATEGORY_WORD", r"\w"),
+        ("CATEGORY_NOT_WORD", r"\W"),
+    ]
+}
+REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+# `re2` only matches ASCII characters by the classes and word boundaries;
+# the parser constants are compared by name, as the opcodes of different kinds share values
+UNICODE_NODES = frozenset(
+    [category.name for category in CATEGORIES]
+    + [category.name.replace("CATEGORY_", "CATEGORY_UNI_") for category in CATEGORIES]
+    + ["AT_BOUNDARY", "AT_NON_BOUNDARY", "AT_UNI_BOUNDARY", "AT_UNI_NON_BOUNDARY"]
+)
+INLINE_FLAGS = ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"))
+
+
+class BacktrackingRisk(NamedTuple):
+    # "exponential" or "polynomial"
+    kind: str
+    description: str
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class InputTooLong(Exception):
+    pass
+
+
+def is_variable_repeat(op: Any, av: Any) -> bool:
+    return op in REPEATS and av[1] > 1 and av[1] != av[0]
+
+
+class PatternAnalyzer:
+    """
+    Static analysis of a parsed pattern. Sets of characters are approximated by their intersection
+    with a probe alphabet, so overlaps between exotic characters may be missed.
+    """
+
+    def __init__(self, pattern: re.Pattern):
+        self.pattern = pattern
+        self.ignore_case = bool(pattern.flags & re.IGNORECASE)
+        self.risks: List[BacktrackingRisk] = []
+
+    def literal(self, code: int) -> FrozenSet[str]:
+        char = chr(code)
+        return frozenset((char, char.lower(), char.upper())) if self.ignore_case else frozenset((char,))
+
+    def set_chars(self, items: list) -> FrozenSet[str]:
+        chars, negate = set(), False
+        for op, av in items:
+            if op is sre_constants.NEGATE:
+                negate = True
+            elif op is sre_constants.LITERAL:
+                chars |= self.literal(av)
+            elif op is sre_constants.RANGE:
+                chars.update(char for char in PROBE if av[0] <= ord(char) <= av[1])
+            elif op is sre_constants.CATEGORY:
+                chars |= CATEGORIES.get(av, PROBE)
+        return PROBE - chars if negate else frozenset(chars)
+
+    def item_first(self, op: Any, av: Any) -> Tuple[FrozenSet[str], bool]:
+        """
+        Characters an item can start with and whether it can match the empty string.
+        """
+        if op is sre_constants.LITERAL:
+            return self.literal(av), False
+        if op is sre_constants.NOT_LITERAL:
+            return PROBE - self.literal(av), False
+        if op is sre_constants.ANY:
+            return PROBE, False
+        if op is sre_constants.IN:
+            return self.set_chars(av), False
+        if op is sre_constants.SUBPATTERN:
+            return self.first(av[-1])
+        if op is sre_constants.BRANCH:
+            firsts = [self.first(branch) for branch in av[1]]
+            return frozenset().union(*(chars for chars, _ in firsts)), any(nullable for _, nullable in firsts)
+        if op in REPEATS:
+            chars, nullable = self.first(av[2])
+            return chars, nullable or av[0] == 0
+        if op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            return frozenset(), True
+        return PROBE, True
+
+    def first(self, items: list) -> Tuple[FrozenSet[str], bool]:
+        chars = frozenset()
+        for op, av in items:
+            item_chars, nullable = self.item_first(op, av)
+            chars |= item_chars
+            if not nullable:
+                return chars, False
+        return chars, True
+
+    def chars(self, items: list) -> FrozenSet[str]:
+        """
+        Characters any part of the items can match.
+        """
+        chars = frozenset()
+        for op, av in items:
+            if op is sre_constants.SUBPATTERN:
+                chars |= self.chars(av[-1])
+            elif op is sre_constants.BRANCH:
+                chars = chars.union(*(self.chars(branch) for branch in av[1]))
+            elif op in REPEATS:
+                chars |= self.chars(av[2])
+            else:
+                chars |= self.item_first(op, av)[0]
+        return chars
+
+    def flatten(self, items: list) -> list:
+        # capturing and non-capturing groups do not change how a sequence backtracks
+        flat = []
+        for op, av in items:
+            if op is sre_constants.SUBPATTERN:
+                flat.extend(self.flatten(av[-1]))
+            else:
+                flat.append((op, av))
+        return flat
+
+    def check_repeat(self, body: list):
+        items = self.flatten(body)
+        for idx, (op, av) in enumerate(items):
+            if is_variable_repeat(op, av):
+                # the next iteration of the outer repeat follows the rest of the body
+                following, nullable = self.first(items[idx + 1 :] + items[:idx])
+                if nullable or following & self.chars(av[2]):
+                    self.add("exponential", "nested quantifiers can split the same text in many ways")
+            elif op is sre_constants.BRANCH:
+                firsts = [self.first(branch)[0] for branch in av[1]]
+                for first_idx, chars in enumerate(firsts):
+                    if any(chars & other for other in firsts[first_idx + 1 :]):
+                        self.add("exponential", "alternation of overlapping branches inside a repeat")
+                        break
+
+    def check_sequence(self, items: list):
+        items = self.flatten(items)
+        for idx, (op, av) in enumerate(items):
+            if not is_variable_repeat(op, av) or av[1] != sre_constants.MAXREPEAT:
+                continue
+            for next_idx in range(idx + 1, len(items)):
+                next_op, next_av = items[next_idx]
+                if (
+                    is_variable_repeat(next_op, next_av)
+                    and next_av[1] == sre_constants.MAXREPEAT
+                    and self.chars(av[2]) & self.chars(next_av[2])
+                ):
+                    # the text is only split between them in many ways when something after them can fail
+                    if next_idx + 1 < len(items):
+                        self.add("polynomial", "adjacent quantifiers match the same characters")
+                    break
+                if not self.item_first(next_op, next_av)[1]:
+                    break
+
+    def walk(self, items: list):
+        self.check_sequence(items)
+        for op, av in items:
+            if op is sre_constants.SUBPATTERN:
+                self.walk(av[-1])
+            elif op is sre_constants.BRANCH:
+                for branch in av[1]:
+                    self.walk(branch)
+            elif op in REPEATS:
+                if is_variable_repeat(op, av):
+                    self.check_repeat(av[2])
+                self.walk(av[2])
+            elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+                self.walk(av[1])
+
+    def add(self, kind: str, description: str):
+        risk = BacktrackingRisk(kind, description)
+        if risk not in self.risks:
+            self.risks.append(risk)
+
+    def analyze(self) -> List[BacktrackingRisk]:
+        try:
+            parsed = sre_parse.parse(self.pattern.pattern, self.pattern.flags)
+        except Exception:
+            return []
+        self.walk(list(parsed))
+        return self.risks
+
+
+@lru_cache(maxsize=256)
+def analyze_pattern(pattern: re.Pattern) -> Tuple[BacktrackingRisk, ...]:
+    """
+    Find the constructs of a pattern prone to catastrophic backtracking.
+    """
+    return tuple(PatternAnalyzer(pattern).analyze())
+
+
+def check_pattern(pattern: re.Pattern):
+    """
+    Warn about a pattern prone to catastrophic backtracking, or reject it if it can take exponential time
+    and the module is `strict`.
+    """
+    risks = analyze_pattern(pattern)
+    if not risks:
+        return
+    message = f"Pattern {pattern.pattern!r} is prone to catastrophic backtracking: " + "; ".join(
+        f"{risk.description} ({risk.kind})" for risk in risks
+    )
+    if strict and any(risk.kind == "exponential" for risk in risks):
+        raise ValueError(message)
+    logger.warning(message)
+
+
+def has_unicode_classes(items: Any) -> bool:
+    """
+    Check if a parsed pattern has character classes or word boundaries, which match Unicode characters in `re`.
+    """
+    for item in items:
+        if isinstance(item, (list, tuple, sre_parse.SubPattern)):
+            if has_unicode_classes(item):
+                return True
+        elif isinstance(item, int) and getattr(item, "name", None) in UNICODE_NODES:
+            return True
+    return False
+
+
+def compile_linear(pattern: re.Pattern) -> Optional[Any]:
+    """
+    Compile the pattern with the linear-time `re2` engine, or return `None` if it is not installed,
+    does not support the pattern, e.g. lookarounds and backreferences,
+    or would match differently: the classes and word boundaries of `re2` are ASCII-only,
+    so patterns with them are only moved to `re2` if they have the `re.ASCII` flag.
+    """
+    if re2 is None or not isinstance(pattern.pattern, str) or pattern.flags & re.VERBOSE:
+        return None
+    if not pattern.flags & re.ASCII:
+        try:
+            if has_unicode_classes(sre_parse.parse(pattern.pattern, pattern.flags)):
+                return None
+        except Exception:
+            return None
+    flags = "".join(flag for bit, flag in INLINE_FLAGS if pattern.flags & bit)
+    try:
+        return re2.compile(f"(?{flags}){pattern.pattern}" if flags else pattern.pattern)
+    except Exception:
+        return None
+
+
+def run_with_budget(func: Callable[[], Any], budget: float) -> Any:
+    """
+    Call `func`, raising :py:class:`BudgetExceeded` if it runs longer than `budget` seconds.
+    The budget is enforced with an interval timer, which only interrupts the main thread:
+    in other threads, or if the timer is already in use, `func` runs without a budget.
+    """
+    if (
+        not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+        or signal.getitimer(signal.ITIMER_REAL)[0]
+    ):
+        return func()
+
+    def on_timer(signum, frame):
+        raise BudgetExceeded()
+
+    previous = signal.signal(signal.SIGALRM, on_timer)
+    signal.setitimer(signal.ITIMER_REAL, budget)
+    try:
+        return func()
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+class RegexpGuard:
+    """
+    Bounded search of a slot pattern: :py:class:`InputTooLong` is raised for a text longer than `max_length`
+    characters, the `linear` engine is used if one is given, and :py:class:`BudgetExceeded` is raised
+    if the `re` search takes longer than `time_budget` seconds.
+    A long text is not cut, as anchors, word boundaries and lookarounds would match at the cut.
+    """
+
+    __slots__ = ("pattern", "max_length", "time_budget", "linear")
+
+    def __init__(
+        self,
+        pattern: re.Pattern,
+        max_length: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        linear: Optional[Any] = None,
+    ):
+        self.pattern = pattern
+        self.max_length = max_length
+        self.time_budget = time_budget
+        self.linear = linear
+
+    def __reduce__(self):
+        return type(self), (self.pattern, self.max_length, self.time_budget, compile_linear(self.pattern))
+
+    def search(self, text: str, searcher: Optional[Callable[[Any, str], Any]] = None) -> Any:
+        """
+        Search the text with the pattern or its linear form: `searcher(pattern, text)` gets the value
+        from the pattern, by default the first match.
+        """
+        if self.max_length is not None and len(text) > self.max_length:
+            raise InputTooLong()
+        engine = self.linear or self.pattern
+        searcher = searcher or search_first
+        if self.linear is not None or self.time_budget is None:
+            return searcher(engine, text)
+        return run_with_budget(lambda: searcher(engine, text), self.time_budget)
+
+
+def search_first(pattern: Any, text: str) -> Optional[str]:
+    search = pattern.search(text)
+    return search.group() if search else None
+
+
+def search_guarded(
+    guard: RegexpGuard, text: str, name: str, searcher: Optional[Callable[[Any, str], Any]] = None
+) -> Any:
+    """
+    Search a text with the guard of the slot `name`. A text over the length cap
+    and a search over the time budget extract nothing.
+    """
+    try:
+        return guard.search(text, searcher)
+    except InputTooLong:
+        logger.warning(f"Slot {name}: the text of {len(text)} characters exceeds the cap of {guard.max_length}")
+        sink = instrumentation.sink
+        if sink is not None:
+            sink.count("slot_regexp_oversize_total", name)
+        return None
+    except BudgetExceeded:
+        logger.warning(f"Slot {name}: the search exceeded its time budget of {guard.time_budget}s")
+        sink = instrumentation.sink
+        if sink is not None:
+            sink.count("slot_regexp_timeout_total", name)
+        return None
+
+
+def get_guard(
+    pattern: Optional[re.Pattern], max_length: Optional[int] = None, time_budget: Optional[float] = None
+) -> Optional[RegexpGuard]:
+    """
+    Get the guard of a slot pattern, or `None` if the pattern can be searched as is:
+    it has no limits and either is not risky or cannot be run by a linear engine.
+    """
+    if pattern is None:
+        return None
+    linear = compile_linear(pattern) if analyze_pattern(pattern) else None
+    if linear is None and max_length is None and time_budget is None:
+        return None
+    return RegexpGuard(pattern, max_length, time_budget, linear)
@@ -3,21 +3,21 @@ from typing import Union
 from df_generics import Response
 from df_engine.core import Context, Actor
 
+from .template import compile_template
 from .root import root
+from . import instrumentation
 
 
 def fill_template(template: Union[str, Response]):
-    def fill_inner(ctx: Context, actor: Actor):
+    compiled = compile_template(template if isinstance(template, str) else template.text)
 
-        filler_nodes = {key: value for key, value in root.items() if "/" not in key}
+    def fill_inner(ctx: Context, actor: Actor):
 
-        new_template = template if isinstance(template, str) else template.text
-        for _, slot in filler_nodes.items():
-            new_template = slot.fill_template(new_template)(ctx, actor)
+        with instrumentation.timer("template_render_seconds", "response"):
+            new_template = compiled.render(ctx, root)
 
         if isinstance(template, Response):
-            template.text = new_template
-            return template
+            return template.copy(update={"text": new_template})
 
         return new_template
 
@@ -1,58 +1,224 @@
 import functools
-from typing import Callable, List, Union, Dict, Tuple
+from types import MappingProxyType
+from typing import Any, Callable, Iterator, List, Optional, Union, Dict
 
 from pydantic.main import ModelMetaclass
 
 from df_engine.core import Context, Actor
 from df_engine.core.actor import ActorStage
 from .slot_types import BaseSlot
+from .storage import SlotStorage, OverlayStorage, as_slot_storage
+from .backends import StorageBackend
+from .dependencies import check_dependencies
 
-root = dict()
+
+class SlotRegistry(dict):
+    """
+    Dictionary of slots by their paths, e.g. `person/username`, indexed with a prefix tree
+    over the path segments. Subtree, top-level and ancestor lookups take time proportional
+    to the size of the result rather than to the number of registered slots.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._tree: Dict[str, dict] = dict()
+        self.version = 0
+        self.update(*args, **kwargs)
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+    def _node(self, name: str) -> Optional[dict]:
+        node = self._tree
+        for segment in name.split("/"):
+            node = node.get(segment)
+            if node is None:
+                return None
+        return node
+
+    def _insert(self, name: str):
+        node = self._tree
+        for segment in name.split("/"):
+            node = node.setdefault(segment, dict())
+
+    def _discard(self, name: str):
+        segments = name.split("/")
+        nodes = [self._tree]
+        for segment in segments:
+            node = nodes[-1].get(segment)
+            if node is None:
+                return
+            nodes.append(node)
+        # prune the branch up to the closest node that is still in use
+        for idx in range(len(segments), 0, -1):
+            path = "/".join(segments[:idx])
+            if nodes[idx] or (idx < len(segments) and path in self):
+                break
+            del nodes[idx - 1][segments[idx - 1]]
+
+    def _walk(self, name: str, node: dict) -> Iterator[str]:
+        if name in self:
+            yield name
+        for segment, child in node.items():
+            yield from self._walk(name + "/" + segment, child)
+
+    def __setitem__(self, key: str, value: BaseSlot):
+        if key not in self:
+            self._insert(key)
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key: str):
+        super().__delitem__(key)
+        self._discard(key)
+        self.version += 1
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key: str, default: Optional[BaseSlot] = None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key: str, *args):
+        if key not in self:
+            return super().pop(key, *args)
+        value = super().__getitem__(key)
+        del self[key]
+        return value
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._discard(key)
+        self.version += 1
+        return key, value
+
+    def clear(self):
+        super().clear()
+        self._tree.clear()
+        self.version += 1
+
+    def copy(self):
+        return type(self)(self)
+
+    def subtree(self, name: str) -> Dict[str, BaseSlot]:
+        """
+        Get the slot with the given path and all of its descendants.
+        """
+        node = self._node(name)
+        if node is None:
+            return dict()
+        return {key: self[key] for key in self._walk(name, node)}
+
+    def top_level(self) -> Dict[str, BaseSlot]:
+        return {key: self[key] for key in self._tree if key in self}
+
+    def ancestors(self, name: str) -> List[str]:
+        """
+        Get the registered ancestors of a path, starting from the top level.
+        """
+        segments = name.split("/")
+        paths = ("/".join(segments[:idx]) for idx in range(1, len(segments)))
+        return [path for path in paths if path in self]
+
+
+def get_subtree(root: dict, name: str) -> Dict[str, BaseSlot]:
+    if isinstance(root, SlotRegistry):
+        return root.subtree(name)
+    prefix = name + "/"
+    return {key: slot for key, slot in root.items() if key == name or key.startswith(prefix)}
+
+
+def get_top_level(root: dict) -> Dict[str, BaseSlot]:
+    if isinstance(root, SlotRegistry):
+        return root.top_level()
+    return {key: slot for key, slot in root.items() if "/" not in key}
+
+
+root = SlotRegistry()
 freeze_root = False
 
 
-def register_storage(actor: Actor, storage: Dict[str, str] = None) -> None:
-    if not storage:
-        storage = dict()
+def register_storage(
+    actor: Actor,
+    storage: Dict[str, str] = None,
+    backend: Optional[StorageBackend] = None,
+    codec: Optional[Any] = None,
+) -> None:
+    """
+    Give every context of the actor a slot storage that starts with the values of `storage`.
+    The values are shared by the contexts and copied on write, so creating a storage takes constant time.
+    If a `backend` is given, the values of the context are loaded from it at the start of every turn,
+    and the values changed during the turn are saved to it at the end.
+    If a :py:class:`~df_slots.codec.SlotCodec` is given, storage packed with it is decoded at the start of a turn.
+    Deferred values of lazy extraction that were not read during the turn are dropped at its end without being
+    extracted: their slots keep the values they had before the turn, and nothing is saved to the `backend` for them.
+    """
+    # contexts share a snapshot of the defaults and only keep their own changes
+    defaults = MappingProxyType(dict(storage or dict()))
 
     def create_slot_storage_inner(ctx: Context, actor: Actor, *args, **kwargs) -> None:
-        if "slots" in ctx.framework_states:
-            return
-        ctx.framework_states["slots"] = storage
+        if codec is not None and codec.is_encoded(ctx.framework_states.get("slots")):
+            ctx.framework_states["slots"] = codec.decode(ctx.framework_states["slots"])
+        elif "slots" in ctx.framework_states:
+            # storage restored from a serialized context is a plain dictionary
+            ctx.framework_states["slots"] = as_slot_storage(ctx.framework_states["slots"])
+        else:
+            ctx.framework_states["slots"] = OverlayStorage(defaults) if defaults else SlotStorage()
+        if backend is not None:
+            ctx.framework_states["slots"].load(backend.load(str(ctx.id)))
         return
 
+    def save_slot_storage_inner(ctx: Context, actor: Actor, *args, **kwargs) -> None:
+        slot_storage = ctx.framework_states.get("slots")
+        if not isinstance(slot_storage, SlotStorage):
+            return
+        slot_storage.settle()
+        if backend is None:
+            return
+        changed, deleted = slot_storage.pop_changes()
+        if changed or deleted:
+            backend.save(str(ctx.id), changed, deleted)
+
     actor.handlers[ActorStage.CONTEXT_INIT] = actor.handlers.get(ActorStage.CONTEXT_INIT, []) + [
         create_slot_storage_inner
     ]
+    actor.handlers[ActorStage.FINISH_TURN] = actor.handlers.get(ActorStage.FINISH_TURN, []) + [save_slot_storage_inner]
 
 
-def flatten_slot_tree(node: BaseSlot) -> Tuple[Dict[str, BaseSlot], Dict[str, BaseSlot]]:
-    add_nodes = {node.name: node}
-    remove_nodes = {}
+def flatten_slot_tree(node: BaseSlot) -> Dict[str, BaseSlot]:
+    """
+    Get the slots of a tree by path. The children of groups are already named by their paths,
+    see :py:meth:`~df_slots.slot_types.GroupSlot.nest_children`, so the tree is left as it is.
+    """
+    nodes = {node.name: node}
     if node.has_children():
-        for name, child in node.children.items():
-            remove_nodes.update({child.name: child})
-            child.name = "/".join([node.name, name])
-            child_add_nodes, child_remove_nodes = flatten_slot_tree(child)
-            add_nodes.update(child_add_nodes)
-            remove_nodes.update(child_remove_nodes)
-    return add_nodes, remove_nodes
+        for child in node.children.values():
+            nodes.update(flatten_slot_tree(child))
+    return nodes
 
 
 def register_slots(slots: Union[List[BaseSlot], BaseSlot], root: dict = root) -> dict:
     if isinstance(slots, BaseSlot):
         slots = [slots]
     for slot in slots:
-        add_nodes, _ = flatten_slot_tree(slot)
+        add_nodes = flatten_slot_tree(slot)
+        check_dependencies(root, add_nodes)
         root.update(add_nodes)
     return root
 
 
 def register_root_slots(slots: List[BaseSlot], root: dict = root):
-    new_root = dict()
+    new_root = SlotRegistry()
     for slot in slots:
         if not slot.has_children():
             new_root[slot.name] = root[slot.name]
         else:
-            new_root.update({name: _slot for name, _slot in root.items() if name.startswith(slot.name)})
+            new_root.update(get_subtree(root, slot.name))
     return new_root
@@ -0,0 +1,288 @@
+"""
+Compact runtime representation of slots.
+Slot definitions are pydantic models, validated once when they are created. The extraction hot paths work
+on frozen `__slots__` objects compiled from the definitions instead: they are cheap to create, compare and hash,
+and their attributes are plain slot reads. A compiled slot is cached on its definition
+and rebuilt for renamed copies of the definition, e.g. the children of a group named by their paths.
+"""
+
+import re
+import inspect
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from df_engine.core import Context, Actor
+
+from .gazetteer import search_vocabulary
+from .fuzzy import FuzzyIndex
+from .regexp_guard import RegexpGuard, search_guarded
+
+from .slot_types import (
+    BaseSlot,
+    GroupSlot,
+    RegexpSlot,
+    GazetteerSlot,
+    VocabularyIndexSlot,
+    FuzzySlot,
+    FunctionSlot,
+    SlotInputs,
+    apply_function,
+    apply_batch,
+    get_searcher,
+    read_inputs,
+)
+
+
+class RuntimeSlot:
+    __slots__ = ("name", "definition", "depends_on", "input_spec", "key", "_hash")
+
+    def __init__(self, name: str, definition: BaseSlot):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "definition", definition)
+        object.__setattr__(self, "depends_on", tuple(getattr(definition, "depends_on", None) or ()))
+        # declared inputs as (number of requests, slot paths, misc keys)
+        spec = getattr(definition, "inputs", None)
+        input_spec = (spec.requests, tuple(spec.slots), tuple(spec.misc)) if isinstance(spec, SlotInputs) else None
+        object.__setattr__(self, "input_spec", input_spec)
+        # compiled slots compare like their definitions, by the structural fingerprint
+        object.__setattr__(self, "key", definition.fingerprint)
+        object.__setattr__(self, "_hash", hash(definition))
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is frozen")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"{type(self).__name__} is frozen")
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, RuntimeSlot):
+            return NotImplemented
+        return self is other or (self._hash == other._hash and type(self) is type(other) and self.key == other.key)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(name={self.name!r})"
+
+    def leaves(self) -> Iterator["RuntimeSlot"]:
+        yield self
+
+    def extract(self, ctx: Context, actor: Actor) -> Any:
+        raise NotImplementedError
+
+    async def extract_async(self, ctx: Context, actor: Actor) -> Any:
+        return self.extract(ctx, actor)
+
+    def extract_with(self, ctx: Context, actor: Actor, inputs: Dict[str, Any]) -> Any:
+        """
+        Extract the value of a slot that depends on other slots, given their values.
+        """
+        return self.extract(ctx, actor)
+
+    async def extract_with_async(self, ctx: Context, actor: Actor, inputs: Dict[str, Any]) -> Any:
+        return await self.extract_async(ctx, actor)
+
+
+class RuntimeGroup(RuntimeSlot):
+    __slots__ = ("children",)
+
+    def __init__(self, name: str, definition: BaseSlot, children: Iterable[RuntimeSlot]):
+        super().__init__(name, definition)
+        object.__setattr__(self, "children", tuple(children))
+
+    def __reduce__(self):
+        return type(self), (self.name, self.definition, self.children)
+
+    def leaves(self) -> Iterator[RuntimeSlot]:
+        for child in self.children:
+            yield from child.leaves()
+
+    def collect_values(self, child_values: Iterable) -> dict:
+        values = dict()
+        for child, val in zip(self.children, child_values):
+            if isinstance(child, RuntimeGroup):
+                values.update(val)
+            else:
+                values[child.name] = val
+        return values
+
+    def extract(self, ctx: Context, actor: Actor) -> dict:
+        return self.collect_values(child.extract(ctx, actor) for child in self.children)
+
+
+class RuntimeRegexp(RuntimeSlot):
+    __slots__ = ("regexp", "guard", "mode", "searcher")
+
+    def __init__(
+        self,
+        name: str,
+        definition: BaseSlot,
+        regexp: Optional[re.Pattern],
+        guard: Optional[RegexpGuard] = None,
+        mode: Tuple[bool, bool, bool] = (False, False, False),
+    ):
+        super().__init__(name, definition)
+        object.__setattr__(self, "regexp", regexp)
+        object.__setattr__(self, "guard", guard)
+        # (all_matches, groups, spans)
+        object.__setattr__(self, "mode", mode)
+        object.__setattr__(self, "searcher", get_searcher(mode))
+
+    def __reduce__(self):
+        return type(self), (self.name, self.definition, self.regexp, self.guard, self.mode)
+
+    def search(self, text: str) -> Any:
+        if self.guard is None:
+            return self.searcher(self.regexp, text)
+        return search_guarded(self.guard, text, self.name, self.searcher)
+
+    def extract(self, ctx: Context, actor: Actor) -> Any:
+        return self.search(ctx.last_request)
+
+
+class RuntimeGazetteer(RuntimeSlot):
+    """
+    Vocabulary slot: the `matcher` is an automaton or a vocabulary index.
+    """
+
+    __slots__ = ("matcher", "all_matches")
+
+    def __init__(self, name: str, definition: BaseSlot, matcher: Any, all_matches: bool = False):
+        super().__init__(name, definition)
+        object.__setattr__(self, "matcher", matcher)
+        object.__setattr__(self, "all_matches", all_matches)
+
+    def __reduce__(self):
+        return type(self), (self.name, self.definition, self.matcher, self.all_matches)
+
+    def search(self, text: str) -> Any:
+        return search_vocabulary(self.matcher, text, self.all_matches)
+
+    def extract(self, ctx: Context, actor: Actor) -> Any:
+        return search_vocabulary(self.matcher, ctx.last_request, self.all_matches)
+
+
+class RuntimeFuzzy(RuntimeSlot):
+    __slots__ = ("index", "threshold")
+
+    def __init__(self, name: str, definition: BaseSlot, index: FuzzyIndex, threshold: float):
+        super().__init__(name, definition)
+        object.__setattr__(self, "index", index)
+        object.__setattr__(self, "threshold", threshold)
+
+    def __reduce__(self):
+        return type(self), (self.name, self.definition, self.index, self.threshold)
+
+    def search(self, text: str) -> Optional[str]:
+        return self.index.best(text, self.threshold)
+
+    def extract(self, ctx: Context, actor: Actor) -> Optional[str]:
+        return self.index.best(ctx.last_request, self.threshold)
+
+
+class RuntimeFunction(RuntimeSlot):
+    __slots__ = ("func", "cpu_bound", "deterministic", "batch_func")
+
+    def __init__(
+        self,
+        name: str,
+        definition: BaseSlot,
+        func: Callable,
+        cpu_bound: bool = False,
+        deterministic: bool = False,
+        batch_func: Optional[Callable] = None,
+    ):
+        super().__init__(name, definition)
+        object.__setattr__(self, "func", func)
+        object.__setattr__(self, "cpu_bound", cpu_bound)
+        object.__setattr__(self, "deterministic", deterministic)
+        object.__setattr__(self, "batch_func", batch_func)
+
+    def __reduce__(self):
+        return type(self), (self.name, self.definition, self.func, self.cpu_bound, self.deterministic, self.batch_func)
+
+    def arguments(self, request: Any, inputs: Optional[Dict[str, Any]]) -> Tuple:
+        return (request, inputs) if self.depends_on else (request,)
+
+    def apply(self, request: Any, *args) -> Any:
+        return apply_function(self.func, request, *args)
+
+    def extract_batch(self, requests: List[Any]) -> List[Any]:
+        return apply_batch(self.name, self.func, self.batch_func, requests)
+
+    def extract(self, ctx: Context, actor: Actor) -> Any:
+        if not self.depends_on:
+            return apply_function(self.func, ctx.last_request)
+        inputs = read_inputs(ctx, self.depends_on)
+        return self.extract_with(ctx, actor, inputs) if inputs is not None else None
+
+    async def extract_async(self, ctx: Context, actor: Actor) -> Any:
+        if not self.depends_on:
+            return await self.extract_with_async(ctx, actor, None)
+        inputs = read_inputs(ctx, self.depends_on)
+        return await self.extract_with_async(ctx, actor, inputs) if inputs is not None else None
+
+    def extract_with(self, ctx: Context, actor: Actor, inputs: Optional[Dict[str, Any]]) -> Any:
+        return apply_function(self.func, *self.arguments(ctx.last_request, inputs))
+
+    async def extract_with_async(self, ctx: Context, actor: Actor, inputs: Optional[Dict[str, Any]]) -> Any:
+        value = self.func(*self.arguments(ctx.last_request, inputs))
+        if inspect.isawaitable(value):
+            return await value
+        return value
+
+
+class RuntimeValue(RuntimeSlot):
+    """
+    Any other leaf slot: extraction is delegated to the definition.
+    """
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        return type(self), (self.name, self.definition)
+
+    def extract(self, ctx: Context, actor: Actor) -> Any:
+        return self.definition.extract_value(ctx, actor)
+
+    async def extract_async(self, ctx: Context, actor: Actor) -> Any:
+        return await self.definition.extract_value_async(ctx, actor)
+
+
+def overrides(slot: BaseSlot, base: type, *methods: str) -> bool:
+    return any(getattr(type(slot), method) is not getattr(base, method) for method in methods)
+
+
+def build_slot(slot: BaseSlot) -> RuntimeSlot:
+    if isinstance(slot, GroupSlot):
+        return RuntimeGroup(slot.name, slot, (compile_slot(child) for child in slot.children.values()))
+    if isinstance(slot, RegexpSlot) and not overrides(slot, RegexpSlot, "extract_value", "extract_value_async"):
+        return RuntimeRegexp(slot.name, slot, slot.regexp, slot.guard, slot.mode)
+    if isinstance(slot, GazetteerSlot) and not overrides(slot, GazetteerSlot, "extract_value", "extract_value_async"):
+        return RuntimeGazetteer(slot.name, slot, slot.automaton, slot.all_matches)
+    if isinstance(slot, VocabularyIndexSlot) and not overrides(
+        slot, VocabularyIndexSlot, "extract_value", "extract_value_async"
+    ):
+        return RuntimeGazetteer(slot.name, slot, slot.index, slot.all_matches)
+    if isinstance(slot, FuzzySlot) and not overrides(slot, FuzzySlot, "extract_value", "extract_value_async"):
+        return RuntimeFuzzy(slot.name, slot, slot.index, slot.threshold)
+    if isinstance(slot, FunctionSlot) and not overrides(
+        slot, FunctionSlot, "extract_value", "extract_value_async", "apply", "extract_batch"
+    ):
+        return RuntimeFunction(slot.name, slot, slot.func, slot.cpu_bound, slot.deterministic, slot.batch_func)
+    return RuntimeValue(slot.name, slot)
+
+
+def compile_slot(slot: BaseSlot) -> RuntimeSlot:
+    """
+    Get the runtime representation of a slot definition, building it on the first call.
+    """
+    runtime = slot._runtime
+    if runtime is None or runtime.name != slot.name:
+        runtime = build_slot(slot)
+        slot._runtime = runtime
+    return runtime
+
+
+def compile_slots(slots: Iterable[BaseSlot]) -> List[RuntimeSlot]:
+    return [compile_slot(slot) for slot in slots]
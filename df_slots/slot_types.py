@@ -1,21 +1,170 @@
 import re
+import asyncio
+import inspect
+import pickle
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy
+from functools import lru_cache, partial
 from collections.abc import Iterable
-from typing import Callable, Optional, Any, Dict
+from typing import Callable, Optional, Any, Dict, Hashable, List, Mapping, Sequence, Tuple
 
 from df_engine.core import Context, Actor
 
-from pydantic import Field, BaseModel, validator
+from pydantic import Field, BaseModel, PrivateAttr, validator
 from pydantic.typing import ForwardRef
 
+from .storage import SlotStorage
+from .gazetteer import Automaton, load_vocabulary, search_vocabulary
+from .vocabulary_index import VocabularyIndex, open_index
+from .fuzzy import FuzzyIndex
+from .regexp_guard import RegexpGuard, check_pattern, get_guard, search_guarded
+
 logger = logging.getLogger(__name__)
 
 BaseSlot = ForwardRef("BaseSlot")
 
 
+def is_loop_running() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def run_coroutine(coro) -> Any:
+    """
+    Run a coroutine to completion from synchronous code.
+    If an event loop is already running in the current thread, the coroutine is run in a helper thread
+    and the loop is blocked until it finishes; asynchronous callers should await the coroutine instead.
+    """
+    if is_loop_running():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(run_coroutine, coro).result()
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+SPAN_KEYS = frozenset(("value", "start", "end"))
+
+
+def match_value(match: re.Match, groups: bool = False, spans: bool = False) -> Any:
+    """
+    Get the value of a match: its text or the dictionary of its named groups. With `spans` the value is wrapped
+    in a dictionary with the position of the match, `{"value": ..., "start": ..., "end": ...}`,
+    which is stored and serialized as it is.
+    """
+    value = match.groupdict() if groups else match.group()
+    return {"value": value, "start": match.start(), "end": match.end()} if spans else value
+
+
+def format_value(value: Any) -> str:
+    """
+    Render a slot value in a template: a list is joined with commas, the span of a match is rendered
+    as its value and the named groups of a match as `name: value` pairs.
+    Values read back from a serialized storage are rendered the same as the extracted ones.
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, Mapping):
+        if value.keys() == SPAN_KEYS:
+            return format_value(value["value"])
+        return ", ".join(f"{key}: {format_value(val)}" for key, val in value.items() if val is not None)
+    if isinstance(value, (list, tuple)):
+        return ", ".join(format_value(val) for val in value)
+    return str(value)
+
+
+def search_pattern(
+    regexp: Optional[re.Pattern], text: str, all_matches: bool = False, groups: bool = False, spans: bool = False
+) -> Any:
+    """
+    Search a text with a pattern in a single scan. The value is the first match or, with `all_matches`,
+    the list of all the matches; a match is its text or, with `groups`, the dictionary of its named groups,
+    wrapped in a dictionary with its position with `spans`, see :py:func:`match_value`.
+    """
+    if regexp is None:
+        return None
+    if all_matches:
+        return [match_value(match, groups, spans) for match in regexp.finditer(text)] or None
+    search = regexp.search(text)
+    if search is None:
+        return None
+    return match_value(search, groups, spans) if groups or spans else search.group()
+
+
+@lru_cache(maxsize=None)
+def get_searcher(mode: Tuple[bool, bool, bool]) -> Callable[[Any, str], Any]:
+    """
+    Get the search function of a mode of regexp slots, `(all_matches, groups, spans)`.
+    """
+    all_matches, groups, spans = mode
+    return partial(search_pattern, all_matches=all_matches, groups=groups, spans=spans)
+
+
+def apply_function(func: Callable, request: Any, *args) -> Any:
+    value = func(request, *args)
+    if inspect.isawaitable(value):
+        return run_coroutine(value)
+    return value
+
+
+def apply_batch(name: str, func: Callable, batch_func: Optional[Callable], requests: List[Any]) -> List[Any]:
+    if batch_func is None:
+        return [apply_function(func, request) for request in requests]
+    values = list(batch_func(requests))
+    if len(values) != len(requests):
+        raise ValueError(f"Slot {name}: batch function returned {len(values)} values for {len(requests)} requests")
+    return values
+
+
+def read_inputs(ctx: Context, paths: Sequence[str]) -> Optional[Dict[str, Any]]:
+    """
+    Read the values of the slots that a slot depends on from the context storage.
+    Returns `None` if any of them is not set.
+    """
+    storage = ctx.framework_states.get("slots")
+    if storage is None:
+        return None
+    inputs = {path: storage.get(path) for path in paths}
+    if any(value is None for value in inputs.values()):
+        return None
+    return inputs
+
+
+def freeze(value: Any) -> Hashable:
+    """
+    Turn a field value into a hashable part of a slot fingerprint.
+    Patterns are described by their source and flags, slots by their fingerprints,
+    and other values that cannot be hashed, by their identity.
+    """
+    if isinstance(value, BaseSlot):
+        return value.fingerprint
+    if isinstance(value, BaseModel):
+        return (type(value),) + tuple((field, freeze(val)) for field, val in value)
+    if isinstance(value, re.Pattern):
+        return (re.Pattern, value.pattern, value.flags)
+    if isinstance(value, dict):
+        return (dict,) + tuple((key, freeze(val)) for key, val in value.items())
+    if isinstance(value, (list, tuple)):
+        return (type(value),) + tuple(freeze(val) for val in value)
+    try:
+        hash(value)
+    except TypeError:
+        return (id, id(value))
+    return value
+
+
 class BaseSlot(BaseModel):
     name: str
+    # compiled runtime representation, see `runtime.compile_slot`
+    _runtime: Any = PrivateAttr(default=None)
+    _fingerprint: Optional[tuple] = PrivateAttr(default=None)
+    _hash: Optional[int] = PrivateAttr(default=None)
 
     @validator("name", pre=True)
     def validate_name(cls, name: str):
@@ -25,17 +174,46 @@ class BaseSlot(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True
+        allow_mutation = False
 
     def __deepcopy__(self, *args, **kwargs):
         return copy(self)
 
+    def __getstate__(self):
+        state = super().__getstate__()
+        # cached values are rebuilt on demand, the compiled slot refers back to the original definition
+        state["__private_attribute_values__"] = {name: None for name in self.__private_attributes__}
+        return state
+
     def __eq__(self, other: BaseSlot):
-        return self.dict(exclude={"name"}) == other.dict(exclude={"name"})
+        if not isinstance(other, BaseSlot):
+            return NotImplemented
+        return self is other or (hash(self) == hash(other) and self.fingerprint == other.fingerprint)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(self.fingerprint)
+        return self._hash
+
+    @property
+    def fingerprint(self) -> tuple:
+        """
+        Structure of the slot: its type and field values, with the children described by their fingerprints.
+        The own name is left out, so slots that differ only by name are equal.
+        Slots are frozen, so the fingerprint is computed once.
+        """
+        if self._fingerprint is None:
+            fields = tuple((field, freeze(getattr(self, field))) for field in self.__fields__ if field != "name")
+            self._fingerprint = (type(self),) + fields
+        return self._fingerprint
 
     def has_children(self):
         return hasattr(self, "children") and len(self.children) > 0
 
-    def is_set(self):
+    def is_set(self, ctx: Context) -> bool:
+        raise NotImplementedError("Base class has no attribute 'value'")
+
+    def get_value(self, ctx: Context) -> Any:
         raise NotImplementedError("Base class has no attribute 'value'")
 
     def fill_template(self, template: str) -> Callable[[Context, Actor], str]:
@@ -44,39 +222,82 @@ class BaseSlot(BaseModel):
     def extract_value(self, ctx: Context, actor: Actor):
         raise NotImplementedError("Base class has no attribute 'value'")
 
+    async def extract_value_async(self, ctx: Context, actor: Actor):
+        return self.extract_value(ctx, actor)
+
 
 class GroupSlot(BaseSlot):
     children: Dict[str, BaseSlot] = Field(default_factory=dict)
+    _nested: Optional[bool] = PrivateAttr(default=None)
 
     @validator("children", pre=True)
     def validate_children(cls, children):
         if not isinstance(children, dict) and isinstance(children, Iterable):
-            new_children = {child.name: child for child in children}
+            new_children = {child.name.rsplit("/", 1)[-1]: child for child in children}
             return new_children
         return children
 
-    @property
-    def value(self):
+    @validator("children")
+    def nest_children(cls, children, values):
+        """
+        Name the children by their paths in the group. Slots are frozen, so the children passed to the group
+        are replaced by renamed copies: references to the passed slots keep their own names
+        and do not refer to the slots of the group, use `group.children[name]` for those.
+        """
+        if "name" not in values:
+            return children
+        return {name: nest_slot(child, "/".join([values["name"], name])) for name, child in children.items()}
+
+    def get_value(self, ctx: Context) -> Dict[str, Any]:
+        """
+        Get the values of the leaves of the group by path.
+        Values read from a :py:class:`~df_slots.storage.SlotStorage` are cached until a path under the group
+        is written; each call still gets its own copy of the cached dict, which costs a pass over the leaves.
+        """
+        storage = ctx.framework_states.get("slots")
+        if isinstance(storage, SlotStorage) and self.is_nested():
+            return dict(storage.cached("value", self.name, partial(self._read_value, ctx), self))
+        return self._read_value(ctx)
+
+    def is_nested(self) -> bool:
+        """
+        Check that the paths of all the slots in the group are under the path of the group.
+        Only then do the storage versions of the group path cover its values, so that they can be cached.
+        """
+        if self._nested is None:
+            prefix = self.name + "/"
+            self._nested = all(
+                child.name.startswith(prefix) and (not isinstance(child, GroupSlot) or child.is_nested())
+                for child in self.children.values()
+            )
+        return self._nested
+
+    def _read_value(self, ctx: Context) -> Dict[str, Any]:
         values = dict()
         for name, child in self.children.items():
             if isinstance(child, GroupSlot):
-                values.update({key: value for key, value in child.value.items()})
+                values.update(child.get_value(ctx))
             else:
-                values.update({child.name: child.value})
+                values.update({child.name: child.get_value(ctx)})
         return values
 
     def __getattr__(self, attr: str):
-        try:
-            value = self.__getattribute__(attr)
-        except AttributeError:
-            value = self.children.get(attr) or ""  # for slot filling
-        return value
+        # only called for missing attributes
+        if attr.startswith("__") or attr == "children":
+            raise AttributeError(attr)
+        return self.children.get(attr) or ""  # for slot filling
 
     def __str__(self):
         return f":Slot group {self.name}:"
 
-    def is_set(self):
-        return all(child.is_set() for child in self.children.values())
+    def is_set(self, ctx: Context) -> bool:
+        storage = ctx.framework_states.get("slots")
+        if isinstance(storage, SlotStorage) and self.is_nested():
+            return storage.cached("is_set", self.name, partial(self._is_set, ctx), self)
+        return self._is_set(ctx)
+
+    def _is_set(self, ctx: Context) -> bool:
+        return all(child.is_set(ctx) for child in self.children.values())
 
     def fill_template(self, template: str) -> Callable:
         def fill_inner(ctx: Context, actor: Actor) -> str:
@@ -88,20 +309,72 @@ class GroupSlot(BaseSlot):
 
         return fill_inner
 
-    def extract_value(self, ctx: Context, actor: Actor):
-        for child in self.children.values():
-            val = child.extract_value(ctx, actor)
-        return self.value
+    def collect_values(self, child_values: Iterable) -> Dict[str, Any]:
+        values = dict()
+        for child, val in zip(self.children.values(), child_values):
+            if isinstance(child, GroupSlot):
+                values.update(val)
+            else:
+                values.update({child.name: val})
+        return values
+
+    def extract_value(self, ctx: Context, actor: Actor) -> Dict[str, Any]:
+        return self.collect_values(child.extract_value(ctx, actor) for child in self.children.values())
+
+    async def extract_value_async(self, ctx: Context, actor: Actor) -> Dict[str, Any]:
+        child_values = await asyncio.gather(
+            *(child.extract_value_async(ctx, actor) for child in self.children.values())
+        )
+        return self.collect_values(child_values)
+
+
+def nest_slot(slot: BaseSlot, path: str) -> BaseSlot:
+    """
+    Get a copy of a slot named by the given path, with its children named by the paths under it.
+    """
+    if slot.name == path:
+        return slot
+    update = {"name": path}
+    if slot.has_children():
+        update["children"] = {name: nest_slot(child, "/".join([path, name])) for name, child in slot.children.items()}
+    nested = slot.copy(update=update)
+    # cached values refer to the old names
+    nested._runtime = None
+    if isinstance(nested, GroupSlot):
+        nested._nested = None
+    return nested
+
+
+class SlotInputs(BaseModel):
+    """
+    Inputs that the value of a slot is computed from: the last `requests` requests, the values of the `slots`
+    with the given paths and the values of the `misc` keys of the context.
+    A slot that declares its inputs is only extracted again when one of them has changed since its last extraction.
+    Fingerprints of the inputs are kept in the context, see :py:func:`~df_slots.extraction.get_input_memo`.
+    """
+
+    requests: int = 1
+    slots: List[str] = Field(default_factory=list)
+    misc: List[str] = Field(default_factory=list)
+
+    class Config:
+        allow_mutation = False
 
 
 class ValueSlot(BaseSlot):
-    value: Any = None
+    inputs: Optional[SlotInputs] = None
 
     def __str__(self):
-        return str(self.value) if self.value else ""
+        return f":Slot {self.name}:"
 
-    def is_set(self):
-        return self.value is not None
+    def is_set(self, ctx: Context) -> bool:
+        return self.get_value(ctx) is not None
+
+    def get_value(self, ctx: Context) -> Any:
+        storage = ctx.framework_states.get("slots")
+        if storage is None:
+            return None
+        return storage.get(self.name)
 
     def fill_template(self, template: str) -> Callable:
         def fill_inner(ctx: Context, actor: Actor) -> str:
@@ -113,32 +386,225 @@ class ValueSlot(BaseSlot):
             value = storage.get(self.name)
             if value is None:
                 return template
-            return template.replace("{" + self.name + "}", value)
+            return template.replace("{" + self.name + "}", format_value(value))
 
         return fill_inner
 
 
 class RegexpSlot(ValueSlot):
+    """
+    Slot extracted by the first match of a pattern in the last request, or by all of its matches
+    if `all_matches` is set. A match is extracted as its text or, if `groups` is set, as the dictionary
+    of its named groups; if `spans` is set, it is wrapped in a dictionary with its position, see :py:func:`match_value`.
+    Patterns prone to catastrophic backtracking are reported when the slot is created,
+    see :py:mod:`df_slots.regexp_guard`, and run by a linear-time engine if one is installed.
+    A request longer than `max_length` characters is not searched,
+    and a search that takes longer than `time_budget` seconds extracts nothing.
+    """
+
     regexp: Optional[re.Pattern] = Field(default=None, alias="regexp")
+    all_matches: bool = False
+    groups: bool = False
+    spans: bool = False
+    max_length: Optional[int] = None
+    time_budget: Optional[float] = None
+    # the guard is wrapped in a tuple, so that a missing guard is cached as well
+    _guard: Optional[tuple] = PrivateAttr(default=None)
 
     @validator("regexp", pre=True)
     def val_regexp(cls, reg):
         if isinstance(reg, str):
-            return re.compile(reg)
+            reg = re.compile(reg)
+        if isinstance(reg, re.Pattern):
+            check_pattern(reg)
         return reg
 
+    @validator("groups")
+    def validate_groups(cls, groups: bool, values: dict):
+        regexp = values.get("regexp")
+        if groups and regexp is not None and not regexp.groupindex:
+            raise ValueError("extracting groups requires a pattern with named groups")
+        return groups
+
+    @validator("max_length", "time_budget")
+    def validate_limits(cls, limit):
+        if limit is not None and limit <= 0:
+            raise ValueError("limits must be positive")
+        return limit
+
+    @property
+    def mode(self) -> Tuple[bool, bool, bool]:
+        return self.all_matches, self.groups, self.spans
+
+    @property
+    def guard(self) -> Optional[RegexpGuard]:
+        if self._guard is None:
+            self._guard = (get_guard(self.regexp, self.max_length, self.time_budget),)
+        return self._guard[0]
+
+    def extract_value(self, ctx: Context, actor: Actor):
+        guard = self.guard
+        if guard is None:
+            return search_pattern(self.regexp, ctx.last_request, *self.mode)
+        return search_guarded(guard, ctx.last_request, self.name, get_searcher(self.mode))
+
+
+class GazetteerSlot(ValueSlot):
+    """
+    Slot extracted by looking up the entries of a vocabulary in the last request.
+    The vocabulary is given as a list of entries, as the path of a file with one entry per line, or both.
+    All the entries are matched at once by an automaton built on the first extraction.
+    The value is the longest entry found, as written in the vocabulary, or, if `all_matches` is set,
+    the list of all the entries found in the order of their occurrence.
+    Entries are matched regardless of case unless `case_sensitive` is set,
+    and only as whole words if `word_boundaries` is set.
+    """
+
+    vocabulary: List[str] = Field(default_factory=list)
+    vocabulary_path: Optional[str] = None
+    all_matches: bool = False
+    case_sensitive: bool = False
+    word_boundaries: bool = True
+    _automaton: Optional[Automaton] = PrivateAttr(default=None)
+
+    @validator("vocabulary_path", always=True)
+    def validate_vocabulary_path(cls, vocabulary_path: Optional[str], values: dict):
+        if vocabulary_path is None and not values.get("vocabulary"):
+            raise ValueError("either a vocabulary or a vocabulary path is required")
+        return vocabulary_path
+
+    @property
+    def automaton(self) -> Automaton:
+        if self._automaton is None:
+            entries = list(self.vocabulary)
+            if self.vocabulary_path is not None:
+                entries.extend(load_vocabulary(self.vocabulary_path))
+            self._automaton = Automaton(entries, self.case_sensitive, self.word_boundaries)
+        return self._automaton
+
     def extract_value(self, ctx: Context, actor: Actor):
-        search = re.search(self.regexp, ctx.last_request)
-        self.value = search.group() if search else None
-        return self.value
+        return search_vocabulary(self.automaton, ctx.last_request, self.all_matches)
+
+
+class VocabularyIndexSlot(ValueSlot):
+    """
+    Slot extracted by looking up the entries of a prebuilt vocabulary index in the last request,
+    see :py:mod:`df_slots.vocabulary_index`. The index file is memory-mapped once per process,
+    so the workers share its pages instead of loading their own copies of the vocabulary.
+    The value is the value of the longest entry found or, if `all_matches` is set,
+    the list of the values of all the entries found in the order of their occurrence.
+    """
+
+    index_path: str
+    all_matches: bool = False
+
+    @validator("index_path")
+    def validate_index_path(cls, index_path: str):
+        # fail on registration rather than on the first extraction
+        open_index(index_path)
+        return index_path
+
+    @property
+    def index(self) -> VocabularyIndex:
+        return open_index(self.index_path)
+
+    def extract_value(self, ctx: Context, actor: Actor):
+        return search_vocabulary(self.index, ctx.last_request, self.all_matches)
+
+
+class FuzzySlot(ValueSlot):
+    """
+    Slot extracted by approximate matching of the last request against a list of `candidates`.
+    The value is the candidate, as written in the list, that is the most similar to a span of the request,
+    if its similarity, one minus the edit distance divided by the length of the longer string,
+    is at least `threshold`. The trigram index of the candidates is built when the slot is created.
+    """
+
+    candidates: List[str]
+    threshold: float = 0.8
+    _index: Optional[FuzzyIndex] = PrivateAttr(default=None)
+
+    @validator("threshold")
+    def validate_threshold(cls, threshold: float):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in the (0, 1] range")
+        return threshold
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._index = FuzzyIndex(self.candidates)
+
+    @property
+    def index(self) -> FuzzyIndex:
+        # the index is not pickled with the slot
+        if self._index is None:
+            self._index = FuzzyIndex(self.candidates)
+        return self._index
+
+    def extract_value(self, ctx: Context, actor: Actor):
+        return self.index.best(ctx.last_request, self.threshold)
 
 
 class FunctionSlot(ValueSlot):
+    """
+    Slot extracted by a function of the last request.
+    A slot that `depends_on` other value slots (by their registered paths) is extracted after them,
+    and `func` gets their values as the second argument: `func(request, {path: value})`.
+    If any of them is not set, the slot is not extracted and its value is `None`.
+    """
+
     func: Callable[[str], str]
+    cpu_bound: bool = False
+    deterministic: bool = False
+    batch_func: Optional[Callable[[List[str]], List[Any]]] = None
+    depends_on: List[str] = Field(default_factory=list)
+
+    @validator("depends_on", pre=True)
+    def validate_depends_on(cls, depends_on):
+        if isinstance(depends_on, str):
+            return [depends_on]
+        return depends_on
+
+    @validator("cpu_bound")
+    def validate_cpu_bound(cls, cpu_bound: bool, values: dict):
+        # cpu-bound functions can be sent to a process pool, so they are checked here rather than on dispatch
+        func = values.get("func")
+        if not cpu_bound or func is None:
+            return cpu_bound
+        if inspect.iscoroutinefunction(func):
+            raise ValueError("cpu-bound slot functions cannot be coroutines")
+        try:
+            pickle.dumps(func)
+        except Exception as exc:
+            raise ValueError(f"cpu-bound slot functions must be picklable: {exc}")
+        return cpu_bound
 
     def extract_value(self, ctx: Context, actor: Actor):
-        self.value = self.func(ctx.last_request)
-        return self.value
+        if not self.depends_on:
+            return self.apply(ctx.last_request)
+        inputs = read_inputs(ctx, self.depends_on)
+        return self.apply(ctx.last_request, inputs) if inputs is not None else None
+
+    def apply(self, request: str, *args) -> Any:
+        return apply_function(self.func, request, *args)
+
+    def extract_batch(self, requests: List[str]) -> List[Any]:
+        """
+        Extract values from several requests, passing them all to `batch_func` at once if it is set.
+        """
+        return apply_batch(self.name, self.func, self.batch_func, requests)
+
+    async def extract_value_async(self, ctx: Context, actor: Actor):
+        if not self.depends_on:
+            value = self.func(ctx.last_request)
+        else:
+            inputs = read_inputs(ctx, self.depends_on)
+            if inputs is None:
+                return None
+            value = self.func(ctx.last_request, inputs)
+        if inspect.isawaitable(value):
+            return await value
+        return value
 
 
 BaseSlot.update_forward_refs()
@@ -1,13 +1,18 @@
 from .root import root, freeze_root, flatten_slot_tree
+from .dependencies import check_dependencies
 
 
 class AutoRegisterMixin:
     def __init__(self, *, name: str, **data) -> None:
+        children = data.get("children") or []
         super().__init__(name=name, **data)
         if freeze_root:
             return
-        add_nodes, remove_nodes = flatten_slot_tree(self)
-        for key in remove_nodes.keys():
-            if key in root:
-                root.pop(key)
+        add_nodes = flatten_slot_tree(self)
+        check_dependencies(root, add_nodes)
+        # the children were registered under their own names, the group holds renamed copies of them
+        for child in children.values() if isinstance(children, dict) else children:
+            for key, node in flatten_slot_tree(child).items():
+                if root.get(key) is node:
+                    root.pop(key)
         root.update(add_nodes)
@@ -0,0 +1,391 @@
+from copy import deepcopy
+from collections.abc import ItemsView, KeysView, ValuesView
+from typing import Any, Callable, Dict, Hashable, Iterable, Mapping, Optional, Set, Tuple
+
+_MISSING = object()
+_DEFAULT = object()
+
+
+class Deferred:
+    """
+    Slot value that is extracted on the first read, see :py:meth:`SlotStorage.defer`.
+    The value is computed once, also when the deferred value is shared by copies of the storage.
+    """
+
+    __slots__ = ("compute", "value")
+
+    def __init__(self, compute: Callable[[], Any]):
+        self.compute: Optional[Callable[[], Any]] = compute
+        self.value: Any = None
+
+    def __repr__(self) -> str:
+        return "Deferred()" if self.compute is not None else f"Deferred({self.value!r})"
+
+    def get(self) -> Any:
+        if self.compute is not None:
+            self.value = self.compute()
+            self.compute = None
+        return self.value
+
+
+class SlotStorage(dict):
+    """
+    Slot values of a context by slot path. Every write bumps the version of the path
+    and of all its ancestors, so values computed from a subtree, like group values
+    and `is_set` results, are cached until one of the leaves below changes.
+    The versions and the cache are not part of the dictionary and are not serialized.
+    Written and deleted paths are tracked until :py:meth:`pop_changes`, so a storage backend
+    only needs to save what changed in a turn.
+    Values can be deferred: they are extracted when they are first read and kept for the rest of the turn,
+    the deferred values that are not read by the end of the turn are dropped by :py:meth:`settle`.
+    Reading all the values, copying or pickling the storage computes all the deferred ones.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._versions: Dict[str, int] = dict()
+        self._cache: Dict[Tuple[str, str], Tuple[int, Hashable, Any]] = dict()
+        self._turn: Optional[Hashable] = None
+        self._memo: Dict[str, Any] = dict()
+        self._dirty: Set[str] = set()
+        # replaced values and their dirty flags by deferred path
+        self._deferred: Dict[str, Tuple[Any, bool]] = dict()
+
+    def __reduce__(self):
+        if self._deferred:
+            self.resolve()
+        return type(self), (dict(self),)
+
+    def __getitem__(self, key: str) -> Any:
+        value = dict.__getitem__(self, key)
+        if type(value) is Deferred:
+            return self._resolve(key, value)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = dict.get(self, key, default)
+        if type(value) is Deferred:
+            return self._resolve(key, value)
+        return value
+
+    def values(self):
+        if self._deferred:
+            self.resolve()
+        return super().values()
+
+    def items(self):
+        if self._deferred:
+            self.resolve()
+        return super().items()
+
+    def __deepcopy__(self, memo: dict):
+        # df_engine passes deep copies of the context to conditions: deferred values are shared with the copy,
+        # so a value read by a condition is not extracted again
+        values = {key: value if type(value) is Deferred else deepcopy(value, memo) for key, value in self._raw_items()}
+        storage = SlotStorage(values)
+        storage._deferred = {key: (_MISSING, True) for key, value in values.items() if type(value) is Deferred}
+        return storage
+
+    def _touch(self, key: str):
+        path = key
+        while True:
+            self._versions[path] = self._versions.get(path, 0) + 1
+            path, separator, _ = path.rpartition("/")
+            if not separator:
+                return
+
+    def __setitem__(self, key: str, value: Any):
+        super().__setitem__(key, value)
+        self._touch(key)
+        self._dirty.add(key)
+        if self._deferred:
+            self._deferred.pop(key, None)
+
+    def __delitem__(self, key: str):
+        super().__delitem__(key)
+        self._touch(key)
+        self._dirty.add(key)
+        if self._deferred:
+            self._deferred.pop(key, None)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key: str, default: Any = None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key: str, *args):
+        if key not in self:
+            return super().pop(key, *args)
+        value = self[key]
+        del self[key]
+        return value
+
+    def popitem(self):
+        if self._deferred:
+            self.resolve()
+        key, value = super().popitem()
+        self._touch(key)
+        self._dirty.add(key)
+        return key, value
+
+    def clear(self):
+        self._dirty.update(self)
+        super().clear()
+        self._versions.clear()
+        self._cache.clear()
+        self._memo.clear()
+        self._deferred.clear()
+
+    def copy(self):
+        if self._deferred:
+            self.resolve()
+        return type(self)(self)
+
+    def load(self, values: Mapping[str, Any]):
+        """
+        Set values read from a storage backend. Loaded values do not count as changes
+        and do not overwrite the changes that are not saved yet.
+        """
+        for key, value in values.items():
+            if key in self._dirty:
+                continue
+            super().__setitem__(key, value)
+            self._touch(key)
+
+    def pop_changes(self) -> Tuple[Dict[str, Any], Set[str]]:
+        """
+        Get the values written since the last call and the deleted paths, and reset the tracking.
+        """
+        changed = {key: self[key] for key in self._dirty if key in self}
+        deleted = {key for key in self._dirty if key not in self}
+        self._dirty = set()
+        return changed, deleted
+
+    def peek(self, key: str, default: Any = None) -> Any:
+        """
+        Get a value without extracting it if it is deferred: the value that the deferred one replaced
+        is returned instead, unless the deferred value was already read.
+        """
+        value = self._raw(key)
+        if type(value) is Deferred:
+            value = value.value if value.compute is None else self._deferred.get(key, (_MISSING,))[0]
+        if value is _DEFAULT:
+            # only an overlay storage falls through to its defaults
+            value = self._defaults[key]
+        return default if value is _MISSING else value
+
+    def _raw(self, key: str) -> Any:
+        return dict.get(self, key, _MISSING)
+
+    def _raw_items(self) -> Iterable[Tuple[str, Any]]:
+        return dict.items(self)
+
+    def _restore(self, key: str, previous: Any):
+        if previous is _MISSING:
+            del self[key]
+        else:
+            self[key] = previous
+
+    def _resolve(self, key: str, deferred: Deferred) -> Any:
+        value = deferred.get()
+        # the path was touched when the value was deferred, so the cached subtree values are still valid
+        if dict.get(self, key) is deferred:
+            dict.__setitem__(self, key, value)
+            self._deferred.pop(key, None)
+        return value
+
+    def defer(self, key: str, compute: Callable[[], Any]):
+        """
+        Set a value that is computed by `compute` when it is first read.
+        """
+        previous = self._deferred[key] if key in self._deferred else (self._raw(key), key in self._dirty)
+        self[key] = Deferred(compute)
+        self._deferred[key] = previous
+
+    def resolve(self):
+        """
+        Compute all the deferred values.
+        """
+        for key in list(self._deferred):
+            value = dict.get(self, key)
+            if type(value) is Deferred:
+                self._resolve(key, value)
+
+    def settle(self):
+        """
+        Drop the deferred values that were not read, restoring the values they replaced, and keep the ones that were.
+        Called when the turn finishes, since deferred values are extracted from the request of the turn.
+        """
+        deferred, self._deferred = self._deferred, dict()
+        for key, (previous, dirty) in deferred.items():
+            value = dict.get(self, key)
+            if type(value) is Deferred and value.compute is None:
+                # read through a copy of the storage
+                dict.__setitem__(self, key, value.value)
+                continue
+            self._restore(key, previous)
+            if not dirty:
+                self._dirty.discard(key)
+
+    def version(self, path: str) -> int:
+        return self._versions.get(path, 0)
+
+    def cached(self, kind: str, path: str, compute: Callable[[], Any], owner: Hashable = None) -> Any:
+        """
+        Get a value of the given kind computed from the subtree of `path`,
+        calling `compute` only if the subtree has changed since the last call.
+        `owner` is the slot the value is computed for: a value computed for a different slot
+        with the same path is not reused.
+        """
+        version = self.version(path)
+        entry = self._cache.get((kind, path))
+        if entry is not None and entry[0] == version and entry[1] == owner:
+            return entry[2]
+        value = compute()
+        self._cache[(kind, path)] = (version, owner, value)
+        return value
+
+    def turn_memo(self, turn: Hashable) -> Dict[Hashable, Any]:
+        """
+        Get the extraction results of the given turn, see :py:func:`~df_slots.extraction.get_turn_memo`.
+        The results are dropped when the turn changes.
+        """
+        if turn != self._turn:
+            self._turn = turn
+            self._memo = dict()
+        return self._memo
+
+
+class OverlayStorage(SlotStorage):
+    """
+    Slot storage on top of read-only defaults shared by many contexts, created in constant time.
+    Writes stay in the storage, reads of the other paths fall through to the defaults,
+    and deleted defaults are hidden by tombstones. Serialized as a plain storage with the merged values.
+    """
+
+    def __init__(self, defaults: Mapping[str, Any], *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._defaults = defaults
+        self._deleted: Set[str] = set()
+
+    def __reduce__(self):
+        return SlotStorage, (dict(self),)
+
+    def __missing__(self, key: str) -> Any:
+        if key in self._deleted:
+            raise KeyError(key)
+        return self._defaults[key]
+
+    def _has_default(self, key: str) -> bool:
+        return key in self._defaults and key not in self._deleted and not dict.__contains__(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return dict.__contains__(self, key) or (key in self._defaults and key not in self._deleted)
+
+    def __iter__(self):
+        yield from dict.__iter__(self)
+        yield from (key for key in self._defaults if self._has_default(key))
+
+    def __len__(self) -> int:
+        return dict.__len__(self) + sum(1 for key in self._defaults if self._has_default(key))
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return dict(self) == dict(other.items())
+
+    def __ne__(self, other: Any) -> bool:
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def __setitem__(self, key: str, value: Any):
+        super().__setitem__(key, value)
+        self._deleted.discard(key)
+
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        if dict.__contains__(self, key):
+            dict.__delitem__(self, key)
+        if key in self._defaults:
+            self._deleted.add(key)
+        self._touch(key)
+        self._dirty.add(key)
+        self._deferred.pop(key, None)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if dict.__contains__(self, key):
+            value = dict.__getitem__(self, key)
+            if type(value) is Deferred:
+                return self._resolve(key, value)
+            return value
+        if key in self._defaults and key not in self._deleted:
+            return self._defaults[key]
+        return default
+
+    def keys(self):
+        return KeysView(self)
+
+    def values(self):
+        return ValuesView(self)
+
+    def items(self):
+        return ItemsView(self)
+
+    def _raw(self, key: str) -> Any:
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        if key in self._defaults and key not in self._deleted:
+            return _DEFAULT
+        return _MISSING
+
+    def _raw_items(self) -> Iterable[Tuple[str, Any]]:
+        yield from dict.items(self)
+        yield from ((key, self._defaults[key]) for key in self._defaults if self._has_default(key))
+
+    def _restore(self, key: str, previous: Any):
+        if previous is _DEFAULT:
+            # the default is visible again once the own value is gone
+            dict.pop(self, key, None)
+            self._touch(key)
+        else:
+            super()._restore(key, previous)
+
+    def popitem(self):
+        for key in self:
+            value = self[key]
+            del self[key]
+            return key, value
+        raise KeyError("popitem(): storage is empty")
+
+    def clear(self):
+        super().clear()
+        self._deleted = set(self._defaults)
+
+    def copy(self):
+        if self._deferred:
+            self.resolve()
+        storage = type(self)(self._defaults, dict(dict.items(self)))
+        storage._deleted = set(self._deleted)
+        return storage
+
+    def load(self, values: Mapping[str, Any]):
+        super().load(values)
+        self._deleted.difference_update(key for key in values if dict.__contains__(self, key))
+
+
+def as_slot_storage(storage: Optional[dict]) -> Optional[SlotStorage]:
+    if storage is None or isinstance(storage, SlotStorage):
+        return storage
+    return SlotStorage(storage)
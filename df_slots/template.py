@@ -0,0 +1,62 @@
+import re
+import logging
+from functools import lru_cache
+from typing import List, Optional
+
+from df_engine.core import Context
+
+from .slot_types import ValueSlot, format_value
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER = re.compile(r"\{([^{}]+)\}")
+
+
+def is_fillable(name: str, root: dict, slots: Optional[List[str]] = None) -> bool:
+    """
+    Check if a placeholder refers to a value slot that belongs to the filled subtrees:
+    the top-level slots of the root or the given subset of slot names.
+    """
+    if not isinstance(root.get(name), ValueSlot):
+        return False
+    if slots is None:
+        return name.partition("/")[0] in root
+    path = name.split("/")
+    return any(
+        prefix in slots and prefix in root for prefix in ("/".join(path[:idx]) for idx in range(1, len(path) + 1))
+    )
+
+
+class Template:
+    """
+    Template text split into literal segments and slot placeholders.
+    Rendering only looks up the slots named in the template and joins the segments once.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.segments = PLACEHOLDER.split(text)
+        self.placeholders = {idx: "{" + self.segments[idx] + "}" for idx in range(1, len(self.segments), 2)}
+
+    def render(self, ctx: Context, root: dict, slots: Optional[List[str]] = None) -> str:
+        if not self.placeholders:
+            return self.text
+        storage = ctx.framework_states.get("slots")
+        parts = list(self.segments)
+        for idx, placeholder in self.placeholders.items():
+            name = parts[idx]
+            parts[idx] = placeholder
+            if not is_fillable(name, root, slots):
+                continue
+            if storage is None or name not in storage:
+                logger.warning("storage or storage entry missing")
+                continue
+            value = storage.get(name)
+            if value is not None:
+                parts[idx] = format_value(value)
+        return "".join(parts)
+
+
+@lru_cache(maxsize=1024)
+def compile_template(text: str) -> Template:
+    return Template(text)
@@ -0,0 +1,246 @@
+"""
+Prebuilt vocabulary indices, read through a memory map.
+An index is a sorted string table of normalized entries and their values with an open addressing hash table
+over it, written once by :py:func:`build_index` and opened read-only by every worker.
+The pages of the file are shared by all the processes that map it through the page cache of the OS,
+so a worker neither parses nor keeps its own copy of the vocabulary.
+
+Build an index from a text file with one entry or one `entry<TAB>value` pair per line,
+or from a JSON list of entries or object of entries and values::
+
+    python -m df_slots.vocabulary_index cities.txt cities.idx
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+import tempfile
+from array import array
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+MAGIC = b"DFVI"
+VERSION = 1
+CASE_SENSITIVE = 1
+# magic, version, flags, number of entries, number of hash buckets, maximum number of words in an entry
+HEADER = struct.Struct("<4sHHIII")
+WORD = re.compile(r"\w+")
+
+
+def normalize(text: str, case_sensitive: bool = False) -> str:
+    """
+    Normalize an entry or a span of a text for the lookup: whitespace is collapsed and, by default, case folded.
+    """
+    text = " ".join(text.split())
+    return text if case_sensitive else text.casefold()
+
+
+def read_entries(path: str) -> Dict[str, str]:
+    """
+    Read the entries and their values from a text or a JSON file.
+    Entries without a value are their own value.
+    """
+    with open(path, encoding="utf-8") as file:
+        if path.endswith(".json"):
+            data = json.load(file)
+            return dict(data) if isinstance(data, Mapping) else {entry: entry for entry in data}
+        entries = dict()
+        for line in file:
+            entry, _, value = line.strip().partition("\t")
+            if entry:
+                entries.setdefault(entry.strip(), value.strip() or entry.strip())
+        return entries
+
+
+def to_array(values: List[int]) -> array:
+    data = array("I", values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data
+
+
+def build_index(entries: Union[Iterable[str], Mapping[str, str]], path: str, case_sensitive: bool = False) -> int:
+    """
+    Write the index of the entries to `path`. The entries can be given with their values as a mapping.
+    Entries that are equal after normalization keep the value of the first one.
+    The index is written to a temporary file that then replaces `path`, so processes that have the previous
+    index mapped keep reading it intact.
+    Returns the number of entries in the index.
+    """
+    if not isinstance(entries, Mapping):
+        entries = {entry: entry for entry in entries}
+    table: Dict[bytes, bytes] = dict()
+    max_words = 0
+    for entry, value in entries.items():
+        key = normalize(entry, case_sensitive)
+        words = len(WORD.findall(key))
+        if not words:
+            continue
+        table.setdefault(key.encode("utf-8"), str(value).encode("utf-8"))
+        max_words = max(max_words, words)
+    keys = sorted(table)
+    count = len(keys)
+    buckets = 1
+    while buckets < count * 2:
+        buckets <<= 1
+    key_offsets, value_offsets, slots = [0], [0], [0] * buckets
+    for index, key in enumerate(keys):
+        key_offsets.append(key_offsets[-1] + len(key))
+        value_offsets.append(value_offsets[-1] + len(table[key]))
+        bucket = zlib.crc32(key) & (buckets - 1)
+        while slots[bucket]:
+            bucket = (bucket + 1) & (buckets - 1)
+        slots[bucket] = index + 1
+    if max(key_offsets[-1], value_offsets[-1]) >= 1 << 32:
+        raise ValueError("vocabulary index is limited to 4 GiB of keys and of values")
+    # truncating a mapped file in place would crash the processes that read it with SIGBUS
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with open(descriptor, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, CASE_SENSITIVE if case_sensitive else 0, count, buckets, max_words))
+            for values in (key_offsets, value_offsets, slots):
+                file.write(to_array(values).tobytes())
+            file.writelines(keys)
+            file.writelines(table[key] for key in keys)
+            file.flush()
+            os.fsync(file.fileno())
+        # temporary files are only readable by their owner
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return count
+
+
+class VocabularyIndex:
+    """
+    Read-only view of an index file built by :py:func:`build_index`.
+    Texts are looked up by their spans of up to the maximum number of words of an entry,
+    so entries are only matched as whole words.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise ValueError(f"{path} is not a vocabulary index")
+        magic, version, flags, count, buckets, max_words = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a vocabulary index of version {VERSION}")
+        self.case_sensitive = bool(flags & CASE_SENSITIVE)
+        self.max_words = max_words
+        self._count = count
+        self._mask = buckets - 1
+        position = HEADER.size
+        self._key_offsets = self._table(position, count + 1)
+        position += (count + 1) * 4
+        self._value_offsets = self._table(position, count + 1)
+        position += (count + 1) * 4
+        self._buckets = self._table(position, buckets)
+        self._keys_start = position + buckets * 4
+        self._values_start = self._keys_start + self._key_offsets[count]
+
+    def _table(self, position: int, size: int):
+        view = memoryview(self._map)[position : position + size * 4]
+        if sys.byteorder == "little":
+            return view.cast("I")
+        # the file is little-endian, big-endian hosts keep a swapped copy of the tables
+        data = array("I", view)
+        data.byteswap()
+        return data
+
+    def __reduce__(self):
+        return type(self), (self.path,)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _key(self, index: int) -> bytes:
+        return self._map[self._keys_start + self._key_offsets[index] : self._keys_start + self._key_offsets[index + 1]]
+
+    def _value(self, index: int) -> str:
+        start, end = self._value_offsets[index], self._value_offsets[index + 1]
+        return self._map[self._values_start + start : self._values_start + end].decode("utf-8")
+
+    def keys(self) -> Iterator[str]:
+        return (self._key(index).decode("utf-8") for index in range(self._count))
+
+    def get(self, entry: str) -> Optional[str]:
+        """
+        Get the value of an entry, or `None` if it is not in the index.
+        """
+        key = normalize(entry, self.case_sensitive).encode("utf-8")
+        buckets, mask = self._buckets, self._mask
+        bucket = zlib.crc32(key) & mask
+        while buckets[bucket]:
+            index = buckets[bucket] - 1
+            if self._key(index) == key:
+                return self._value(index)
+            bucket = (bucket + 1) & mask
+        return None
+
+    def matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """
+        Yield the occurrences of the entries in the text as `(start, end, value)`, ordered by their start.
+        """
+        words = [match.span() for match in WORD.finditer(text)]
+        for first, (start, _) in enumerate(words):
+            for _, end in words[first : first + self.max_words]:
+                value = self.get(text[start:end])
+                if value is not None:
+                    yield start, end, value
+
+    def longest(self, text: str) -> Optional[str]:
+        """
+        Get the value of the longest entry found in the text, of the first one of them if there are several.
+        """
+        best, best_length = None, 0
+        for start, end, value in self.matches(text):
+            if end - start > best_length:
+                best, best_length = value, end - start
+        return best
+
+    def all(self, text: str) -> Optional[List[str]]:
+        """
+        Get the values of all the entries found in the text, including the overlapping ones,
+        in the order of their occurrence.
+        """
+        found = sorted((start, start - end, value) for start, end, value in self.matches(text))
+        return [value for _, _, value in found] or None
+
+
+opened_indices: Dict[str, VocabularyIndex] = dict()
+
+
+def open_index(path: str) -> VocabularyIndex:
+    """
+    Open an index file once per process, the slots that use the same file share its mapping.
+    The mapping is never reopened: after an index is rebuilt, a process keeps reading the previous version
+    of the file until it is restarted or the path is removed from `opened_indices`.
+    """
+    index = opened_indices.get(path)
+    if index is None:
+        index = opened_indices[path] = VocabularyIndex(path)
+    return index
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build a memory-mapped vocabulary index.")
+    parser.add_argument("source", help="text file with one entry or `entry<TAB>value` per line, or a JSON file")
+    parser.add_argument("output", help="path of the index file")
+    parser.add_argument("--case-sensitive", action="store_true", help="do not fold the case of the entries")
+    args = parser.parse_args(argv)
+
+    count = build_index(read_entries(args.source), args.output, args.case_sensitive)
+    print(f"{count} entries written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
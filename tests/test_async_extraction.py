@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from df_engine.core import Context, Actor
+from df_engine.core.keywords import RESPONSE, TRANSITIONS, PRE_TRANSITIONS_PROCESSING
+from df_engine import conditions as cnd
+
+from df_slots.slot_types import FunctionSlot, GroupSlot, RegexpSlot
+from df_slots.root import register_slots, register_storage
+from df_slots.handlers import extract_async
+from df_slots import processing
+
+
+def make_sleeper(delay: float, counter: dict):
+    async def sleeper(msg: str):
+        counter["active"] += 1
+        counter["max"] = max(counter["max"], counter["active"])
+        await asyncio.sleep(delay)
+        counter["active"] -= 1
+        return msg.upper()
+
+    return sleeper
+
+
+@pytest.fixture
+def counter():
+    yield {"active": 0, "max": 0}
+
+
+@pytest.fixture
+def local_root(counter):
+    children = [FunctionSlot(name=f"slow_{idx}", func=make_sleeper(0.05, counter)) for idx in range(4)]
+    group = GroupSlot(name="group", children=children + [RegexpSlot(name="word", regexp=r"\w+")])
+    yield register_slots([group, FunctionSlot(name="sync", func=lambda msg: msg.lower())], dict())
+
+
+def test_sync_coroutine_slot(testing_context, testing_actor):
+    testing_context.add_request("Groot")
+    slot = FunctionSlot(name="test", func=make_sleeper(0, {"active": 0, "max": 0}))
+    assert slot.extract_value(testing_context, testing_actor) == "GROOT"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(("max_concurrency", "expected_max"), [(None, 4), (2, 2), (1, 1)])
+async def test_extract_async(max_concurrency, expected_max, counter, local_root, testing_context, testing_actor):
+    testing_context.add_request("Groot")
+    result = await extract_async(
+        testing_context, testing_actor, ["group", "sync", "missing"], local_root, max_concurrency=max_concurrency
+    )
+    expected_group = {f"group/slow_{idx}": "GROOT" for idx in range(4)}
+    expected_group["group/word"] = "Groot"
+    assert result == [expected_group, "groot", None]
+    assert counter["max"] == expected_max
+    assert testing_context.framework_states["slots"]["group/slow_0"] == "GROOT"
+    assert testing_context.framework_states["slots"]["sync"] == "groot"
+
+
+@pytest.mark.asyncio
+async def test_timeout(local_root, testing_context, testing_actor):
+    testing_context.add_request("Groot")
+    result = await extract_async(testing_context, testing_actor, ["group/slow_0", "sync"], local_root, timeout=0.01)
+    assert result == [None, "groot"]
+
+
+def test_processing(local_root, testing_context, testing_actor):
+    testing_context.add_request("Groot")
+    processing.extract_async(["group"], local_root, max_concurrency=2)(testing_context, testing_actor)
+    assert testing_context.framework_states["slots"]["group/slow_3"] == "GROOT"
+    assert testing_context.framework_states["slots"]["group/word"] == "Groot"
+
+
+@pytest.mark.asyncio
+async def test_processing_in_running_loop(local_root, testing_context, testing_actor):
+    testing_context.add_request("Groot")
+    assert processing.extract_async(["group/slow_1"], local_root)(testing_context, testing_actor) is testing_context
+    assert testing_context.framework_states["slots"]["group/slow_1"] == "GROOT"
+
+
+def test_actor_in_running_loop(local_root):
+    script = {
+        "flow": {
+            "node": {
+                RESPONSE: "ok",
+                PRE_TRANSITIONS_PROCESSING: {"extract": processing.extract_async(["group/slow_2"], local_root)},
+                TRANSITIONS: {("flow", "node"): cnd.true()},
+            }
+        }
+    }
+    actor = Actor(script=script, start_label=("flow", "node"))
+    register_storage(actor)
+
+    async def run_turn():
+        ctx = Context()
+        ctx.add_request("Groot")
+        return actor(ctx)
+
+    ctx = asyncio.run(run_turn())
+    assert ctx.framework_states["slots"]["group/slow_2"] == "GROOT"
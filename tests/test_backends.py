@@ -0,0 +1,96 @@
+import pytest
+
+from df_engine.core import Context, Actor
+from df_engine.core.keywords import RESPONSE, TRANSITIONS, PRE_TRANSITIONS_PROCESSING
+from df_engine import conditions as cnd
+
+from df_slots.slot_types import RegexpSlot
+from df_slots.root import register_slots, register_storage, SlotRegistry
+from df_slots.storage import SlotStorage
+from df_slots.processing import extract
+from df_slots.backends import InMemoryBackend, SQLiteBackend, WriteBehindBackend, StorageBackend
+
+
+class RecordingBackend(InMemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.saves = []
+
+    def save(self, context_id, changed, deleted=()):
+        self.saves.append((dict(changed), set(deleted)))
+        super().save(context_id, changed, deleted)
+
+
+def make_actor(backend: StorageBackend, extracting: bool = True) -> Actor:
+    local_root = register_slots([RegexpSlot(name="name", regexp=r"(?<=am )\w+")], SlotRegistry())
+    node = {RESPONSE: "ok", TRANSITIONS: {("flow", "node"): cnd.true()}}
+    if extracting:
+        node[PRE_TRANSITIONS_PROCESSING] = {"extract": extract(["name"], root=local_root)}
+    script = {"flow": {"node": node}}
+    actor = Actor(script=script, start_label=("flow", "node"))
+    register_storage(actor, storage={"greeting": "hello"}, backend=backend)
+    return actor
+
+
+def run_turn(actor: Actor, ctx: Context, request: str) -> Context:
+    ctx.add_request(request)
+    return actor(ctx)
+
+
+@pytest.fixture(params=["memory", "sqlite", "write_behind"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        backend = InMemoryBackend()
+    elif request.param == "sqlite":
+        backend = SQLiteBackend(str(tmp_path / "slots.db"))
+    else:
+        backend = WriteBehindBackend(SQLiteBackend(str(tmp_path / "slots.db")), max_pending=2, interval=60)
+    yield backend
+    backend.close()
+
+
+def test_shared_state(backend):
+    writer, reader = make_actor(backend), make_actor(backend, extracting=False)
+    ctx = run_turn(writer, Context(), "I am Groot")
+    assert backend.load(str(ctx.id)) == {"name": "Groot"}
+    # another worker gets the context without the slot values
+    restored = run_turn(reader, Context(id=ctx.id), "hi")
+    assert restored.framework_states["slots"] == {"greeting": "hello", "name": "Groot"}
+
+    run_turn(writer, Context(id=ctx.id), "I am Rocket")
+    restored = run_turn(reader, restored, "hi")
+    assert restored.framework_states["slots"]["name"] == "Rocket"
+    assert backend.load(str(ctx.id)) == {"name": "Rocket"}
+
+
+def test_changed_keys_only():
+    backend = RecordingBackend()
+    actor = make_actor(backend)
+    ctx = run_turn(actor, Context(), "I am Groot")
+    ctx.framework_states["slots"].pop("greeting")
+    ctx = run_turn(actor, ctx, "I am Groot")
+    assert backend.saves == [({"name": "Groot"}, set()), ({"name": "Groot"}, {"greeting"})]
+
+
+def test_storage_changes():
+    storage = SlotStorage({"a": 1})
+    storage.load({"b": 2})
+    assert storage.pop_changes() == (dict(), set())
+    storage["c"] = 3
+    del storage["a"]
+    storage.load({"c": 4})
+    assert storage.pop_changes() == ({"c": 3}, {"a"})
+    assert storage.pop_changes() == (dict(), set())
+
+
+def test_write_behind(tmp_path):
+    sqlite = SQLiteBackend(str(tmp_path / "slots.db"))
+    backend = WriteBehindBackend(sqlite, max_pending=2, interval=60)
+    backend.save("first", {"a": 1, "b": 2})
+    backend.save("first", {"a": 3}, {"b"})
+    assert sqlite.load("first") == dict()
+    assert backend.load("first") == {"a": 3}
+    backend.save("second", {"c": [1, 2]})
+    assert sqlite.load("first") == {"a": 3}
+    assert sqlite.load("second") == {"c": [1, 2]}
+    backend.close()
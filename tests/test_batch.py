@@ -0,0 +1,83 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from df_engine.core import Context
+
+from df_slots.slot_types import FunctionSlot, GroupSlot, RegexpSlot, ValueSlot
+from df_slots.root import register_slots
+from df_slots.handlers import extract, extract_batch
+
+REQUESTS = ["my username is groot", "my email is groot@gmail.com", "Bob Page", ""]
+
+
+def count_words(msg: str) -> int:
+    return len(msg.split())
+
+
+class LengthSlot(ValueSlot):
+    def extract_value(self, ctx, actor):
+        return len(ctx.last_request)
+
+
+@pytest.fixture
+def calls():
+    yield []
+
+
+@pytest.fixture
+def local_root(calls):
+    def upper_batch(requests):
+        calls.append(requests)
+        return [request.upper() for request in requests]
+
+    person = GroupSlot(
+        name="person",
+        children=[
+            RegexpSlot(name="username", regexp=r"(?<=username is )[a-zA-Z]+"),
+            RegexpSlot(name="email", regexp=r"(?<=email is )[a-z@\.A-Z]+"),
+        ],
+    )
+    other = [
+        FunctionSlot(name="upper", func=str.upper, batch_func=upper_batch),
+        FunctionSlot(name="words", func=count_words, cpu_bound=True),
+        LengthSlot(name="length"),
+    ]
+    yield register_slots([person] + other, dict())
+
+
+def test_batch(local_root, calls, testing_actor):
+    result = extract_batch(REQUESTS, testing_actor, ["person", "upper", "words", "length"], local_root)
+    assert result == {
+        "person/username": ["groot", None, None, None],
+        "person/email": [None, "groot@gmail.com", None, None],
+        "upper": [request.upper() for request in REQUESTS],
+        "words": [4, 4, 2, 0],
+        "length": [len(request) for request in REQUESTS],
+    }
+    assert calls == [REQUESTS]
+
+
+def test_batch_contexts(local_root, testing_actor):
+    contexts = []
+    for request in REQUESTS:
+        ctx = testing_actor(Context())
+        ctx.add_request(request)
+        contexts.append(ctx)
+    result = extract_batch(contexts, testing_actor, ["person", "words"], local_root)
+    for idx, ctx in enumerate(contexts):
+        [person, words] = extract(ctx, testing_actor, ["person", "words"], local_root)
+        assert {name: result[name][idx] for name in person} == person
+        assert result["words"][idx] == words
+
+
+def test_batch_executor(local_root):
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        result = extract_batch(REQUESTS * 10, None, ["words"], local_root, executor=executor)
+    assert result == {"words": [4, 4, 2, 0] * 10}
+
+
+def test_batch_length_mismatch(local_root):
+    slot = FunctionSlot(name="broken", func=str.upper, batch_func=lambda requests: requests[:1])
+    with pytest.raises(ValueError):
+        extract_batch(REQUESTS, None, ["broken"], register_slots([slot], dict()))
@@ -0,0 +1,50 @@
+from benchmarks.measure import percentile, compare, find_regressions
+from benchmarks.run import run, main
+from benchmarks.codec import run as codec_run
+from benchmarks.gazetteer import run as gazetteer_run
+from df_slots.root import root
+
+
+def test_percentile():
+    samples = list(range(1, 101))
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile([3.0], 99) == 3.0
+
+
+def test_run():
+    saved_root = dict(root)
+    results = run(width=2, depth=2, requests=4, length=8, repeat=12)
+    assert set(results) == {
+        "extract",
+        "extract_lazy",
+        "get_values",
+        "fill_template",
+        "is_set_all",
+        "register_slots",
+        "autoregister",
+        "actor_turn",
+    }
+    assert all(result["throughput"] > 0 and result["p99_us"] >= result["p50_us"] for result in results.values())
+    assert dict(root) == saved_root
+    changes = compare(results, {"results": {"extract": results["extract"]}})
+    assert changes["extract"] == 0 and changes["get_values"] is None
+    assert find_regressions({"extract": 0.2, "get_values": None, "is_set_all": 0.05}, 0.1) == ["extract"]
+
+
+def test_baseline(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    args = ["--width", "2", "--depth", "1", "--repeat", "12", "--case", "is_set_all"]
+    assert main(args + ["--save", path]) == 0
+    assert main(args + ["--compare", path, "--threshold", "1000"]) == 0
+
+
+def test_codec():
+    results, sizes = codec_run(width=2, depth=2, repeat=12)
+    assert len(results) == 6
+    assert sizes["msgpack_interned"] < sizes["json_interned"] < sizes["json"]
+
+
+def test_gazetteer():
+    results, build = gazetteer_run(entries=200, requests=4, length=8, repeat=12)
+    assert set(results) == {"regexp_search", "automaton_longest"} and set(build) == {"regexp", "automaton"}
@@ -0,0 +1,145 @@
+import pytest
+
+from df_engine.core import Context, Actor
+from df_engine.core.keywords import RESPONSE, TRANSITIONS
+from df_engine import conditions as cnd
+
+from df_slots import codec
+from df_slots.codec import SlotCodec, PathTable, packb, unpackb, path_id
+from df_slots.slot_types import RegexpSlot, GroupSlot
+from df_slots.root import register_slots, register_storage, SlotRegistry
+from df_slots.storage import SlotStorage
+
+
+@pytest.fixture
+def local_root():
+    slots = [
+        GroupSlot(
+            name="person",
+            children=[RegexpSlot(name="name", regexp=r"(?<=am )\w+"), RegexpSlot(name="email", regexp=r"\S+@\S+")],
+        ),
+        RegexpSlot(name="city", regexp=r"(?<=from )\w+"),
+    ]
+    return register_slots(slots, SlotRegistry())
+
+
+@pytest.mark.parametrize(
+    "obj",
+    [
+        None,
+        True,
+        False,
+        0,
+        127,
+        128,
+        65536,
+        2**64 - 1,
+        -1,
+        -33,
+        -(2**63),
+        1.5,
+        "",
+        "a" * 32,
+        "é" * 200,
+        "x" * 70000,
+        b"bytes",
+        list(range(20)),
+        {"a": [1, {"b": None}]},
+        {str(i): i for i in range(20)},
+    ],
+)
+def test_packb(obj, monkeypatch):
+    monkeypatch.setattr(codec, "msgpack", None)
+    assert unpackb(packb(obj)) == obj
+
+
+def test_packb_errors(monkeypatch):
+    monkeypatch.setattr(codec, "msgpack", None)
+    with pytest.raises(TypeError):
+        packb(object())
+    with pytest.raises(OverflowError):
+        packb(2**64)
+    with pytest.raises(ValueError):
+        unpackb(packb(1) + b"\x00")
+
+
+def test_encode(local_root):
+    slot_codec = SlotCodec(local_root)
+    storage = SlotStorage({"person/name": "Ann", "person/email": None, "city": "Paris", "custom": {"a": 1}})
+    payload = slot_codec.encode(storage)
+    assert payload["n"] == {"custom": {"a": 1}}
+    assert len(payload["v"]) == 4
+    decoded = slot_codec.decode(payload)
+    assert isinstance(decoded, SlotStorage)
+    assert decoded == {"person/name": "Ann", "city": "Paris", "custom": {"a": 1}}
+    assert slot_codec.loads(slot_codec.dumps(storage)) == decoded
+    assert len(slot_codec.dumps(storage)) < len(str(dict(storage)))
+
+
+def test_registry_change(local_root):
+    storage = {"person/name": "Ann", "city": "Paris"}
+    payload, data = SlotCodec(local_root).encode(storage), SlotCodec(local_root).dumps(storage)
+    register_slots([RegexpSlot(name="country", regexp=r"\w+")], local_root)
+    assert SlotCodec(local_root).decode(payload) == storage
+    assert SlotCodec(local_root).loads(data) == storage
+
+    del local_root["city"]
+    assert SlotCodec(local_root).decode(payload) == {"person/name": "Ann"}
+
+
+def test_path_table(local_root):
+    table = PathTable()
+    slot_codec = SlotCodec(local_root, table)
+    payload = slot_codec.encode({"person/name": "Ann", "city": "Paris"})
+    assert sorted(payload["v"][::2]) == [1, 3]
+    # ids are never reassigned: a value of a removed slot is not decoded as the value of a new one
+    del local_root["city"]
+    register_slots([RegexpSlot(name="country", regexp=r"\w+")], local_root)
+    assert slot_codec.decode(payload) == {"person/name": "Ann"}
+    assert table.intern(["country", "city"]) == {"country": 4, "city": 3}
+
+
+def test_path_table_file(local_root, tmp_path):
+    file = str(tmp_path / "paths.jsonl")
+    first, second = PathTable(file), PathTable(file)
+    assert first.intern(["a", "b"]) == {"a": 0, "b": 1}
+    assert second.intern(["c", "b"]) == {"c": 2, "b": 1}
+    assert first.intern(["c"]) == {"c": 2}
+    storage = {"person/name": "Ann", "city": "Paris"}
+    data = SlotCodec(local_root, first).dumps(storage)
+    assert SlotCodec(local_root, PathTable(file)).loads(data) == storage
+
+
+def test_legacy_payload(local_root):
+    payload = {codec.CODEC_KEY: 1, "v": [path_id("person/name"), "Ann", path_id("removed"), "x"]}
+    assert SlotCodec(local_root).decode(payload) == {"person/name": "Ann"}
+    assert SlotCodec(local_root).loads(packb([1, [path_id("city"), "Paris"], {"custom": 1}])) == {
+        "city": "Paris",
+        "custom": 1,
+    }
+
+
+def test_context_round_trip(local_root):
+    slot_codec = SlotCodec(local_root)
+    ctx = Context()
+    ctx.framework_states["slots"] = SlotStorage({"person/name": "Ann", "city": None})
+    packed = slot_codec.pack(ctx)
+    assert isinstance(ctx.framework_states["slots"], SlotStorage)
+    restored = Context.parse_raw(packed.json())
+    assert slot_codec.is_encoded(restored.framework_states["slots"])
+    assert slot_codec.unpack(restored).framework_states["slots"] == {"person/name": "Ann"}
+
+
+def test_register_storage(local_root):
+    slot_codec = SlotCodec(local_root)
+    script = {"flow": {"node": {RESPONSE: "ok", TRANSITIONS: {("flow", "node"): cnd.true()}}}}
+    actor = Actor(script=script, start_label=("flow", "node"))
+    register_storage(actor, codec=slot_codec)
+    ctx = Context()
+    ctx.add_request("hi")
+    ctx = actor(ctx)
+    ctx.framework_states["slots"]["person/name"] = "Ann"
+    restored = Context.parse_raw(slot_codec.pack(ctx).json())
+    restored.add_request("hi again")
+    restored = actor(restored)
+    assert restored.framework_states["slots"]["person/name"] == "Ann"
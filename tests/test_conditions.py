@@ -0,0 +1,67 @@
+import pytest
+
+from df_slots.slot_types import RegexpSlot, GroupSlot
+from df_slots.root import SlotRegistry, register_slots
+from df_slots.conditions import is_set, is_set_all, is_set_any, is_set_none, is_set_at_least
+
+
+@pytest.fixture
+def local_root():
+    person = GroupSlot(
+        name="person",
+        children=[
+            RegexpSlot(name="name", regexp=r".+"),
+            GroupSlot(name="contact", children=[RegexpSlot(name="email", regexp=r".+")]),
+        ],
+    )
+    yield register_slots([person, RegexpSlot(name="pet", regexp=r".+")], SlotRegistry())
+
+
+@pytest.mark.parametrize(
+    ("condition", "expected"),
+    [
+        (lambda root: is_set_all(["person/name", "pet"], root=root), True),
+        (lambda root: is_set_all(["person"], root=root), False),
+        (lambda root: is_set_all(["pet", "missing"], root=root), False),
+        (lambda root: is_set_any(["person", "missing", "pet"], root=root), True),
+        (lambda root: is_set_any(["person/contact"], root=root), False),
+        (lambda root: is_set_none(["person/contact", "missing"], root=root), True),
+        (lambda root: is_set_none(["person/contact", "pet"], root=root), False),
+        (lambda root: is_set_at_least(2, ["person/name", "person", "pet"], root=root), True),
+        (lambda root: is_set_at_least(3, ["person/name", "person", "pet"], root=root), False),
+        (lambda root: is_set_at_least(0, [], root=root), True),
+        (
+            lambda root: is_set_all(
+                ["pet", is_set_any(["person/contact", is_set_none(["person/contact"], root=root)], root=root)],
+                root=root,
+            ),
+            True,
+        ),
+    ],
+)
+def test_conditions(condition, expected, local_root, testing_context, testing_actor):
+    testing_context.framework_states["slots"].update({"person/name": "Groot", "pet": "raccoon"})
+    assert condition(local_root)(testing_context, testing_actor) == expected
+
+
+def test_registry_changes(local_root, testing_context, testing_actor):
+    condition = is_set_all(["fish"], root=local_root)
+    testing_context.framework_states["slots"].update({"fish": "nemo"})
+    assert condition(testing_context, testing_actor) == False
+    register_slots([RegexpSlot(name="fish", regexp=r".+")], local_root)
+    assert condition(testing_context, testing_actor) == True
+    local_root.pop("fish")
+    assert condition(testing_context, testing_actor) == False
+
+
+def test_plain_root(testing_context, testing_actor):
+    plain_root = register_slots([RegexpSlot(name="pet", regexp=r".+")], dict())
+    condition = is_set_any(["pet"], root=plain_root)
+    assert condition(testing_context, testing_actor) == False
+    testing_context.framework_states["slots"]["pet"] = "raccoon"
+    assert condition(testing_context, testing_actor) == True
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        is_set(["pet"], use_all=True, use_any=True)
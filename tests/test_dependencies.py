@@ -0,0 +1,113 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from df_engine.core import Context
+
+from df_slots.slot_types import RegexpSlot, GroupSlot, FunctionSlot
+from df_slots.root import register_slots, SlotRegistry
+from df_slots.runtime import compile_slots
+from df_slots.dependencies import schedule
+from df_slots.extraction import extract_slots, extract_slots_async, extract_batch
+from df_slots.handlers import extract
+
+
+def normalize_city(request, inputs):
+    return f"{request.split()[-1]}, {inputs['address/country']}"
+
+
+@pytest.fixture
+def calls():
+    yield []
+
+
+@pytest.fixture
+def address(calls):
+    def greet(request, inputs):
+        calls.append("greeting")
+        return f"Hello from {inputs['address/city']}"
+
+    return GroupSlot(
+        name="address",
+        children=[
+            FunctionSlot(name="greeting", func=greet, depends_on="address/city"),
+            FunctionSlot(name="city", func=normalize_city, cpu_bound=True, depends_on=["address/country"]),
+            RegexpSlot(name="country", regexp=r"(?<=from )\w+"),
+        ],
+    )
+
+
+@pytest.fixture
+def local_root(address):
+    yield register_slots([address], SlotRegistry())
+
+
+def make_context(request: str, storage: dict = None) -> Context:
+    ctx = Context()
+    ctx.framework_states["slots"] = storage if storage is not None else dict()
+    ctx.add_request(request)
+    return ctx
+
+
+def test_cycles():
+    registry = SlotRegistry()
+    with pytest.raises(ValueError, match="b -> a -> b"):
+        register_slots(
+            [
+                FunctionSlot(name="a", func=normalize_city, depends_on=["b"]),
+                FunctionSlot(name="b", func=normalize_city, depends_on=["a"]),
+            ],
+            registry,
+        )
+    with pytest.raises(ValueError):
+        register_slots([FunctionSlot(name="c", func=normalize_city, depends_on=["c"])], registry)
+    register_slots([FunctionSlot(name="d", func=normalize_city, depends_on=["e"])], registry)
+    with pytest.raises(ValueError, match="e -> d -> e"):
+        register_slots([FunctionSlot(name="e", func=normalize_city, depends_on=["d"])], registry)
+    assert "e" not in registry
+    with pytest.raises(ValueError, match="group"):
+        register_slots(
+            [GroupSlot(name="f", children=[]), FunctionSlot(name="g", func=normalize_city, depends_on=["f"])],
+            registry,
+        )
+
+
+def test_schedule(local_root):
+    leaves = [leaf for slot in compile_slots([local_root["address"]]) for leaf in slot.leaves()]
+    waves = schedule(leaves)
+    assert [[leaf.name for leaf in wave] for wave in waves] == [
+        ["address/country"],
+        ["address/city"],
+        ["address/greeting"],
+    ]
+
+
+@pytest.mark.parametrize("executor", [None, ThreadPoolExecutor(max_workers=2)])
+def test_extract(local_root, address, calls, testing_actor, executor):
+    ctx = make_context("I am from France and live in Paris")
+    [value] = extract_slots(ctx, testing_actor, [address], executor)
+    assert value == {
+        "address/country": "France",
+        "address/city": "Paris, France",
+        "address/greeting": "Hello from Paris, France",
+    }
+    [value] = asyncio.run(extract_slots_async(ctx, testing_actor, [address], executor=executor))
+    assert value["address/greeting"] == "Hello from Paris, France"
+
+    ctx = make_context("I live in Paris")
+    [value] = extract_slots(ctx, testing_actor, [address], executor)
+    assert value == {"address/country": None, "address/city": None, "address/greeting": None}
+    assert calls == ["greeting", "greeting"]
+
+
+def test_storage_inputs(local_root, testing_actor):
+    ctx = make_context("I live in Paris", {"address/country": "France"})
+    assert extract(ctx, testing_actor, ["address/city"], root=local_root) == ["Paris, France"]
+    assert ctx.framework_states["slots"]["address/city"] == "Paris, France"
+
+
+def test_batch(address, local_root):
+    values = extract_batch(["I am from France and live in Paris", "I live in Paris"], None, [address])
+    assert values["address/city"] == ["Paris, France", None]
+    assert values["address/greeting"] == ["Hello from Paris, France", None]
@@ -0,0 +1,76 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import pytest
+
+from df_slots.slot_types import FunctionSlot, GroupSlot
+from df_slots.root import register_slots
+from df_slots.handlers import extract, extract_async
+
+
+def count_words(msg: str) -> str:
+    return str(len(msg.split()))
+
+
+def get_pid(msg: str) -> int:
+    return os.getpid()
+
+
+def get_thread(msg: str) -> int:
+    return threading.get_ident()
+
+
+@pytest.fixture
+def local_root():
+    group = GroupSlot(
+        name="stats",
+        children=[
+            FunctionSlot(name="words", func=count_words, cpu_bound=True),
+            FunctionSlot(name="pid", func=get_pid, cpu_bound=True),
+            FunctionSlot(name="thread", func=get_thread, cpu_bound=True),
+            FunctionSlot(name="local_thread", func=lambda msg: threading.get_ident()),
+        ],
+    )
+    yield register_slots([group], dict())
+
+
+def test_validation():
+    with pytest.raises(ValueError):
+        FunctionSlot(name="test", func=lambda msg: msg, cpu_bound=True)
+
+    async def coroutine(msg):
+        return msg
+
+    with pytest.raises(ValueError):
+        FunctionSlot(name="test", func=coroutine, cpu_bound=True)
+    assert FunctionSlot(name="test", func=count_words, cpu_bound=True).cpu_bound
+
+
+def test_thread_pool(local_root, testing_context, testing_actor):
+    testing_context.add_request("I am Groot")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        [result] = extract(testing_context, testing_actor, ["stats"], local_root, executor=executor)
+    assert result["stats/words"] == "3"
+    assert result["stats/thread"] != result["stats/local_thread"] == threading.get_ident()
+    assert testing_context.framework_states["slots"]["stats/words"] == "3"
+
+
+def test_process_pool(local_root, testing_context, testing_actor):
+    testing_context.add_request("I am Groot")
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        [result] = extract(testing_context, testing_actor, ["stats"], local_root, executor=executor)
+    assert result["stats/words"] == "3"
+    assert result["stats/pid"] != os.getpid()
+    assert testing_context.framework_states["slots"]["stats/pid"] == result["stats/pid"]
+
+
+@pytest.mark.asyncio
+async def test_async_thread_pool(local_root, testing_context, testing_actor):
+    testing_context.add_request("I am Groot")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        [words, thread] = await extract_async(
+            testing_context, testing_actor, ["stats/words", "stats/thread"], local_root, executor=executor
+        )
+    assert words == "3"
+    assert thread != threading.get_ident()
@@ -0,0 +1,183 @@
+import re
+import itertools
+
+import pytest
+
+from df_engine.core import Context, Actor
+from df_engine.core.keywords import RESPONSE, TRANSITIONS, PRE_TRANSITIONS_PROCESSING
+
+from df_slots import processing, conditions, extraction
+from df_slots.root import register_slots, register_storage, SlotRegistry
+from df_slots.extraction import RegexpPlan, extract_slots, get_required_literal
+from df_slots.slot_types import RegexpSlot, GroupSlot, FunctionSlot, search_pattern
+from df_slots.storage import SlotStorage
+
+PATTERNS = [
+    r"(?<=username is )[a-zA-Z]+",
+    r"(?<=email is )[a-z@\.A-Z]+",
+    r"^[A-Z][a-z]+?(?= )",
+    r"(?<= )[A-Z][a-z]+",
+    r"[a-zA-Z\.]+@[a-zA-Z\.]+",
+    r".+",
+    r"x*",
+    r"(a)\1",
+    r"(?P<word>\w+) (?P=word)",
+    r"(?i)groot",
+    r"$",
+    r"no|match|here",
+]
+
+
+@pytest.mark.parametrize(
+    "input",
+    [
+        "",
+        "my username is groot",
+        "Bob Page, my email is groot@gmail.com",
+        "aa bb bb I am GROOT",
+        "multiple matches: Bob Page and John Doe",
+    ],
+)
+def test_plan(input):
+    patterns = [re.compile(pattern) for pattern in PATTERNS] + [re.compile("page", re.IGNORECASE)]
+    expected = [search.group() if search else None for search in (pattern.search(input) for pattern in patterns)]
+    assert RegexpPlan(patterns).search(input) == expected
+    assert RegexpPlan(patterns + patterns).search(input) == expected + expected
+    for mode in itertools.product([False, True], repeat=3):
+        expected = [search_pattern(pattern, input, *mode) for pattern in patterns]
+        assert RegexpPlan(patterns, [mode] * len(patterns)).search(input) == expected
+        # slots with the same pattern share its scan, whatever their modes
+        mixed = RegexpPlan(patterns + patterns, [mode] * len(patterns) + [(False, False, False)] * len(patterns))
+        assert mixed.search(input) == expected + RegexpPlan(patterns).search(input)
+
+
+def test_regexp_modes(testing_actor):
+    pattern = r"(?P<user>\w+)@(?P<domain>\w+)\.com"
+    group = GroupSlot(
+        name="emails",
+        children=[
+            RegexpSlot(name="first", regexp=pattern),
+            RegexpSlot(name="all", regexp=pattern, all_matches=True),
+            RegexpSlot(name="groups", regexp=pattern, groups=True),
+            RegexpSlot(name="spans", regexp=pattern, all_matches=True, spans=True),
+            RegexpSlot(name="guarded", regexp=pattern, all_matches=True, groups=True, max_length=20),
+        ],
+    )
+    local_root = register_slots([group], SlotRegistry())
+    ctx = testing_actor(Context())
+    ctx.add_request("write to bob@mail.com or to alice@post.com")
+    [values] = extract_slots(ctx, testing_actor, [group])
+    assert values == {
+        "emails/first": "bob@mail.com",
+        "emails/all": ["bob@mail.com", "alice@post.com"],
+        "emails/groups": {"user": "bob", "domain": "mail"},
+        "emails/spans": [
+            {"value": "bob@mail.com", "start": 9, "end": 21},
+            {"value": "alice@post.com", "start": 28, "end": 42},
+        ],
+        "emails/guarded": None,
+    }
+    assert group.children["spans"].extract_value(ctx, testing_actor) == values["emails/spans"]
+
+    ctx.framework_states["slots"] = values
+    template = group.children["spans"].fill_template("Sent to {emails/spans}")(ctx, testing_actor)
+    assert template == "Sent to bob@mail.com, alice@post.com"
+    with pytest.raises(ValueError):
+        RegexpSlot(name="groups", regexp=r"\w+", groups=True)
+
+
+@pytest.mark.parametrize(
+    ("regexp", "expected"),
+    [
+        (r"(?<=email is )[a-z@\.A-Z]+", "email is "),
+        (r"(?<=am ).+?(?=\.)", "am "),
+        (r"(ab|cd)x", "x"),
+        (r"(?:foo)+barbaz", "barbaz"),
+        (r"a*b?", None),
+        (r"(?i)groot", None),
+        (r"(?i:gr)oot", "oot"),
+    ],
+)
+def test_required_literal(regexp, expected):
+    assert get_required_literal(re.compile(regexp)) == expected
+
+
+def test_extract_slots(testing_context, testing_actor):
+    testing_context.add_request("I am Groot. My email is groot@gmail.com")
+    slots = [
+        GroupSlot(
+            name="person",
+            children=[
+                RegexpSlot(name="name", regexp=r"(?<=am ).+?(?=\.)"),
+                RegexpSlot(name="email", regexp=r"[a-zA-Z\.]+@[a-zA-Z\.]+"),
+            ],
+        ),
+        RegexpSlot(name="phone", regexp=r"\d+"),
+        FunctionSlot(name="length", func=lambda msg: str(len(msg))),
+    ]
+    assert extract_slots(testing_context, testing_actor, slots) == [
+        {"person/name": "Groot", "person/email": "groot@gmail.com"},
+        None,
+        "39",
+    ]
+
+
+def test_lazy_extract():
+    calls = []
+
+    def first_name(request):
+        calls.append("first_name")
+        return request.split()[-1]
+
+    def last_name(request):
+        calls.append("last_name")
+        return None
+
+    slot = GroupSlot(
+        name="friend",
+        children=[FunctionSlot(name="first_name", func=first_name), FunctionSlot(name="last_name", func=last_name)],
+    )
+    local_root = register_slots([slot], SlotRegistry())
+    script = {
+        "flow": {
+            "node": {
+                RESPONSE: "ok",
+                PRE_TRANSITIONS_PROCESSING: {"extract": processing.extract(["friend"], root=local_root, lazy=True)},
+                TRANSITIONS: {("flow", "node"): conditions.is_set_all(["friend/first_name"], root=local_root)},
+            }
+        }
+    }
+    actor = Actor(script=script, start_label=("flow", "node"))
+    register_storage(actor)
+    ctx = Context()
+    ctx.add_request("I am Groot")
+    ctx = actor(ctx)
+    assert calls == ["first_name"]
+    assert ctx.framework_states["slots"] == {"friend/first_name": "Groot"}
+
+    ctx.framework_states["slots"]["friend/last_name"] = "Smith"
+    ctx.add_request("I am Rocket")
+    ctx = actor(ctx)
+    assert calls == ["first_name", "first_name"]
+    assert ctx.framework_states["slots"] == {"friend/first_name": "Rocket", "friend/last_name": "Smith"}
+
+
+def test_lazy_plan(monkeypatch):
+    searches = []
+    search_regexp_slots = extraction.search_regexp_slots
+    monkeypatch.setattr(
+        extraction,
+        "search_regexp_slots",
+        lambda slots, text: searches.append(len(slots)) or search_regexp_slots(slots, text),
+    )
+    slots = [RegexpSlot(name=f"pattern_{idx}", regexp=pattern) for idx, pattern in enumerate(PATTERNS[:3])]
+    local_root = register_slots(slots, SlotRegistry())
+    ctx = Context()
+    ctx.framework_states["slots"] = SlotStorage()
+    ctx.add_request("My username is groot")
+    processing.extract(None, root=local_root, lazy=True)(ctx, None)
+    storage = ctx.framework_states["slots"]
+    assert searches == []
+    assert storage["pattern_0"] == "groot" and storage["pattern_1"] is None and storage.get("pattern_2") == "My"
+    # the deferred regexp slots are searched in one run of the plan
+    assert searches == [3]
@@ -0,0 +1,102 @@
+import pickle
+import random
+import string
+
+import pytest
+from pydantic import ValidationError
+
+from df_engine.core import Context
+
+from df_slots import fuzzy
+from df_slots.slot_types import FuzzySlot
+from df_slots.fuzzy import FuzzyIndex, edit_distance, similarity
+from df_slots.root import register_slots, SlotRegistry
+from df_slots.runtime import RuntimeFuzzy, compile_slot
+from df_slots.extraction import extract_batch
+from df_slots.handlers import extract
+
+CITIES = ["Paris", "London", "New York", "Newark", "Saint Petersburg", "Berlin"]
+
+
+def make_candidates(size: int, seed: int = 0):
+    rng = random.Random(seed)
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10))) for _ in range(size)]
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    position = rng.randrange(len(word))
+    return word[:position] + rng.choice(string.ascii_lowercase) + word[position + 1 :]
+
+
+def test_edit_distance():
+    assert edit_distance("kitten", "sitting", 5) == 3
+    assert edit_distance("kitten", "sitting", 2) == 3
+    assert edit_distance("", "abc", 3) == 3
+    assert similarity("paris", "pariss") == pytest.approx(5 / 6)
+    assert similarity("paris", "parsi", 0.8) == 0.0
+    assert similarity("paris", "pbris", 0.8) == pytest.approx(0.8)
+
+
+@pytest.mark.parametrize(
+    ("text", "threshold", "expected"),
+    [
+        ("I want to go to Pariss", 0.8, "Paris"),
+        ("I want to go to paris", 0.8, "Paris"),
+        ("flying to new yorc tomorrow", 0.8, "New York"),
+        ("flying to new yrok tomorrow", 0.8, None),
+        ("flying to newark tomorrow", 0.8, "Newark"),
+        ("a trip to saint peterburg", 0.8, "Saint Petersburg"),
+        ("I want to go to Prais", 0.8, None),
+        ("I want to go to Prais", 0.5, "Paris"),
+        ("", 0.8, None),
+    ],
+)
+def test_search(text, threshold, expected):
+    assert FuzzyIndex(CITIES).best(text, threshold) == expected
+
+
+def test_brute_force():
+    rng = random.Random(1)
+    candidates = make_candidates(500)
+    index = FuzzyIndex(candidates)
+    for word in rng.sample(candidates, 20):
+        query = misspell(word, rng)
+        expected = max(candidates, key=lambda candidate: similarity(query, candidate))
+        assert similarity(query, index.best(f"please find {query} now", 0.7)) == similarity(query, expected)
+
+
+def rank(candidates, text, limit=8):
+    index = FuzzyIndex(candidates, limit)
+    grams = [fuzzy.get_grams(span) for span in index.spans(text)]
+    return index._rank(grams) if fuzzy.numpy is None else index._rank_vectorized(grams)
+
+
+def test_ties(monkeypatch):
+    monkeypatch.setattr(fuzzy, "numpy", None)
+    # equal scores prefer the first span and the first candidates
+    assert rank(["abcx", "abcy", "abcz"], "abcq abcq", 2) == [(0, 0), (0, 1)]
+
+
+def test_vectorized(monkeypatch):
+    pytest.importorskip("numpy")
+    candidates = make_candidates(500)
+    text = "find " + candidates[3][:-1] + "x please"
+    vectorized = [rank(candidates, text), rank(["abcx", "abcy", "abcz"], "abcq abcq", 2)]
+    assert vectorized[0][0] == (1, 3) and vectorized[1] == [(0, 0), (0, 1)]
+    monkeypatch.setattr(fuzzy, "numpy", None)
+    assert [rank(candidates, text), rank(["abcx", "abcy", "abcz"], "abcq abcq", 2)] == vectorized
+
+
+def test_slot(testing_actor):
+    slot = FuzzySlot(name="city", candidates=CITIES)
+    assert slot.index is slot.index and len(slot.index) == len(CITIES)
+    assert pickle.loads(pickle.dumps(slot)).index.best("Londn") == "London"
+    with pytest.raises(ValidationError):
+        FuzzySlot(name="city", candidates=CITIES, threshold=0)
+
+    local_root = register_slots([slot], SlotRegistry())
+    assert isinstance(compile_slot(slot), RuntimeFuzzy)
+    ctx = testing_actor(Context())
+    ctx.add_request("I live in Berln")
+    assert extract(ctx, testing_actor, ["city"], root=local_root) == ["Berlin"]
+    assert extract_batch(["Londn calling", "nowhere"], None, [slot]) == {"city": ["London", None]}
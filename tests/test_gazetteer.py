@@ -0,0 +1,77 @@
+import pickle
+
+import pytest
+from pydantic import ValidationError
+
+from df_engine.core import Context
+
+from df_slots.slot_types import GazetteerSlot, GroupSlot
+from df_slots.gazetteer import Automaton
+from df_slots.root import register_slots, SlotRegistry
+from df_slots.runtime import RuntimeGazetteer, compile_slot
+from df_slots.extraction import extract_batch
+from df_slots.handlers import extract
+
+CITIES = ["York", "New York", "New York City", "Paris", "Paris Hilton", "Saint-Étienne", "Straße"]
+
+
+@pytest.mark.parametrize(
+    ("text", "options", "expected"),
+    [
+        ("I live in new york city", dict(), "New York City"),
+        ("I live in new york city", dict(all_matches=True), ["New York City", "New York", "York"]),
+        ("From Paris to York", dict(all_matches=True), ["Paris", "York"]),
+        ("I live in new york city", dict(case_sensitive=True), None),
+        ("I live in New York", dict(case_sensitive=True), "New York"),
+        ("Yorkshire and Parisian", dict(), None),
+        ("Yorkshire and Parisian", dict(word_boundaries=False, all_matches=True), ["York", "Paris"]),
+        ("saint-étienne, STRASSE", dict(all_matches=True), ["Saint-Étienne", "Straße"]),
+        ("nothing here", dict(all_matches=True), None),
+    ],
+)
+def test_automaton(text, options, expected):
+    all_matches = options.pop("all_matches", False)
+    automaton = Automaton(CITIES, **options)
+    assert (automaton.all(text) if all_matches else automaton.longest(text)) == expected
+
+
+def test_large_vocabulary():
+    vocabulary = [f"product {idx}" for idx in range(20000)]
+    automaton = Automaton(vocabulary + ["PRODUCT 1"])
+    assert len(automaton) == 20000
+    assert automaton.longest("I want product 12345 and product 7") == "product 12345"
+    assert automaton.all("I want product 12345 and product 7") == ["product 12345", "product 7"]
+    assert automaton.all("product 123456") is None
+
+
+def test_slot(tmp_path, testing_context, testing_actor):
+    path = tmp_path / "names.txt"
+    path.write_text("Groot\n\n  Rocket  \n", encoding="utf-8")
+    slot = GazetteerSlot(name="name", vocabulary=["Gamora"], vocabulary_path=str(path))
+    assert slot.automaton.entries == ["Gamora", "Groot", "Rocket"]
+    assert slot.automaton is slot.automaton
+    assert slot.extract_value(testing_context, testing_actor) == "Groot"
+    assert pickle.loads(pickle.dumps(slot)).extract_value(testing_context, testing_actor) == "Groot"
+    with pytest.raises(ValidationError):
+        GazetteerSlot(name="name")
+
+
+def test_extract(testing_actor):
+    group = GroupSlot(
+        name="trip",
+        children=[
+            GazetteerSlot(name="city", vocabulary=CITIES),
+            GazetteerSlot(name="cities", vocabulary=CITIES, all_matches=True),
+        ],
+    )
+    local_root = register_slots([group], SlotRegistry())
+    runtime = compile_slot(group)
+    assert all(isinstance(leaf, RuntimeGazetteer) for leaf in runtime.leaves())
+
+    ctx = testing_actor(Context())
+    ctx.add_request("From Paris to New York")
+    assert extract(ctx, testing_actor, ["trip"], root=local_root) == [
+        {"trip/city": "New York", "trip/cities": ["Paris", "New York", "York"]}
+    ]
+    values = extract_batch(["From Paris to New York", "Nowhere"], None, [group])
+    assert values == {"trip/city": ["New York", None], "trip/cities": [["Paris", "New York", "York"], None]}
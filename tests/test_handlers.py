@@ -2,6 +2,8 @@ import sys
 
 import pytest
 
+from df_engine.core import Context
+
 from df_slots.handlers import get_values, get_filled_template, extract
 from df_slots import FunctionSlot, register_root_slots
 
@@ -38,3 +40,14 @@ def test_error(testing_context, testing_actor):
     with pytest.raises(ValueError):
         result = get_filled_template("{non-existent_slot}", testing_context, testing_actor, ["non-existent_slot"])
     assert True
+
+
+def test_context_isolation(testing_actor, root):
+    root.clear()
+    slot = FunctionSlot(name="creature_name", func=lambda x: x.partition("name is ")[-1] or None)
+    contexts = [testing_actor(Context()) for _ in range(2)]
+    contexts[0].add_request("my name is Groot")
+    contexts[1].add_request("my name is Rocket")
+    assert [extract(ctx, testing_actor) for ctx in contexts] == [["Groot"], ["Rocket"]]
+    assert [get_values(ctx, testing_actor) for ctx in contexts] == [["Groot"], ["Rocket"]]
+    assert slot.is_set(contexts[0]) and slot.get_value(contexts[1]) == "Rocket"
@@ -0,0 +1,81 @@
+import logging
+
+import pytest
+
+from df_slots.slot_types import FunctionSlot, GroupSlot, RegexpSlot
+from df_slots.root import register_slots, SlotRegistry
+from df_slots.handlers import extract, get_filled_template
+from df_slots.conditions import is_set_all, is_set_any
+from df_slots import instrumentation
+from df_slots.instrumentation import InMemorySink, LoggingSink
+
+
+@pytest.fixture
+def sink():
+    sink = InMemorySink()
+    instrumentation.set_sink(sink)
+    yield sink
+    instrumentation.set_sink(None)
+
+
+@pytest.fixture
+def local_root():
+    group = GroupSlot(
+        name="person",
+        children=[
+            RegexpSlot(name="name", regexp=r"(?<=am )\w+"),
+            RegexpSlot(name="email", regexp=r"\S+@\S+"),
+            FunctionSlot(name="length", func=lambda msg: len(msg)),
+        ],
+    )
+    yield register_slots([group], SlotRegistry())
+
+
+def test_extraction_metrics(sink, local_root, testing_context, testing_actor):
+    extract(testing_context, testing_actor, ["person"], root=local_root)
+    extract(testing_context, testing_actor, ["person"], root=local_root)
+    assert sink.get_summary("extract_seconds", "handlers")["count"] == 2
+    assert sink.get_summary("slot_extraction_seconds", "person/length")["count"] == 1
+    assert sink.get_summary("regexp_plan_seconds", "plan")["count"] == 2
+    assert sink.get_counter("slot_match_total", "person/name") == 1
+    assert sink.get_counter("slot_no_match_total", "person/email") == 1
+    assert sink.get_counter("slot_memo_miss_total", "person/length") == 1
+    assert sink.get_counter("slot_memo_hit_total", "person/length") == 1
+
+
+def test_condition_and_template_metrics(sink, local_root, testing_context, testing_actor):
+    condition = is_set_any(["person/email", is_set_all(["person/name"], root=local_root)], root=local_root)
+    assert condition.label == "any(person/email, all(person/name))"
+    condition(testing_context, testing_actor)
+    assert sink.get_counter("condition_false_total", condition.label) == 1
+    assert sink.get_summary("condition_seconds", condition.label)["count"] == 1
+
+    get_filled_template("{person/name}", testing_context, testing_actor)
+    assert sink.get_summary("template_render_seconds", "handlers")["count"] == 1
+
+
+def test_prometheus(sink):
+    sink.observe("slot_extraction_seconds", 'a/"b"', 0.5)
+    sink.count("slot_match_total", "a/b", 2)
+    assert sink.to_prometheus().splitlines() == [
+        "# TYPE df_slots_slot_extraction_seconds summary",
+        'df_slots_slot_extraction_seconds_count{name="a/\\"b\\""} 1',
+        'df_slots_slot_extraction_seconds_sum{name="a/\\"b\\""} 0.5',
+        "# TYPE df_slots_slot_match_total counter",
+        'df_slots_slot_match_total{name="a/b"} 2',
+    ]
+
+
+def test_logging_sink(local_root, testing_context, testing_actor, caplog):
+    instrumentation.set_sink(LoggingSink(level=logging.INFO))
+    try:
+        with caplog.at_level(logging.INFO):
+            extract(testing_context, testing_actor, ["person/length"], root=local_root)
+    finally:
+        instrumentation.set_sink(None)
+    assert any(record.getMessage().startswith("slot_extraction_seconds[person/length]") for record in caplog.records)
+
+
+def test_disabled():
+    assert instrumentation.get_sink() is None
+    assert instrumentation.timer("extract_seconds", "handlers") is instrumentation.NULL_TIMER
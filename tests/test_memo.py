@@ -0,0 +1,162 @@
+import pytest
+
+from df_engine.core import Context
+
+from df_slots.slot_types import FunctionSlot, GroupSlot, RegexpSlot, ValueSlot, SlotInputs
+from df_slots.root import register_slots, SlotRegistry
+from df_slots.handlers import extract, extract_async
+from df_slots.memo import extraction_cache, get_memo_stats, reset_memo_stats
+from df_slots.extraction import INPUTS_KEY, last_requests
+from df_slots.storage import SlotStorage
+
+calls = []
+
+
+def count_words(msg: str) -> int:
+    calls.append(msg)
+    return len(msg.split())
+
+
+@pytest.fixture
+def local_root():
+    calls.clear()
+    extraction_cache.clear()
+    reset_memo_stats()
+    group = GroupSlot(
+        name="stats",
+        children=[
+            FunctionSlot(name="words", func=lambda msg: calls.append(msg) or len(msg)),
+            RegexpSlot(name="first", regexp=r"^\w+"),
+        ],
+    )
+    yield register_slots([group, FunctionSlot(name="count", func=count_words, deterministic=True)], dict())
+
+
+def test_turn_memo(local_root, testing_context, testing_actor):
+    assert extract(testing_context, testing_actor, ["stats"], root=local_root) == [
+        {"stats/words": 10, "stats/first": "I"}
+    ]
+    assert extract(testing_context, testing_actor, ["stats/words", "stats"], root=local_root) == [
+        10,
+        {"stats/words": 10, "stats/first": "I"},
+    ]
+    assert calls == ["I am Groot"]
+    assert get_memo_stats()["turn"] == {"hits": 2, "misses": 2}
+
+    testing_context.add_request("I am Groot")
+    extract(testing_context, testing_actor, ["stats"], root=local_root)
+    assert calls == ["I am Groot"] * 2
+
+
+@pytest.mark.asyncio
+async def test_turn_memo_async(local_root, testing_context, testing_actor):
+    await extract_async(testing_context, testing_actor, ["stats/words"], root=local_root)
+    await extract_async(testing_context, testing_actor, ["stats/words"], root=local_root)
+    assert calls == ["I am Groot"]
+
+
+def test_shared_cache(local_root, testing_actor):
+    for _ in range(3):
+        ctx = testing_actor(Context())
+        ctx.add_request("I am Groot")
+        assert extract(ctx, testing_actor, ["count"], root=local_root) == [3]
+    assert calls == ["I am Groot"]
+    assert get_memo_stats()["cache"] == {"hits": 2, "misses": 1}
+    reset_memo_stats()
+    assert get_memo_stats() == {
+        "turn": {"hits": 0, "misses": 0},
+        "cache": {"hits": 0, "misses": 0},
+        "inputs": {"hits": 0, "misses": 0},
+    }
+
+
+class GreetingSlot(ValueSlot):
+    def extract_value(self, ctx, actor):
+        calls.append(ctx.misc.get("language"))
+        return {"en": "hello", "fr": "bonjour"}.get(ctx.misc.get("language"))
+
+
+def test_input_memo(testing_actor):
+    calls.clear()
+    reset_memo_stats()
+    local_root = register_slots(
+        [
+            FunctionSlot(name="words", func=count_words, inputs=SlotInputs()),
+            FunctionSlot(name="name", func=lambda msg: msg.split()[-1], inputs=SlotInputs(requests=2)),
+            FunctionSlot(
+                name="title", func=lambda msg, inputs: "Mr " + inputs["name"], depends_on=["name"], inputs=SlotInputs()
+            ),
+            GreetingSlot(name="greeting", inputs=SlotInputs(requests=0, misc=["language"], slots=["name"])),
+        ],
+        SlotRegistry(),
+    )
+    ctx = testing_actor(Context())
+    ctx.misc["language"] = "en"
+    for request in ["I am Groot", "I am Groot", "I am Rocket"]:
+        ctx.add_request(request)
+        values = extract(ctx, testing_actor, root=local_root)
+    assert values == [3, "Rocket", "Mr Rocket", "hello"]
+    # the number of words and the title are extracted again for a new request only,
+    # the greeting when the name stored in the previous turns changes, and the name on every turn
+    assert calls == ["I am Groot", "en", "en", "I am Rocket"]
+    assert get_memo_stats()["inputs"] == {"hits": 3, "misses": 9}
+
+    ctx.misc["language"] = "fr"
+    assert extract(ctx, testing_actor, ["greeting", "words"], root=local_root) == ["bonjour", 3]
+    assert calls[-1] == "fr" and calls.count("I am Rocket") == 1
+
+
+def test_persisted_inputs(testing_actor):
+    calls.clear()
+    reset_memo_stats()
+    slot = FunctionSlot(name="words", func=count_words, inputs=SlotInputs())
+    local_root = register_slots([slot], SlotRegistry())
+    ctx = testing_actor(Context())
+    ctx.add_request("I am Groot")
+    assert extract(ctx, testing_actor, root=local_root) == [3]
+
+    # only fingerprints are kept, the values are read from the storage, and both survive the serialization
+    [digest] = ctx.framework_states[INPUTS_KEY].values()
+    assert isinstance(digest, str) and "Groot" not in digest
+    restored = Context.parse_raw(ctx.json())
+    restored.framework_states["slots"] = SlotStorage(restored.framework_states["slots"])
+    assert extract(restored, testing_actor, root=local_root) == [3]
+    assert calls == ["I am Groot"]
+
+    # a different slot at the same path does not reuse the value
+    other = FunctionSlot(name="words", func=lambda msg: len(msg), inputs=SlotInputs())
+    assert extract(restored, testing_actor, root=register_slots([other], SlotRegistry())) == [10]
+    assert get_memo_stats()["inputs"] == {"hits": 1, "misses": 2}
+
+
+def test_turn_memo_registries(testing_context, testing_actor):
+    digits = register_slots([RegexpSlot(name="x", regexp=r"\d+")], dict())
+    letters = register_slots([RegexpSlot(name="x", regexp=r"[a-z]+")], dict())
+    testing_context.add_request("abc 123")
+    assert extract(testing_context, testing_actor, ["x"], root=digits) == ["123"]
+    assert extract(testing_context, testing_actor, ["x"], root=letters) == ["abc"]
+
+
+def test_inputs_read_from_storage(testing_actor):
+    calls.clear()
+    local_root = register_slots([FunctionSlot(name="words", func=count_words, inputs=SlotInputs())], SlotRegistry())
+    ctx = testing_actor(Context())
+    ctx.add_request("I am Groot")
+    assert extract(ctx, testing_actor, root=local_root) == [3]
+    ctx.add_request("I am Groot")
+    assert extract(ctx, testing_actor, root=local_root) == [3]
+    assert calls == ["I am Groot"]
+    # a value changed in the storage is not the value of the last extraction, so it is extracted again
+    for change in [lambda storage: storage.update(words=10), lambda storage: storage.pop("words")]:
+        change(ctx.framework_states["slots"])
+        ctx.add_request("I am Groot")
+        assert extract(ctx, testing_actor, root=local_root) == [3]
+    assert calls == ["I am Groot"] * 3
+
+
+def test_last_requests():
+    ctx = Context()
+    for request in ["a", "b", "c"]:
+        ctx.add_request(request)
+    assert last_requests(ctx, 2) == ("b", "c") and last_requests(ctx, 5) == ("a", "b", "c")
+    assert last_requests(ctx, 0) == () and last_requests(Context(), 1) == ()
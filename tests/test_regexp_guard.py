@@ -0,0 +1,120 @@
+import re
+import time
+import logging
+import threading
+
+import pytest
+from pydantic import ValidationError
+
+from df_engine.core import Context
+
+from df_slots import regexp_guard, instrumentation
+from df_slots.instrumentation import InMemorySink
+from df_slots.regexp_guard import analyze_pattern, get_guard, run_with_budget, BudgetExceeded
+from df_slots.slot_types import RegexpSlot
+from df_slots.root import register_slots, SlotRegistry
+from df_slots.runtime import compile_slot
+from df_slots.extraction import extract_batch
+from df_slots.handlers import extract
+
+EMAIL = r"^([a-zA-Z0-9_\.\-])+\@(([a-zA-Z0-9\-])+\.)+([a-zA-Z0-9]{2,4})+$"
+
+
+@pytest.mark.parametrize(
+    ("pattern", "kinds"),
+    [
+        (r"^(a+)+$", {"exponential"}),
+        (r"^([\w\.]+)+@", {"exponential"}),
+        (r"(\w+\.?)+$", {"exponential"}),
+        (r"^(\w|\d\w)+$", {"exponential"}),
+        (EMAIL, {"exponential", "polynomial"}),
+        (r".*.*=.*", {"polynomial"}),
+        (r"\w+\s*\w+$", {"polynomial"}),
+        (r"(\w+\.)+", set()),
+        (r"(\w|-)+", set()),
+        (r"(?<=am ).+", set()),
+        (r"[a-zA-Z\.]+@[a-zA-Z\.]+", set()),
+        (r"\w+ \w+!", set()),
+    ],
+)
+def test_analysis(pattern, kinds):
+    assert {risk.kind for risk in analyze_pattern(re.compile(pattern))} == kinds
+
+
+def test_registration(caplog, monkeypatch):
+    with caplog.at_level(logging.WARNING):
+        RegexpSlot(name="email", regexp=EMAIL)
+    assert "catastrophic backtracking" in caplog.text
+    monkeypatch.setattr(regexp_guard, "strict", True)
+    with pytest.raises(ValidationError):
+        RegexpSlot(name="email", regexp=r"^(a+)+$")
+    RegexpSlot(name="equation", regexp=r".*.*=.*")
+    with pytest.raises(ValidationError):
+        RegexpSlot(name="name", regexp=r"\w+", max_length=0)
+
+
+def test_max_length(testing_actor):
+    slot = RegexpSlot(name="name", regexp=r"(?<=am )\w+", max_length=10)
+    assert slot.guard is slot.guard and slot.guard.max_length == 10
+    assert RegexpSlot(name="name", regexp=r"(?<=am )\w+").guard is None
+    local_root = register_slots([slot], SlotRegistry())
+    assert compile_slot(slot).guard is not None
+
+    sink = InMemorySink()
+    instrumentation.set_sink(sink)
+    try:
+        ctx = testing_actor(Context())
+        ctx.add_request("I am Groot")
+        assert extract(ctx, testing_actor, ["name"], root=local_root) == ["Groot"]
+        assert extract_batch(["I am Rocket", "I am"], None, [slot]) == {"name": [None, None]}
+        assert sink.get_counter("slot_regexp_oversize_total", "name") == 1
+        # a long text is not cut, the anchors would match at the cut
+        anchored = RegexpSlot(name="word", regexp=r"^(a|aa)+$", max_length=5)
+        assert extract_batch(["aaaaaaa", "aaaa"], None, [anchored]) == {"word": [None, "aaaa"]}
+    finally:
+        instrumentation.set_sink(None)
+
+
+def test_time_budget(testing_actor):
+    sink = InMemorySink()
+    instrumentation.set_sink(sink)
+    try:
+        slot = RegexpSlot(name="word", regexp=r"^(a+)+$", time_budget=0.05)
+        local_root = register_slots([slot], SlotRegistry())
+        ctx = testing_actor(Context())
+        ctx.add_request("a" * 40 + "b")
+        start = time.perf_counter()
+        assert extract(ctx, testing_actor, ["word"], root=local_root) == [None]
+        assert time.perf_counter() - start < 1
+        assert sink.get_counter("slot_regexp_timeout_total", "word") == 1
+        ctx.add_request("a" * 40)
+        assert extract(ctx, testing_actor, ["word"], root=local_root) == ["a" * 40]
+    finally:
+        instrumentation.set_sink(None)
+
+
+def test_run_with_budget():
+    with pytest.raises(BudgetExceeded):
+        run_with_budget(lambda: time.sleep(1), 0.01)
+    results = []
+    # the timer only interrupts the main thread, other threads run without a budget
+    thread = threading.Thread(target=lambda: results.append(run_with_budget(lambda: time.sleep(0.05) or 1, 0.01)))
+    thread.start()
+    thread.join()
+    assert results == [1]
+
+
+def test_linear_engine(monkeypatch):
+    class LinearEngine:
+        compile = staticmethod(lambda pattern: re.compile(pattern))
+
+    if regexp_guard.re2 is None:
+        assert regexp_guard.compile_linear(re.compile(r"^(a+)+$")) is None
+    monkeypatch.setattr(regexp_guard, "re2", LinearEngine)
+    guard = get_guard(re.compile(r"^(a+)+$", re.IGNORECASE))
+    assert guard is not None and guard.linear.pattern == "(?i)^(a+)+$"
+    assert guard.search("AAA") == "AAA"
+    assert get_guard(re.compile(r"\w+")) is None
+    # the classes and word boundaries of re2 only match ASCII characters
+    assert get_guard(re.compile(r"^(\w+\s?)+$")) is None
+    assert get_guard(re.compile(r"^(\w+\s?)+$", re.ASCII)).linear.pattern == "^(\\w+\\s?)+$"
@@ -0,0 +1,76 @@
+import pickle
+
+import pytest
+
+from df_slots.slot_types import RegexpSlot, GroupSlot
+from df_slots.root import SlotRegistry, register_slots, register_root_slots
+
+
+@pytest.fixture
+def registry():
+    person = GroupSlot(
+        name="person",
+        children=[
+            RegexpSlot(name="name", regexp=r".+"),
+            GroupSlot(name="contact", children=[RegexpSlot(name="email", regexp=r".+")]),
+        ],
+    )
+    personality = GroupSlot(name="personality", children=[RegexpSlot(name="trait", regexp=r".+")])
+    yield register_slots([person, personality, RegexpSlot(name="pet", regexp=r".+")], SlotRegistry())
+
+
+def test_subtree(registry):
+    assert list(registry.subtree("person")) == ["person", "person/name", "person/contact", "person/contact/email"]
+    assert list(registry.subtree("person/contact")) == ["person/contact", "person/contact/email"]
+    assert list(registry.subtree("pet")) == ["pet"]
+    assert registry.subtree("per") == {}
+    assert sorted(register_root_slots([registry["person"]], registry)) == [
+        "person",
+        "person/contact",
+        "person/contact/email",
+        "person/name",
+    ]
+
+
+def test_top_level(registry):
+    assert list(registry.top_level()) == ["person", "personality", "pet"]
+    assert registry.ancestors("person/contact/email") == ["person", "person/contact"]
+    assert registry.ancestors("pet") == []
+
+
+def test_mutation(registry):
+    version = registry.version
+    registry.pop("person")
+    assert "person" not in registry.top_level()
+    assert list(registry.subtree("person/contact")) == ["person/contact", "person/contact/email"]
+    for key in list(registry.subtree("person/contact")):
+        del registry[key]
+    assert registry.subtree("person/contact") == {}
+    assert list(registry.subtree("person")) == ["person/name"]
+    assert registry.version > version
+    registry.setdefault("fish", RegexpSlot(name="fish", regexp=".+"))
+    assert "fish" in registry.top_level()
+    registry.clear()
+    assert registry.top_level() == {} and registry.subtree("personality") == {}
+
+
+def test_dict_compatibility(registry):
+    assert isinstance(registry, dict)
+    assert dict(registry) == registry
+    restored = pickle.loads(pickle.dumps(registry))
+    assert list(restored.subtree("personality")) == ["personality", "personality/trait"]
+    copied = registry.copy()
+    copied |= {"fish": RegexpSlot(name="fish", regexp=".+")}
+    assert "fish" in copied.top_level() and "fish" not in registry
+
+
+def test_frozen_children():
+    email = RegexpSlot(name="email", regexp=r".+")
+    contact = GroupSlot(name="contact", children=[email])
+    nested = contact.children["email"]
+    # the group holds a copy of the child named by its path, registration does not change the slots
+    assert nested.name == "contact/email" and nested == email and email.name == "email"
+    local_root = register_slots([contact], SlotRegistry())
+    assert local_root["contact/email"] is nested and contact.children["email"] is nested
+    with pytest.raises(TypeError):
+        local_root["contact/email"].name = "other"
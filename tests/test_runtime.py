@@ -0,0 +1,96 @@
+import re
+import pickle
+
+import pytest
+
+from df_slots.slot_types import RegexpSlot, GroupSlot, FunctionSlot, ValueSlot
+from df_slots.root import register_slots
+from df_slots.runtime import RuntimeGroup, RuntimeRegexp, RuntimeFunction, RuntimeValue, compile_slot
+from df_slots.handlers import extract
+
+
+def get_length(msg: str) -> int:
+    return len(msg)
+
+
+class UpperSlot(RegexpSlot):
+    def extract_value(self, ctx, actor):
+        value = super().extract_value(ctx, actor)
+        return value.upper() if value else value
+
+
+def make_group(name: str = "person") -> GroupSlot:
+    return GroupSlot(
+        name=name,
+        children=[RegexpSlot(name="name", regexp=r"(?<=am )\w+"), FunctionSlot(name="length", func=get_length)],
+    )
+
+
+def test_compile():
+    group = make_group()
+    runtime = compile_slot(group)
+    assert isinstance(runtime, RuntimeGroup) and runtime.definition is group
+    regexp, function = runtime.children
+    assert isinstance(regexp, RuntimeRegexp) and regexp.regexp is group.children["name"].regexp
+    assert isinstance(function, RuntimeFunction) and function.func is get_length
+    assert compile_slot(group) is runtime
+    assert [leaf.name for leaf in runtime.leaves()] == ["person/name", "person/length"]
+    assert group.dict(exclude={"name"}) == make_group().dict(exclude={"name"})
+
+
+def test_frozen():
+    runtime = compile_slot(RegexpSlot(name="name", regexp=r"\w+"))
+    with pytest.raises(AttributeError):
+        runtime.regexp = None
+    with pytest.raises(AttributeError):
+        runtime.extra = None
+
+
+def test_equality():
+    first, second = compile_slot(make_group("first")), compile_slot(make_group("second"))
+    assert first == second and hash(first) == hash(second)
+    assert len({first, second}) == 1
+    assert compile_slot(RegexpSlot(name="a", regexp="a")) != compile_slot(RegexpSlot(name="a", regexp="b"))
+    assert compile_slot(ValueSlot(name="a")) == compile_slot(ValueSlot(name="b"))
+    assert pickle.loads(pickle.dumps(first)) == first
+
+
+def test_registration():
+    group = make_group()
+    runtime = compile_slot(group)
+    register_slots([group], dict())
+    # registration does not rename the slots, the children are named by their paths in the group
+    assert compile_slot(group) is runtime
+    registered = compile_slot(group)
+    assert [leaf.name for leaf in registered.leaves()] == ["person/name", "person/length"]
+
+
+def test_overridden_extraction(testing_context, testing_actor):
+    root = register_slots([UpperSlot(name="name", regexp=r"(?<=am )\w+")], dict())
+    assert isinstance(compile_slot(root["name"]), RuntimeValue)
+    assert extract(testing_context, testing_actor, ["name"], root=root) == ["GROOT"]
+
+
+def test_slot_equality():
+    first, second = make_group("first"), make_group("second")
+    assert first == second and hash(first) == hash(second)
+    assert first.fingerprint is first.fingerprint
+    assert len({first, second, make_group("third")}) == 1
+    assert RegexpSlot(name="a", regexp="a") != RegexpSlot(name="a", regexp=re.compile("a", re.IGNORECASE))
+    assert FunctionSlot(name="a", func=get_length) != FunctionSlot(name="a", func=len)
+    assert make_group() != GroupSlot(name="person", children=[RegexpSlot(name="name", regexp=r"(?<=am )\w+")])
+    assert pickle.loads(pickle.dumps(first)) == first
+    assert first != "first"
+
+
+def test_shared_leaves(testing_context, testing_actor):
+    calls = []
+
+    def count_calls(msg: str) -> int:
+        calls.append(msg)
+        return len(msg)
+
+    slots = [GroupSlot(name=name, children=[FunctionSlot(name="length", func=count_calls)]) for name in "ab"]
+    root = register_slots(slots, dict())
+    assert extract(testing_context, testing_actor, ["a", "b"], root=root) == [{"a/length": 10}, {"b/length": 10}]
+    assert calls == ["I am Groot"]
@@ -22,7 +22,9 @@ def test_regexp(input, regexp, expected, _set, testing_context, testing_actor):
     slot = RegexpSlot(name="test", regexp=regexp)
     result = slot.extract_value(testing_context, testing_actor)
     assert result == expected
-    assert slot.is_set() == _set
+    assert slot.is_set(testing_context) == False
+    testing_context.framework_states["slots"][slot.name] = result
+    assert slot.is_set(testing_context) == _set
 
 
 @pytest.mark.parametrize(
@@ -34,7 +36,7 @@ def test_regexp(input, regexp, expected, _set, testing_context, testing_actor):
                 RegexpSlot(name="name", regexp=r"(?<=am ).+?(?=\.)"),
                 RegexpSlot(name="email", regexp=r"[a-zA-Z\.]+@[a-zA-Z\.]+"),
             ],
-            {"name": "Groot", "email": "groot@gmail.com"},
+            {"test/name": "Groot", "test/email": "groot@gmail.com"},
             True,
         ),
         (
@@ -43,7 +45,7 @@ def test_regexp(input, regexp, expected, _set, testing_context, testing_actor):
                 RegexpSlot(name="name", regexp=r"(?<=am ).+?(?=\.)"),
                 RegexpSlot(name="email", regexp=r"[a-zA-Z\.]+@[a-zA-Z\.]+"),
             ],
-            {"name": "Groot", "email": None},
+            {"test/name": "Groot", "test/email": None},
             False,
         ),
     ],
@@ -53,8 +55,10 @@ def test_group(input, children, expected, is_set, testing_context, testing_actor
     slot = GroupSlot(name="test", children=children)
     assert len(slot.children) == len(children)
     result = slot.extract_value(testing_context, testing_actor)
-    assert slot.is_set() == is_set
     assert result == expected
+    testing_context.framework_states["slots"].update(result)
+    assert slot.is_set(testing_context) == is_set
+    assert slot.get_value(testing_context) == expected
 
 
 @pytest.mark.parametrize(
@@ -75,7 +79,9 @@ def test_function(input, func, expected, _set, testing_context, testing_actor):
     slot = FunctionSlot(name="test", func=func)
     result = slot.extract_value(testing_context, testing_actor)
     assert result == expected
-    assert slot.is_set() == _set
+    assert slot.is_set(testing_context) == False
+    testing_context.framework_states["slots"][slot.name] = result
+    assert slot.is_set(testing_context) == _set
 
 
 def test_children():
@@ -137,7 +143,7 @@ def test_children():
 )
 def test_flatten(root_name, length, children, names):
     slot = GroupSlot(name=root_name, children=children)
-    flatten_result, _ = flatten_slot_tree(slot)
+    flatten_result = flatten_slot_tree(slot)
     assert len(flatten_result) == length
     assert all(map(lambda x: x.startswith(root_name), flatten_result.keys()))
     if names:
@@ -149,3 +155,9 @@ def test_slot_root(root):
     register_slots([slot], root)
     root = register_root_slots([slot], root)
     assert slot.name in root
+
+
+def test_frozen():
+    slot = RegexpSlot(name="test", regexp=r".+")
+    with pytest.raises(TypeError):
+        slot.regexp = None
@@ -0,0 +1,168 @@
+import pickle
+from copy import deepcopy
+
+import pytest
+
+from df_engine.core import Context, Actor
+from df_engine.core.keywords import RESPONSE
+
+from df_slots.slot_types import RegexpSlot, GroupSlot
+from df_slots.root import register_slots, register_storage
+from df_slots.storage import SlotStorage, OverlayStorage
+
+
+@pytest.fixture
+def company():
+    slot = GroupSlot(
+        name="company",
+        children=[
+            GroupSlot(name="address", children=[RegexpSlot(name="city", regexp=r".+")]),
+            GroupSlot(name="contact", children=[RegexpSlot(name="email", regexp=r".+")]),
+        ],
+    )
+    register_slots([slot], dict())
+    yield slot
+
+
+def test_versions():
+    storage = SlotStorage({"a/b": 1})
+    assert storage.version("a") == 0
+    storage["a/b/c"] = 2
+    assert [storage.version(path) for path in ("a", "a/b", "a/b/c", "a/d")] == [1, 1, 1, 0]
+    storage.update({"a/d": 3})
+    del storage["a/b/c"]
+    assert [storage.version(path) for path in ("a", "a/b", "a/b/c", "a/d")] == [3, 2, 2, 1]
+    assert storage == {"a/b": 1, "a/d": 3}
+
+
+def test_group_cache(company, testing_context, monkeypatch):
+    storage = testing_context.framework_states["slots"]
+    assert isinstance(storage, SlotStorage)
+    address, contact = company.children["address"], company.children["contact"]
+    reads = []
+    read_value = GroupSlot._read_value
+    monkeypatch.setattr(GroupSlot, "_read_value", lambda self, ctx: reads.append(self.name) or read_value(self, ctx))
+
+    value = company.get_value(testing_context)
+    assert value == {"company/address/city": None, "company/contact/email": None}
+    # callers get their own copies of the cached value
+    value["company/address/city"] = "Lyon"
+    assert company.get_value(testing_context) == {"company/address/city": None, "company/contact/email": None}
+    assert reads == ["company", "company/address", "company/contact"]
+    assert not company.is_set(testing_context)
+
+    storage["company/address/city"] = "Paris"
+    contact.get_value(testing_context)
+    assert company.get_value(testing_context) == {"company/address/city": "Paris", "company/contact/email": None}
+    assert reads[3:] == ["company", "company/address"]
+    assert address.is_set(testing_context) and not company.is_set(testing_context)
+
+    storage["company/contact/email"] = "mail@company.com"
+    contact.get_value(testing_context)
+    assert reads[-1] == "company/contact"
+    assert company.is_set(testing_context)
+    storage.pop("company/address/city")
+    assert not company.is_set(testing_context)
+
+
+def test_unregistered_groups(testing_context):
+    storage = testing_context.framework_states["slots"]
+    storage.update({"person/name": "Ann", "person/email": "ann@mail.com"})
+    first = GroupSlot(name="person", children=[RegexpSlot(name="name", regexp=r".+")])
+    second = GroupSlot(name="person", children=[RegexpSlot(name="email", regexp=r".+")])
+    assert first.get_value(testing_context) == {"person/name": "Ann"}
+    assert second.get_value(testing_context) == {"person/email": "ann@mail.com"}
+    assert first.is_set(testing_context)
+    assert not GroupSlot(name="person", children=[RegexpSlot(name="city", regexp=r".+")]).is_set(testing_context)
+
+
+def test_plain_storage(company, testing_actor):
+    ctx = Context()
+    ctx.framework_states["slots"] = {"company/address/city": "Paris"}
+    assert company.get_value(ctx) == {"company/address/city": "Paris", "company/contact/email": None}
+    ctx = testing_actor(ctx)
+    assert isinstance(ctx.framework_states["slots"], SlotStorage)
+    assert ctx.framework_states["slots"]["company/address/city"] == "Paris"
+
+
+def test_overlay():
+    defaults = {"a": 1, "b": 2}
+    storage = OverlayStorage(defaults)
+    assert storage == defaults and len(storage) == 2 and storage.get("a") == 1 and storage["b"] == 2
+    storage["a"] = 3
+    storage["c"] = 4
+    del storage["b"]
+    assert "b" not in storage and storage.get("b") is None
+    with pytest.raises(KeyError):
+        storage["b"]
+    assert storage == {"a": 3, "c": 4} and sorted(storage.items()) == [("a", 3), ("c", 4)]
+    assert defaults == {"a": 1, "b": 2}
+    assert storage.pop_changes() == ({"a": 3, "c": 4}, {"b"})
+    assert storage.pop("a") == 3 and storage.get("a") is None
+    storage["b"] = 5
+    assert storage.copy() == {"b": 5, "c": 4}
+    storage.clear()
+    assert storage == {} and len(storage) == 0
+    assert pickle.loads(pickle.dumps(OverlayStorage(defaults, {"c": 4}))) == {"a": 1, "b": 2, "c": 4}
+
+
+def test_shared_defaults():
+    defaults = {"company/address/city": "Paris"}
+    actor = Actor(script={"flow": {"node": {RESPONSE: "ok"}}}, start_label=("flow", "node"))
+    register_storage(actor, storage=defaults)
+    first, second = actor(Context()), actor(Context())
+    first_storage, second_storage = first.framework_states["slots"], second.framework_states["slots"]
+    assert isinstance(first_storage, OverlayStorage)
+    assert first_storage._defaults is second_storage._defaults
+    first_storage["company/address/city"] = "Berlin"
+    defaults["company/contact/email"] = "mail@company.com"
+    assert second_storage == {"company/address/city": "Paris"}
+    restored = Context.parse_raw(first.json())
+    assert restored.framework_states["slots"] == {"company/address/city": "Berlin"}
+
+
+@pytest.mark.parametrize("overlay", [False, True])
+def test_deferred(overlay):
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return value
+
+    storage = OverlayStorage({"a": 1}) if overlay else SlotStorage({"a": 1})
+    storage.pop_changes()
+    plain_type = type(storage)
+    storage.defer("a", lambda: compute(2))
+    storage.defer("b", lambda: compute(3))
+    storage.defer("c", lambda: compute(None))
+    assert calls == [] and "b" in storage
+    # peeking does not extract, deferred values read as the values they replaced
+    assert storage.peek("a") == 1 and storage.peek("b", "unset") == "unset" and calls == []
+    assert storage.get("a") == 2 and storage["a"] == 2 and calls == [2]
+    storage.settle()
+    assert calls == [2] and storage == {"a": 2} and type(storage) is plain_type
+    assert storage.pop_changes() == ({"a": 2}, set())
+
+    storage.defer("a", lambda: compute(4))
+    storage.settle()
+    assert storage == {"a": 2} and storage.pop_changes() == (dict(), set())
+    storage.defer("b", lambda: compute(5))
+    assert deepcopy(storage).get("b") == 5
+    storage.settle()
+    assert calls == [2, 5] and storage["b"] == 5
+    storage.defer("c", lambda: compute(6))
+    assert sorted(storage.items()) == [("a", 2), ("b", 5), ("c", 6)]
+    assert pickle.loads(pickle.dumps(storage)) == {"a": 2, "b": 5, "c": 6}
+    storage.defer("d", lambda: compute(7))
+    assert storage.copy() == {"a": 2, "b": 5, "c": 6, "d": 7} and calls[-1] == 7
+
+
+def test_unnested_group_cache(testing_context):
+    storage = testing_context.framework_states["slots"]
+    # children named outside of the group path, as the validation of the group would name them by their paths
+    group = GroupSlot.construct(name="pair", children={name: RegexpSlot(name=name, regexp=r".+") for name in "ab"})
+    assert group.get_value(testing_context) == {"a": None, "b": None}
+    assert not group.is_set(testing_context)
+    storage.update({"a": "x", "b": "y"})
+    assert group.get_value(testing_context) == {"a": "x", "b": "y"}
+    assert group.is_set(testing_context)
@@ -0,0 +1,71 @@
+import pytest
+
+from df_engine.core import Context
+
+from df_slots.slot_types import RegexpSlot, GroupSlot
+from df_slots.root import register_slots, SlotRegistry
+from df_slots.backends import SQLiteBackend
+from df_slots.codec import SlotCodec
+from df_slots.extraction import extract_slots
+from df_slots.template import compile_template
+
+
+@pytest.fixture
+def local_root():
+    person = GroupSlot(
+        name="person",
+        children=[RegexpSlot(name="username", regexp=r".+"), RegexpSlot(name="email", regexp=r".+")],
+    )
+    yield register_slots([person, RegexpSlot(name="pet", regexp=r".+")], dict())
+
+
+@pytest.mark.parametrize(
+    ("template", "storage", "slots", "expected"),
+    [
+        ("Hi, {person/username}!", {"person/username": "groot"}, None, "Hi, groot!"),
+        ("{person/username} {person/username}", {"person/username": "groot"}, None, "groot groot"),
+        (
+            "{person/username} {person/email}",
+            {"person/username": "groot", "person/email": None},
+            None,
+            "groot {person/email}",
+        ),
+        ("{person/username} {pet}", {"pet": "cat"}, None, "{person/username} cat"),
+        ("{person} {unknown} {{pet}}", {"pet": "cat"}, None, "{person} {unknown} {cat}"),
+        ("{person/username} {pet}", {"person/username": "groot", "pet": "cat"}, ["pet"], "{person/username} cat"),
+        ("{person/username} {pet}", {"person/username": "groot", "pet": "cat"}, ["person"], "groot {pet}"),
+        ("No placeholders", {}, None, "No placeholders"),
+    ],
+)
+def test_render(template, storage, slots, expected, local_root, testing_context):
+    testing_context.framework_states["slots"] = storage
+    assert compile_template(template).render(testing_context, local_root, slots) == expected
+
+
+def test_cache():
+    assert compile_template("{pet}") is compile_template("{pet}")
+    assert compile_template("a {b} c").segments == ["a ", "b", " c"]
+
+
+def test_serialized_values(testing_actor):
+    pattern = r"(?P<user>\w+)@(?P<domain>\w+)\.com"
+    slots = [
+        RegexpSlot(name="all", regexp=pattern, all_matches=True),
+        RegexpSlot(name="groups", regexp=pattern, groups=True),
+        RegexpSlot(name="spans", regexp=pattern, all_matches=True, spans=True),
+        RegexpSlot(name="group_spans", regexp=pattern, groups=True, spans=True),
+    ]
+    local_root = register_slots(slots, SlotRegistry())
+    ctx = testing_actor(Context())
+    ctx.add_request("write to bob@mail.com or to alice@post.com")
+    values = dict(zip(local_root, extract_slots(ctx, testing_actor, slots)))
+    template = compile_template("{all} | {groups} | {spans} | {group_spans}")
+    emails, groups = "bob@mail.com, alice@post.com", "user: bob, domain: mail"
+    expected = f"{emails} | {groups} | {emails} | {groups}"
+
+    backend = SQLiteBackend(":memory:")
+    backend.save("ctx", values)
+    slot_codec = SlotCodec(local_root)
+    for storage in (values, backend.load("ctx"), slot_codec.loads(slot_codec.dumps(values))):
+        ctx.framework_states["slots"] = storage
+        assert template.render(ctx, local_root) == expected
@@ -0,0 +1,104 @@
+import json
+import pickle
+
+import pytest
+from pydantic import ValidationError
+
+from df_engine.core import Context
+
+from df_slots.slot_types import VocabularyIndexSlot
+from df_slots.vocabulary_index import VocabularyIndex, build_index, open_index, main
+from df_slots.root import register_slots, SlotRegistry
+from df_slots.runtime import RuntimeGazetteer, compile_slot
+from df_slots.handlers import extract
+
+CITIES = {"NYC": "New York", "New  York": "New York", "new york city": "New York", "Paris": "Paris", "York": "York"}
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = str(tmp_path / "cities.idx")
+    build_index(CITIES, path)
+    yield path
+
+
+def test_build(index_path, tmp_path):
+    index = VocabularyIndex(index_path)
+    assert len(index) == 5 and index.max_words == 3
+    assert list(index.keys()) == ["new york", "new york city", "nyc", "paris", "york"]
+    assert index.get("nyc") == "New York" and index.get("new   YORK") == "New York" and index.get("Lyon") is None
+    assert pickle.loads(pickle.dumps(index)).get("Paris") == "Paris"
+
+    path = str(tmp_path / "empty.idx")
+    assert build_index([], path) == 0
+    assert VocabularyIndex(path).get("Paris") is None
+    (tmp_path / "short.idx").write_bytes(b"DFVI")
+    with pytest.raises(ValueError):
+        VocabularyIndex(str(tmp_path / "short.idx"))
+
+
+@pytest.mark.parametrize(
+    ("text", "all_matches", "expected"),
+    [
+        ("I live in new york city", False, "New York"),
+        ("I live in new york city", True, ["New York", "New York", "York"]),
+        ("From NYC to Paris!", True, ["New York", "Paris"]),
+        ("Yorkshire and Parisian", True, None),
+    ],
+)
+def test_search(index_path, text, all_matches, expected):
+    index = open_index(index_path)
+    assert (index.all(text) if all_matches else index.longest(text)) == expected
+
+
+def test_rebuild(tmp_path):
+    path = str(tmp_path / "cities.idx")
+    build_index(CITIES, path)
+    index = VocabularyIndex(path)
+    build_index({"Lyon": "Lyon"}, path)
+    # the open index keeps reading the previous file, a new one reads the rebuilt file
+    assert index.longest("From NYC to Lyon") == "New York"
+    assert VocabularyIndex(path).longest("From NYC to Lyon") == "Lyon"
+    assert [item.name for item in tmp_path.iterdir()] == ["cities.idx"]
+
+
+def test_case_sensitive(tmp_path):
+    path = str(tmp_path / "names.idx")
+    build_index(["Rocket", "rocket"], path, case_sensitive=True)
+    index = VocabularyIndex(path)
+    assert index.case_sensitive and len(index) == 2
+    assert index.all("Rocket and rocket, not ROCKET") == ["Rocket", "rocket"]
+
+
+def test_builder(tmp_path):
+    source = tmp_path / "cities.txt"
+    source.write_text("NYC\tNew York\nParis\n\n", encoding="utf-8")
+    output = str(tmp_path / "cities.idx")
+    assert main([str(source), output]) == 0
+    assert VocabularyIndex(output).all("NYC or Paris") == ["New York", "Paris"]
+
+    source = tmp_path / "cities.json"
+    source.write_text(json.dumps({"LA": "Los Angeles"}), encoding="utf-8")
+    assert main([str(source), output]) == 0
+    assert VocabularyIndex(output).longest("I am in LA") == "Los Angeles"
+
+
+def test_slot(index_path, tmp_path, testing_actor):
+    slot = VocabularyIndexSlot(name="city", index_path=index_path)
+    assert slot.index is open_index(index_path)
+    local_root = register_slots(
+        [slot, VocabularyIndexSlot(name="cities", index_path=index_path, all_matches=True)], SlotRegistry()
+    )
+    assert isinstance(compile_slot(slot), RuntimeGazetteer)
+
+    ctx = testing_actor(Context())
+    ctx.add_request("From New York to Paris")
+    assert extract(ctx, testing_actor, ["city", "cities"], root=local_root) == [
+        "New York",
+        ["New York", "York", "Paris"],
+    ]
+
+    not_an_index = tmp_path / "cities.txt"
+    not_an_index.write_text("NYC\n" * 10, encoding="utf-8")
+    with pytest.raises(ValidationError):
+        VocabularyIndexSlot(name="city", index_path=str(not_an_index))